@@ -0,0 +1,36 @@
+"""Segmented and tokenized entries
+
+Revision ID: 3d8e5a7c1f46
+Revises: 9c1f7a3e5b20
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8e5a7c1f46'
+down_revision = '9c1f7a3e5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    # Importing the app may have made it already, through create_all().
+    if connection.dialect.has_table(connection, 'segment'):
+        return
+    op.create_table('segment',
+    sa.Column('entry_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.String(length=100), nullable=False),
+    sa.Column('lang', sa.String(length=100), nullable=False),
+    sa.Column('digest', sa.String(length=40), nullable=False),
+    sa.Column('lines', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['entry_id'], ['entry.id'], ),
+    sa.PrimaryKeyConstraint('entry_id', 'version', 'lang')
+    )
+
+
+def downgrade():
+    op.drop_table('segment')
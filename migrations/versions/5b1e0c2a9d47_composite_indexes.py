@@ -0,0 +1,37 @@
+"""Composite indexes for the hot lookups
+
+Revision ID: 5b1e0c2a9d47
+Revises: 326f09509cab
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e0c2a9d47'
+down_revision = '326f09509cab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lookups of link by first_id and of translation by (parent_id, model)
+    # are already served by the indexes behind unique_first_second and
+    # unique_parent_model, so those get nothing new here.
+    with op.batch_alter_table('entry', schema=None) as batch_op:
+        batch_op.create_index('ix_entry_lang_date', ['lang', 'date'], unique=False)
+
+    with op.batch_alter_table('translation', schema=None) as batch_op:
+        batch_op.create_index('ix_translation_model_lang', ['model', 'lang'], unique=False)
+
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    with op.batch_alter_table('translation', schema=None) as batch_op:
+        batch_op.drop_index('ix_translation_model_lang')
+
+    with op.batch_alter_table('entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_entry_lang_date')
@@ -0,0 +1,50 @@
+"""Materialised Entry.link_count
+
+Revision ID: 9c1f7a3e5b20
+Revises: e6b2d4f81c37
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pib import bulk, search
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1f7a3e5b20'
+down_revision = 'e6b2d4f81c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        # Narrowed to UPDATE OF the indexed columns, before the backfill
+        # updates every entry.
+        for fts in search.INDEXES:
+            connection.execute('DROP TRIGGER IF EXISTS {}_au'.format(fts))
+        search.create_index(connection)
+
+    with op.batch_alter_table('entry', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('link_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_entry_link_count'), ['link_count'], unique=False)
+
+    bulk.rebuild_link_counts(connection)
+
+
+def downgrade():
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        # Dropping a column copies the table, and its triggers with it.
+        search.drop_index(connection)
+
+    with op.batch_alter_table('entry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_entry_link_count'))
+        batch_op.drop_column('link_count')
+
+    if connection.dialect.name == 'sqlite':
+        search.create_index(connection)
+        for fts in search.INDEXES:
+            search.rebuild(connection, fts)
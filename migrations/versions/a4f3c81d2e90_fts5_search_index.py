@@ -0,0 +1,34 @@
+"""FTS5 search index over entry and translation
+
+Revision ID: a4f3c81d2e90
+Revises: 5b1e0c2a9d47
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pib import search
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f3c81d2e90'
+down_revision = '5b1e0c2a9d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != 'sqlite':
+        return
+    search.create_index(connection, compressed=False)
+    for fts in search.INDEXES:
+        search.rebuild(connection, fts)
+
+
+def downgrade():
+    connection = op.get_bind()
+    if connection.dialect.name != 'sqlite':
+        return
+    search.drop_index(connection)
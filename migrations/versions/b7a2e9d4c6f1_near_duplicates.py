@@ -0,0 +1,71 @@
+"""MinHash signatures, LSH bands and near-duplicate clusters
+
+Revision ID: b7a2e9d4c6f1
+Revises: 3d8e5a7c1f46
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7a2e9d4c6f1'
+down_revision = '3d8e5a7c1f46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    # Importing the app may have made them already, through create_all().
+    if not connection.dialect.has_table(connection, 'minhash'):
+        op.create_table('minhash',
+        sa.Column('entry_id', sa.Integer(), nullable=False),
+        sa.Column('lang', sa.String(length=100), nullable=True),
+        sa.Column('digest', sa.String(length=40), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['entry_id'], ['entry.id'], ),
+        sa.PrimaryKeyConstraint('entry_id')
+        )
+        with op.batch_alter_table('minhash', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_minhash_lang'), ['lang'], unique=False)
+
+    if not connection.dialect.has_table(connection, 'minhash_band'):
+        op.create_table('minhash_band',
+        sa.Column('entry_id', sa.Integer(), nullable=False),
+        sa.Column('band', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('lang', sa.String(length=100), nullable=True),
+        sa.Column('key', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['entry_id'], ['entry.id'], ),
+        sa.PrimaryKeyConstraint('entry_id', 'band')
+        )
+        with op.batch_alter_table('minhash_band', schema=None) as batch_op:
+            batch_op.create_index('ix_minhash_band_key', ['lang', 'band', 'key'], unique=False)
+
+    if not connection.dialect.has_table(connection, 'cluster'):
+        op.create_table('cluster',
+        sa.Column('entry_id', sa.Integer(), nullable=False),
+        sa.Column('cluster_id', sa.Integer(), nullable=False),
+        sa.Column('similarity', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['cluster_id'], ['entry.id'], ),
+        sa.ForeignKeyConstraint(['entry_id'], ['entry.id'], ),
+        sa.PrimaryKeyConstraint('entry_id')
+        )
+        with op.batch_alter_table('cluster', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_cluster_cluster_id'), ['cluster_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cluster', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cluster_cluster_id'))
+
+    op.drop_table('cluster')
+    with op.batch_alter_table('minhash_band', schema=None) as batch_op:
+        batch_op.drop_index('ix_minhash_band_key')
+
+    op.drop_table('minhash_band')
+    with op.batch_alter_table('minhash', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_minhash_lang'))
+
+    op.drop_table('minhash')
@@ -0,0 +1,83 @@
+"""zstd compression of entry and translation text
+
+Revision ID: e6b2d4f81c37
+Revises: a4f3c81d2e90
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from pib import compression, search
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2d4f81c37'
+down_revision = 'a4f3c81d2e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    connection = op.get_bind()
+    # Importing the app may have made it already, through create_all().
+    if not connection.dialect.has_table(connection, 'zstd_dictionary'):
+        op.create_table('zstd_dictionary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=100), nullable=True),
+        sa.Column('lang', sa.String(length=100), nullable=True),
+        sa.Column('samples', sa.Integer(), nullable=True),
+        sa.Column('data', sa.LargeBinary(), nullable=True),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    with op.batch_alter_table('entry', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('codec', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('translation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('codec', sa.Integer(), nullable=True))
+
+    if connection.dialect.name != 'sqlite':
+        return
+
+    # The index now reads text through the decompressing views.
+    search.drop_index(connection)
+    search.create_index(connection)
+    for fts in search.INDEXES:
+        search.rebuild(connection, fts)
+
+    if not compression.enabled():
+        print('Text left uncompressed, PIB_COMPRESSION=zstd or pib.cli.compress-db')
+        return
+    for table in compression.COLUMNS:
+
+        def codec_f(lang):
+            return compression.train(connection, table, lang)
+
+        stats = compression.recode_table(connection, table, codec_f)
+        for lang, (rows, plain, stored, _) in stats.items():
+            print('{}/{}: {} rows, {} -> {} bytes'.format(table, lang, rows, plain, stored))
+
+
+def downgrade():
+    connection = op.get_bind()
+    sqlite = connection.dialect.name == 'sqlite'
+    if sqlite:
+        for table in compression.COLUMNS:
+            compression.recode_table(connection, table, lambda lang: None)
+        search.drop_index(connection)
+
+    # Dropping a column copies the table on SQLite, which takes the
+    # triggers with it, so the index comes back after.
+    with op.batch_alter_table('translation', schema=None) as batch_op:
+        batch_op.drop_column('codec')
+
+    with op.batch_alter_table('entry', schema=None) as batch_op:
+        batch_op.drop_column('codec')
+
+    op.drop_table('zstd_dictionary')
+
+    if sqlite:
+        search.create_index(connection, compressed=False)
+        for fts in search.INDEXES:
+            search.rebuild(connection, fts)
@@ -1,15 +1,28 @@
+import os
+
 from flask import Flask, render_template, request
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///pib-crawled-sqlite.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "PIB_DATABASE_URI", "sqlite:///pib-crawled-sqlite.db"
+)
+is_sqlite = app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite")
+if not is_sqlite:
+    # A server, e.g. postgresql://user@host/pib: every process keeps a
+    # pool, checked before use since the server may drop idle connections.
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_size": int(os.environ.get("PIB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("PIB_POOL_OVERFLOW", 10)),
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
 
 db = SQLAlchemy(app)
 
 from . import models as M
 
-is_sqlite = True
 migrate = Migrate(app, db, render_as_batch=is_sqlite)
 
 from .docstore import docstore
@@ -0,0 +1,167 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+
+def populate(db, entries, size):
+    from pib.models import Entry
+
+    line = "A synthetic release line for the backend benchmark."
+    content = "\n".join([line] * (size // len(line)))
+    rows = [{"id": idx, "lang": "hi", "content": content} for idx in range(entries)]
+    start = time.time()
+    with db.engine.begin() as connection:
+        connection.execute(Entry.__table__.insert(), rows)
+    return entries / (time.time() - start)
+
+
+def links(db, entries, count, copy):
+    # insert_links() as the crawler runs it; on PostgreSQL also plain
+    # executemany of INSERT ... ON CONFLICT DO NOTHING, to compare COPY.
+    from pib import bulk
+    from pib.models import Link
+
+    rng = random.Random(42)
+    edges = {(rng.randrange(entries), rng.randrange(entries)) for _ in range(count)}
+    db.session.execute(Link.__table__.delete())
+    db.session.commit()
+
+    start = time.time()
+    if copy or db.engine.dialect.name != "postgresql":
+        bulk.insert_links(edges)
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+
+        statement = insert(Link.__table__).on_conflict_do_nothing()
+        for batch in bulk.batched(edges, 50000):
+            rows = [{"first_id": u, "second_id": v} for u, v in batch]
+            db.session.execute(statement, rows)
+            bulk.update_link_counts(db.session, {u for u, v in batch})
+            db.session.commit()
+    return len(edges) / (time.time() - start)
+
+
+def scan(db, streamed):
+    # The export scan, everything at once or through stream().
+    from pib.models import Entry
+    from pib.storage import stream
+
+    query = db.session.query(Entry.id, Entry.content).filter(Entry.lang == "hi")
+    tracemalloc.start()
+    start = time.time()
+    rows = stream(db.engine, query) if streamed else query.all()
+    count = sum(1 for row in rows)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return count / elapsed, peak / 2**20
+
+
+def writers(db, entries, threads, seconds):
+    # Translations committed one at a time from several threads, like
+    # translate_pib running next to the crawler.
+    from pib.models import Translation
+
+    stop, done, errors = threading.Event(), [0], [0]
+
+    def write(index):
+        session = db.create_scoped_session()
+        model, idx = "bench-{}".format(index), 0
+        while not stop.is_set():
+            try:
+                session.add(
+                    Translation(
+                        parent_id=idx % entries, model=model, lang="en", translated="x"
+                    )
+                )
+                session.commit()
+                done[0] += 1
+            except Exception:
+                session.rollback()
+                errors[0] += 1
+            idx += 1
+        session.remove()
+
+    workers = [threading.Thread(target=write, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return done[0] / seconds, errors[0]
+
+
+def run(args):
+    from pib import db
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    name = db.engine.dialect.name
+    results = [
+        ("entries/s", populate(db, args.entries, args.row_size)),
+        ("links/s", links(db, args.entries, args.links, copy=True)),
+    ]
+    if name == "postgresql":
+        results.append(
+            ("links/s executemany", links(db, args.entries, args.links, copy=False))
+        )
+    rate, peak = scan(db, streamed=False)
+    results += [("scan .all() rows/s", rate), ("scan .all() peak MiB", peak)]
+    rate, peak = scan(db, streamed=True)
+    results += [("scan stream rows/s", rate), ("scan stream peak MiB", peak)]
+    rate, errors = writers(db, args.entries, args.writers, args.seconds)
+    results += [("commits/s", rate), ("failed commits", errors)]
+    for label, value in results:
+        print("{:<10} {:<24} {:>12.1f}".format(name, label, value))
+    db.session.remove()
+    db.drop_all()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--postgres",
+        help="URI of a scratch PostgreSQL DB, its tables are dropped",
+        type=str,
+    )
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--row-size", help="Bytes of content", type=int, default=4000)
+    parser.add_argument("--links", type=int, default=200000)
+    parser.add_argument("--writers", help="Writer threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--uri", help="Run against this DB, used per backend", type=str)
+    args = parser.parse_args()
+
+    if args.uri:
+        run(args)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        uris = ["sqlite:///{}".format(os.path.join(workdir, "bench.db"))]
+        if args.postgres:
+            uris.append(args.postgres)
+        for uri in uris:
+            # The app binds its DB at import, one process per backend.
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-W",
+                    "ignore",
+                    "-m",
+                    "pib.bench.backends",
+                    "--uri",
+                    uri,
+                ]
+                + sys.argv[1:],
+                env=dict(os.environ, PIB_DATABASE_URI=uri),
+                check=True,
+            )
@@ -0,0 +1,145 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from itertools import accumulate
+
+from sqlalchemy import bindparam, create_engine, select
+
+# First code point of each script, synthetic words are drawn from there.
+SCRIPTS = {
+    "en": 0x61,
+    "hi": 0x915,
+    "ta": 0xB95,
+    "te": 0xC15,
+    "ml": 0xD15,
+    "ur": 0x628,
+    "bn": 0x995,
+}
+
+
+def corpus(entries, words, vocabulary, seed=42):
+    """
+    Releases as Zipf-distributed words in each language's script, between
+    a header and a footer shared within the language, like the bureau's
+    boilerplate.
+    """
+    rng = random.Random(seed)
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(vocabulary)))
+
+    def word(base):
+        return "".join(chr(base + rng.randrange(26)) for _ in range(rng.randint(2, 8)))
+
+    terms = {
+        lang: [word(base) for _ in range(vocabulary)] for lang, base in SCRIPTS.items()
+    }
+    boilerplate = {
+        lang: (" ".join(words[:40]), " ".join(words[40:80]))
+        for lang, words in terms.items()
+    }
+    langs = list(SCRIPTS)
+    for idx in range(1, entries + 1):
+        lang = rng.choice(langs)
+        header, footer = boilerplate[lang]
+        lines = [header]
+        for _ in range(words // 15):
+            lines.append(
+                " ".join(rng.choices(terms[lang], cum_weights=cum_weights, k=15))
+            )
+        lines.append(footer)
+        yield {"id": idx, "lang": lang, "content": "\n".join(lines)}
+
+
+def size(engine):
+    with engine.connect() as connection:
+        connection.execute("VACUUM")
+        pages = connection.execute("PRAGMA page_count").scalar()
+        page_size = connection.execute("PRAGMA page_size").scalar()
+    return pages * page_size
+
+
+def reads(engine, entries, lookups, seed=7):
+    # Point lookups through the hybrid expression, then a full scan.
+    from pib.models import Entry
+
+    rng = random.Random(seed)
+    query = select([Entry.content]).where(Entry.id == bindparam("id"))
+    with engine.connect() as connection:
+        times = []
+        for _ in range(lookups):
+            start = time.time()
+            connection.execute(query, id=rng.randint(1, entries)).fetchall()
+            times.append(1e6 * (time.time() - start))
+        times.sort()
+
+        start = time.time()
+        connection.execute(select([Entry.content])).fetchall()
+        scan = time.time() - start
+    return times[len(times) // 2], times[int(0.99 * len(times))], entries / scan
+
+
+def bench(name, workdir, rows, codec_f, args):
+    from pib import compression, db
+    from pib.models import Entry
+
+    engine = create_engine("sqlite:///{}".format(os.path.join(workdir, name + ".db")))
+    db.Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Entry.__table__.insert(), rows)
+
+    start = time.time()
+    if codec_f is not None:
+        with engine.connect() as connection:
+            compression.recode_table(
+                connection,
+                "entry",
+                lambda lang: codec_f(connection, lang),
+                level=args.level,
+            )
+    elapsed = time.time() - start
+
+    p50, p99, scan = reads(engine, len(rows), args.lookups)
+    print(
+        "{:<10} {:>9.1f} {:>10.1f} {:>8.1f} {:>8.1f} {:>10.0f}".format(
+            name, size(engine) / 2**20, elapsed, p50, p99, scan
+        )
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--words", help="Words per entry", type=int, default=600)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--level", type=int, default=9)
+    parser.add_argument("--samples", help="Rows to train on", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app binds its DB at import, keep it out of the tree.
+        os.environ["PIB_DATABASE_URI"] = "sqlite:///{}".format(
+            os.path.join(workdir, "app.db")
+        )
+        from pib import compression
+
+        rows = list(corpus(args.entries, args.words, args.vocabulary))
+        print(
+            "{:<10} {:>9} {:>10} {:>8} {:>8} {:>10}".format(
+                "", "MiB", "compress s", "p50 us", "p99 us", "scan /s"
+            )
+        )
+        cases = [
+            ("plain", None),
+            ("zstd", lambda connection, lang: 0),
+            (
+                "zstd+dict",
+                lambda connection, lang: compression.train(
+                    connection, "entry", lang, args.samples
+                ),
+            ),
+        ]
+        for name, codec_f in cases:
+            bench(name, workdir, rows, codec_f, args)
@@ -0,0 +1,121 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import create_engine, func, select
+
+from .compression import corpus
+
+
+def edit(content, fraction, rng):
+    # A republished copy: some words replaced, as with a corrected date.
+    words = content.split(" ")
+    for idx in rng.sample(range(len(words)), int(fraction * len(words))):
+        words[idx] = "edited"
+    return " ".join(words)
+
+
+def populate(engine, args):
+    from pib import dedup
+    from pib.models import Entry
+
+    rng = random.Random(7)
+    rows = list(corpus(args.entries, args.words, vocabulary=20000))
+    originals = rng.sample(rows, args.copies)
+    copies = {}
+    for idx, original in enumerate(originals):
+        fraction = args.edits[idx % len(args.edits)]
+        copy = dict(original, id=len(rows) + idx + 1)
+        copy["content"] = edit(original["content"], fraction, rng)
+        first = set(dedup.shingles(original["content"]))
+        second = set(dedup.shingles(copy["content"]))
+        jaccard = len(first & second) / len(first | second)
+        copies[copy["id"]] = (original["id"], fraction, jaccard)
+        rows.append(copy)
+    with engine.begin() as connection:
+        connection.execute(Entry.__table__.insert(), rows)
+    return copies
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--words", help="Words per entry", type=int, default=600)
+    parser.add_argument(
+        "--copies", help="Near-duplicates added", type=int, default=2000
+    )
+    parser.add_argument(
+        "--edits",
+        help="Fractions of words changed in the copies",
+        nargs="+",
+        type=float,
+        default=[0.0, 0.02, 0.05, 0.1, 0.3],
+    )
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    from pib import db, dedup
+    from pib.models import Cluster, Entry
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine("sqlite:///{}".format(os.path.join(workdir, "bench.db")))
+        db.Model.metadata.create_all(engine)
+        copies = populate(engine, args)
+        total = args.entries + args.copies
+
+        with engine.connect() as connection:
+            start = time.time()
+            signed = dedup.index(connection)
+            elapsed = time.time() - start
+            print("signed {} entries, {:.0f}/s".format(len(signed), total / elapsed))
+
+            # As after a crawl: the copies are new to clusters that were
+            # built without them.
+            connection.execute(Cluster.__table__.delete())
+            start = time.time()
+            dedup.link(connection, sorted(copies))
+            elapsed = time.time() - start
+            print(
+                "linked {} new entries, {:.0f}/s".format(
+                    len(copies), len(copies) / elapsed
+                )
+            )
+            query = select([Cluster.entry_id, Cluster.cluster_id])
+            incremental = set(map(tuple, connection.execute(query)))
+
+            start = time.time()
+            dedup.rebuild_clusters(connection, threshold=args.threshold)
+            print("rebuilt clusters in {:.1f}s".format(time.time() - start))
+            clusters = dict(map(tuple, connection.execute(query)))
+            assert set(clusters.items()) == incremental, "link() and rebuild differ"
+
+            print("{:>8} {:>8} {:>8}".format("edited", "jaccard", "found"))
+            for fraction in args.edits:
+                planted = [v for v in copies.items() if v[1][1] == fraction]
+                found = sum(1 for c, (o, _, _) in planted if clusters.get(c) == o)
+                jaccard = sum(j for _, (_, _, j) in planted) / len(planted)
+                print(
+                    "{:>8.2f} {:>8.2f} {:>7.0%}".format(
+                        fraction, jaccard, found / len(planted)
+                    )
+                )
+            stray = sum(
+                1
+                for entry_id, root in clusters.items()
+                if entry_id != root and entry_id not in copies
+            )
+            print("entries clustered that are not copies: {}".format(stray))
+
+            start = time.time()
+            for copy in sorted(copies)[:500]:
+                dedup.near_duplicates(connection, copy, args.threshold)
+            print("near_duplicates(): {:.2f}ms".format(2 * (time.time() - start)))
+
+            kept = connection.execute(
+                select([func.count()])
+                .select_from(Entry.__table__)
+                .where(dedup.representative())
+            ).scalar()
+            print("one per cluster: {} of {} entries".format(kept, total))
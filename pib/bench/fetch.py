@@ -0,0 +1,76 @@
+import time
+from argparse import ArgumentParser
+
+from pib.bench.standin import DirectoryPages, StandIn, SyntheticSite
+from pib.cli.fetch import AsyncFetcher, Backoff
+from pib.cli.scrape import CachedCrawler
+
+
+def run(fetcher, keys):
+    start = time.time()
+    fetched = 0
+    for key, page in fetcher.fetch_all(keys):
+        if isinstance(page, str):
+            fetched += 1
+    elapsed = time.time() - start
+    return fetched, elapsed
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--begin", help="First PRID served", type=int, default=0)
+    parser.add_argument(
+        "--count", help="Number of PRIDs fetched", type=int, default=500
+    )
+    parser.add_argument(
+        "--pages-dir", help="Serve canned <PRID>.html pages from here", default=None
+    )
+    parser.add_argument(
+        "--latency", help="Artificial server latency (s)", type=float, default=0.05
+    )
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument(
+        "--capacity", help="Requests in flight before 503s", type=int, default=None
+    )
+    parser.add_argument(
+        "--retries", help="Retries per transient failure", type=int, default=0
+    )
+    args = parser.parse_args()
+
+    end = args.begin + args.count
+    if args.pages_dir:
+        pages = DirectoryPages(args.pages_dir)
+    else:
+        pages = SyntheticSite(args.begin, end)
+
+    keys = [str(prid) for prid in range(args.begin, end)]
+    backoff = Backoff(retries=args.retries, base=0.05)
+    with StandIn(pages, latency=args.latency, capacity=args.capacity) as standin:
+        crawler = CachedCrawler(None, url_format=standin.url_format, backoff=backoff)
+        fetched, elapsed = run(crawler, keys)
+        print(
+            "urlopen serial: {} pages in {:.2f}s, {:.1f} pages/s".format(
+                fetched, elapsed, fetched / elapsed
+            )
+        )
+
+        for concurrency in args.concurrency:
+            fetcher = AsyncFetcher(
+                standin.url_format,
+                CachedCrawler.headers,
+                concurrency=concurrency,
+                rate_limit=args.rate_limit,
+                backoff=backoff,
+            )
+            rejected = standin.rejected
+            fetched, elapsed = run(fetcher, keys)
+            print(
+                "async x{}: {} pages in {:.2f}s, {:.1f} pages/s, {} 503s".format(
+                    concurrency,
+                    fetched,
+                    elapsed,
+                    fetched / elapsed,
+                    standin.rejected - rejected,
+                )
+            )
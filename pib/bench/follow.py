@@ -0,0 +1,90 @@
+import os
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+
+from pib.bench.standin import PublishingSite, StandIn, SyntheticSite
+
+
+def quantiles(values):
+    values = sorted(values)
+    if not values:
+        return "n/a"
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return "p50 {:.2f}s p90 {:.2f}s max {:.2f}s".format(
+        pick(0.5), pick(0.9), values[-1]
+    )
+
+
+def follow(args, workdir):
+    # The app binds its DB at import, so point it at a scratch file first.
+    os.environ["PIB_DATABASE_URI"] = "sqlite:///{}".format(
+        os.path.join(workdir, "follow.db")
+    )
+    from pib.cli.follow import Follower
+    from pib.cli.scrape import AdjacencyJournal, CachedCrawler
+    from pib.cli.telemetry import CrawlMetrics
+
+    live = args.begin + args.count // 2
+    site = PublishingSite(
+        SyntheticSite(args.begin, args.begin + args.count, density=args.density),
+        live,
+        rate=args.rate,
+        jitter=args.jitter,
+    )
+
+    path = os.path.join(workdir, "follow")
+    with StandIn(site, latency=args.latency) as standin:
+        metrics = CrawlMetrics()
+        crawler = CachedCrawler(path, url_format=standin.url_format, metrics=metrics)
+        adj = AdjacencyJournal("{}.adj.jsonl".format(path)).load()
+        follower = Follower(
+            crawler,
+            adj,
+            metrics,
+            "{}.follow.json".format(path),
+            min_interval=args.min_interval,
+            max_interval=args.max_interval,
+        ).load(start=live - 1)
+
+        site.start()
+        stop = threading.Event()
+        latencies = []
+        while time.time() - site.started < args.duration:
+            ingested = follower.poll()
+            committed = time.time()
+            latencies.extend(committed - site.published_at(int(k)) for k in ingested)
+            stop.wait(follower.interval)
+
+        published = [
+            prid
+            for prid in site.offsets
+            if site.published_at(prid) <= site.started + args.duration
+        ]
+        print(
+            "{} of {} published releases ingested, {} requests".format(
+                len(latencies), len(published), standin.requests
+            )
+        )
+        print("publish -> committed: {}".format(quantiles(latencies)))
+        ingest = metrics.snapshot()["latency_seconds"]["ingest"]
+        print("seen -> committed: p50 {p50}s p90 {p90}s".format(**ingest))
+        print("watermark {}, window {}".format(follower.watermark, follower.window))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--begin", type=int, default=100000)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--density", type=float, default=0.8)
+    parser.add_argument("--rate", help="Releases per second", type=float, default=2)
+    parser.add_argument("--jitter", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--min-interval", type=float, default=1)
+    parser.add_argument("--max-interval", type=float, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        follow(args, workdir)
@@ -0,0 +1,123 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+NEW_INDEXES = [
+    "ix_entry_lang_date",
+    "ix_translation_model_lang",
+    "ix_entry_link_count",
+]
+
+
+def populate(engine, entries, seed=42):
+    # Releases over five years in 11 languages, every non-English one
+    # translated to English by two models, clusters linked both ways.
+    from pib.bulk import rebuild_link_counts
+    from pib.models import Entry, Link, Translation
+    from pib.plans import LANGS
+
+    rng = random.Random(seed)
+    begin = datetime(2017, 1, 1)
+    langs = ["en"] + LANGS
+    rows, translations, links = [], [], []
+    for idx in range(1, entries + 1):
+        lang = rng.choice(langs)
+        date = begin + timedelta(minutes=idx * 5 * 365 * 24 * 60 // entries)
+        rows.append({"id": idx, "lang": lang, "date": date, "content": "x"})
+        if lang != "en":
+            for model in ["mm-all", "mm-to-en"]:
+                translations.append(
+                    {"parent_id": idx, "model": model, "lang": "en", "translated": "x"}
+                )
+        for other in range(max(1, idx - 3), idx):
+            links.append({"first_id": idx, "second_id": other})
+            links.append({"first_id": other, "second_id": idx})
+
+    with engine.begin() as connection:
+        connection.execute(Entry.__table__.insert(), rows)
+        connection.execute(Translation.__table__.insert(), translations)
+        connection.execute(Link.__table__.insert(), links)
+        rebuild_link_counts(connection)
+        connection.execute("ANALYZE")
+    return len(rows), len(translations), len(links)
+
+
+def measure(engine, entries, repeats):
+    from pib.plans import check_plan, explain, hot_queries
+
+    rng = random.Random(7)
+    timings = {}
+    with engine.connect() as connection:
+        for _ in range(repeats):
+            day = datetime(2017, 1, 1) + timedelta(days=rng.randrange(5 * 365))
+            queries = hot_queries(entry_id=rng.randrange(1, entries), day=day)
+            for name, (query, _, _) in queries.items():
+                start = time.time()
+                connection.execute(query).fetchall()
+                timings.setdefault(name, []).append(time.time() - start)
+
+        plans = {
+            name: (
+                "ok"
+                if not check_plan(explain(connection, query), indexes, walk)
+                else "FAIL"
+            )
+            for name, (query, indexes, walk) in hot_queries().items()
+        }
+
+    return {
+        name: (1000 * sorted(values)[len(values) // 2], plans[name])
+        for name, values in timings.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app binds its DB at import, keep it out of the tree.
+        os.environ["PIB_DATABASE_URI"] = "sqlite:///{}".format(
+            os.path.join(workdir, "app.db")
+        )
+        from pib import db
+
+        engine = create_engine("sqlite:///{}".format(os.path.join(workdir, "x.db")))
+        db.Model.metadata.create_all(engine)
+        with engine.begin() as connection:
+            for index in NEW_INDEXES:
+                connection.execute("DROP INDEX {}".format(index))
+
+        start = time.time()
+        counts = populate(engine, args.entries)
+        print(
+            "{} entries, {} translations, {} links in {:.1f}s".format(
+                *counts, time.time() - start
+            )
+        )
+        before = measure(engine, args.entries, args.repeats)
+
+        start = time.time()
+        for table in db.Model.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name in NEW_INDEXES:
+                    index.create(engine)
+        with engine.begin() as connection:
+            connection.execute("ANALYZE")
+        print("indexes built in {:.1f}s".format(time.time() - start))
+        after = measure(engine, args.entries, args.repeats)
+
+        print("{:<45} {:>16} {:>16}".format("median ms", "before", "after"))
+        for name in before:
+            print(
+                "{:<45} {:>10.3f} {:>5} {:>10.3f} {:>5}".format(
+                    name, *before[name], *after[name]
+                )
+            )
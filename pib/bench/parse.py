@@ -0,0 +1,88 @@
+import os
+import resource
+import time
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+from pib.bench.standin import SyntheticSite
+from pib.cli.extract import EXTRACTORS
+from pib.cli.page_cache import PageCache
+from pib.cli.scrape import CachedCrawler
+
+
+def load_corpus(args):
+    if args.pages_dir:
+        corpus = []
+        for fname in sorted(os.listdir(args.pages_dir)):
+            key, ext = os.path.splitext(fname)
+            if ext == ".html":
+                with open(os.path.join(args.pages_dir, fname)) as fp:
+                    corpus.append((key, fp.read()))
+        return corpus
+
+    if args.cache:
+        cache = PageCache("{}.pages.lmdb".format(args.cache))
+        return [(key, cache.get(key)) for key in cache.keys()][: args.count]
+
+    site = SyntheticSite(0, args.count)
+    return [(str(prid), site.get(prid)) for prid in range(args.count)]
+
+
+def measure(backend, corpus):
+    # Runs in a fresh process so ru_maxrss reflects this backend alone.
+    extract = EXTRACTORS[backend]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    failed = 0
+    for key, page in corpus:
+        try:
+            extract(page)
+        except Exception:
+            failed += 1
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, failed, (peak - baseline) / 1024
+
+
+def check(corpus, reference="bs4"):
+    # Every backend must produce the same PIBArticle as the reference.
+    mismatches = 0
+    for key, page in corpus:
+        expected = CachedCrawler.parse(key, page, parser=reference)
+        expected = None if expected is None else expected.as_dict()
+        for backend in EXTRACTORS:
+            article = CachedCrawler.parse(key, page, parser=backend)
+            article = None if article is None else article.as_dict()
+            if article != expected:
+                mismatches += 1
+                print("{}: {} differs from {}".format(key, backend, reference))
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages-dir", help="Directory of saved <PRID>.html pages")
+    parser.add_argument("--cache", help="Crawl --path whose page cache is read")
+    parser.add_argument("--count", help="Pages in the corpus", type=int, default=2000)
+    parser.add_argument(
+        "--check", help="Verify all backends agree on fields", action="store_true"
+    )
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    print("corpus: {} pages".format(len(corpus)))
+
+    if args.check:
+        mismatches = check(corpus)
+        print("check: {} mismatches".format(mismatches))
+        if mismatches:
+            raise SystemExit(1)
+
+    for backend in sorted(EXTRACTORS):
+        with Pool(1) as pool:
+            elapsed, failed, peak = pool.apply(measure, (backend, corpus))
+        print(
+            "{}: {:.1f} pages/s, {} failed, peak +{:.1f} MiB".format(
+                backend, len(corpus) / elapsed, failed, peak
+            )
+        )
@@ -0,0 +1,75 @@
+from argparse import ArgumentParser
+
+from pib.bench.standin import StandIn, SyntheticSite
+from pib.cli.extract import extract_lxml
+from pib.cli.scheduler import LinkGuidedScheduler
+from pib.cli.scrape import CachedCrawler
+
+
+def crawl(site, keys, schedule, url_format):
+    """
+    Crawls `keys` serially and records, after every request, how many
+    articles and complete multilingual clusters have been collected.
+    """
+    crawler = CachedCrawler(None, url_format=url_format)
+    fetched = set()
+    scheduler = None
+    if schedule == "links":
+        scheduler = LinkGuidedScheduler(keys, accept=lambda key: key not in fetched)
+
+    clusters = {}
+    for prid, links in site.clusters.items():
+        clusters.setdefault(id(links), set(map(str, links.values())))
+
+    complete, timeline = 0, []
+    for key, page in crawler.fetch_all(scheduler or keys):
+        if isinstance(page, str):
+            fetched.add(key)
+            links = extract_lxml(page)["links"]
+            if scheduler is not None:
+                scheduler.discover(links.values())
+            cluster = clusters[id(site.clusters[int(key)])]
+            if cluster <= fetched:
+                complete += 1
+        if scheduler is not None:
+            scheduler.done(key)
+        timeline.append((len(fetched), complete))
+    return timeline, len(clusters)
+
+
+def report(schedule, timeline, total_clusters):
+    for fraction in [0.5, 0.9, 1.0]:
+        target = fraction * total_clusters
+        for requests, (articles, complete) in enumerate(timeline, 1):
+            if complete >= target:
+                print(
+                    "{}: {:.0%} of clusters after {} requests, "
+                    "{:.2f} requests per article".format(
+                        schedule, fraction, requests, requests / max(articles, 1)
+                    )
+                )
+                break
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--begin", type=int, default=0)
+    parser.add_argument("--count", help="PRIDs in the range", type=int, default=5000)
+    parser.add_argument(
+        "--density", help="Fraction of PRIDs that exist", type=float, default=0.3
+    )
+    parser.add_argument("--max-cluster", type=int, default=6)
+    args = parser.parse_args()
+
+    end = args.begin + args.count
+    site = SyntheticSite(
+        args.begin, end, density=args.density, max_cluster=args.max_cluster
+    )
+    print("site: {} articles over {} PRIDs".format(len(site.clusters), args.count))
+
+    for schedule in ["range", "links"]:
+        keys = [str(prid) for prid in range(args.begin, end)]
+        with StandIn(site) as standin:
+            timeline, total = crawl(site, keys, schedule, standin.url_format)
+            assert standin.requests == len(timeline)
+        report(schedule, timeline, total)
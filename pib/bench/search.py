@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import create_engine
+
+
+def corpus(entries, words, vocabulary, seed=42):
+    # Zipf-ish term frequencies over five years in 11 languages.
+    from pib.plans import LANGS
+
+    rng = random.Random(seed)
+    terms = ["w{}".format(rank) for rank in range(vocabulary)]
+    cum_weights = list(accumulate(1.0 / (rank + 1) for rank in range(vocabulary)))
+    begin = datetime(2017, 1, 1)
+    for idx in range(1, entries + 1):
+        content = " ".join(rng.choices(terms, cum_weights=cum_weights, k=words))
+        yield {
+            "id": idx,
+            "lang": rng.choice(["en"] + LANGS),
+            "date": begin + timedelta(minutes=idx * 5 * 365 * 24 * 60 // entries),
+            "content": content,
+        }
+
+
+def timed(connection, repeats, **kwargs):
+    from pib.search import search
+
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        search(connection, **kwargs)
+        times.append(1000 * (time.time() - start))
+    times.sort()
+    return times[len(times) // 2], times[int(0.9 * len(times))]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--words", help="Words per entry", type=int, default=150)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app binds its DB at import, keep it out of the tree.
+        os.environ["PIB_DATABASE_URI"] = "sqlite:///{}".format(
+            os.path.join(workdir, "app.db")
+        )
+        from pib import db, search
+        from pib.models import Entry
+
+        engine = create_engine("sqlite:///{}".format(os.path.join(workdir, "x.db")))
+        db.Model.metadata.create_all(engine)
+
+        start = time.time()
+        rows = list(corpus(args.entries, args.words, args.vocabulary))
+        with engine.begin() as connection:
+            connection.execute(Entry.__table__.insert(), rows)
+        print("{} entries in {:.1f}s".format(len(rows), time.time() - start))
+
+        start = time.time()
+        with engine.begin() as connection:
+            search.create_index(connection)
+            search.rebuild(connection, "entry_fts")
+            search.optimize(connection, "entry_fts")
+        print("backfill in {:.1f}s".format(time.time() - start))
+
+        june = dict(begin=datetime(2019, 6, 1), end=datetime(2019, 7, 1))
+        cases = [
+            ("rare term", dict(q="w40000")),
+            ("mid term", dict(q="w2000")),
+            ("common term", dict(q="w10")),
+            ("common, capped", dict(q="w10", max_ranked=5000)),
+            ("two terms", dict(q="w10 w2000")),
+            ("prefix", dict(q="w4000*")),
+            ("common + lang", dict(q="w10", lang="hi")),
+            ("common + month", dict(q="w10", **june)),
+            ("mid, page 10", dict(q="w2000", page=10)),
+        ]
+        print("{:<16} {:>8} {:>8}".format("ms", "p50", "p90"))
+        with engine.connect() as connection:
+            for name, kwargs in cases:
+                p50, p90 = timed(connection, args.repeats, **kwargs)
+                print("{:<16} {:>8.1f} {:>8.1f}".format(name, p50, p90))
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import and_, create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def setup(engine, articles):
+    from pib import db, search
+    from pib.models import Entry
+
+    db.Model.metadata.drop_all(engine)
+    db.Model.metadata.create_all(engine)
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            search.create_index(connection)
+        connection.execute(
+            Entry.__table__.insert(),
+            [{"id": idx, "lang": "hi", "content": "x"} for idx in range(articles)],
+        )
+
+
+def translations(args):
+    # A stand-in translator: `latency` seconds per batch of articles.
+    line = "A synthetic translated line for the sink benchmark."
+    translated = "\n".join([line] * (args.size // len(line)))
+    for first in range(0, args.articles, args.batch):
+        time.sleep(args.latency)
+        for idx in range(first, min(first + args.batch, args.articles)):
+            yield idx, translated
+
+
+def per_entry(engine, args):
+    # What translate_pib did before: a lookup and a commit per article.
+    from pib.models import Translation
+
+    session = sessionmaker(bind=engine)()
+    for idx, translated in translations(args):
+        translation = (
+            session.query(Translation)
+            .filter(
+                and_(
+                    Translation.parent_id == idx,
+                    Translation.model == "bench",
+                    Translation.lang == "en",
+                )
+            )
+            .first()
+        )
+        if translation is None:
+            translation = Translation(parent_id=idx, model="bench", lang="en")
+        translation.translated = translated
+        session.add(translation)
+        session.commit()
+    session.close()
+
+
+def write_behind(engine, args):
+    from pib.bulk import WriteBehind
+    from pib.models import Translation
+
+    table = Translation.__table__
+    with WriteBehind(engine, table, ["parent_id", "model"], args.sink_batch) as sink:
+        for idx, translated in translations(args):
+            sink.put(
+                {
+                    "parent_id": idx,
+                    "model": "bench",
+                    "lang": "en",
+                    "translated": translated,
+                    "codec": None,
+                }
+            )
+
+
+def no_sink(engine, args):
+    for _ in translations(args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--postgres",
+        help="URI of a scratch PostgreSQL DB, its tables are dropped",
+        type=str,
+    )
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--batch", help="Articles per batch", type=int, default=50)
+    parser.add_argument(
+        "--latency", help="Seconds per translated batch", type=float, default=0.05
+    )
+    parser.add_argument("--size", help="Bytes per translation", type=int, default=3000)
+    parser.add_argument("--sink-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app binds its DB at import, keep it out of the tree.
+        os.environ["PIB_DATABASE_URI"] = "sqlite:///{}".format(
+            os.path.join(workdir, "app.db")
+        )
+        uris = ["sqlite:///{}".format(os.path.join(workdir, "bench.db"))]
+        if args.postgres:
+            uris.append(args.postgres)
+
+        for uri in uris:
+            engine = create_engine(uri)
+            name = engine.dialect.name
+            for label, run in [
+                ("commit per entry", per_entry),
+                ("write-behind sink", write_behind),
+                ("no sink", no_sink),
+            ]:
+                setup(engine, args.articles)
+                start = time.time()
+                run(engine, args)
+                rate = args.articles / (time.time() - start)
+                print("{:<10} {:<20} {:>10.1f} articles/s".format(name, label, rate))
+            engine.dispose()
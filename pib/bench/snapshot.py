@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+from sqlalchemy import and_, create_engine, select
+
+from .compression import corpus
+
+
+def populate(engine, entries, words, links):
+    from pib import bulk
+    from pib.models import Entry, Link, Translation
+
+    rng = random.Random(42)
+    start = datetime(2015, 1, 1)
+    rows = list(corpus(entries, words, vocabulary=20000))
+    for row in rows:
+        row["date"] = start + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+    edges = {(rng.randint(1, entries), rng.randint(1, entries)) for _ in range(links)}
+    with engine.begin() as connection:
+        connection.execute(Entry.__table__.insert(), rows)
+        connection.execute(
+            Translation.__table__.insert(),
+            [
+                {
+                    "parent_id": row["id"],
+                    "model": "bench",
+                    "lang": "en",
+                    "translated": row["content"],
+                }
+                for row in rows
+                if row["lang"] != "en"
+            ],
+        )
+        connection.execute(
+            Link.__table__.insert(), [{"first_id": u, "second_id": v} for u, v in edges]
+        )
+        bulk.rebuild_link_counts(connection)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--words", help="Words per entry", type=int, default=600)
+    parser.add_argument("--links", type=int, default=200000)
+    parser.add_argument("--compression", default="snappy")
+    args = parser.parse_args()
+
+    from pib import db
+    from pib.models import Entry, Link
+    from pib.snapshot import Snapshot, write
+    from pib.storage import stream
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, "bench.db")
+        engine = create_engine("sqlite:///{}".format(database))
+        db.Model.metadata.create_all(engine)
+        populate(engine, args.entries, args.words, args.links)
+
+        path = os.path.join(workdir, "snapshot")
+        start = time.time()
+        manifest = write(engine, path, compression=args.compression, log=lambda _: 0)
+        size = sum(
+            parquet["bytes"]
+            for table in manifest["tables"].values()
+            for parquet in table["files"]
+        )
+        print(
+            "snapshot {:.1f} MiB in {:.1f}s, db {:.1f} MiB".format(
+                size / 2**20, time.time() - start, os.path.getsize(database) / 2**20
+            )
+        )
+        snapshot = Snapshot(path)
+
+        def live(*columns):
+            return lambda: list(stream(engine, select(columns)))
+
+        def arrow(table, columns):
+            return lambda: pa.Table.from_batches(
+                snapshot.batches(table, columns=columns)
+            )
+
+        def rows(table, columns):
+            return lambda: list(snapshot.rows(table, columns=columns))
+
+        cases = [
+            ("entry.content", "entry", ["id", "content"]),
+            ("entry metadata", "entry", ["id", "lang", "date"]),
+            ("link", "link", ["first_id", "second_id"]),
+        ]
+        print(
+            "{:<16} {:>12} {:>12} {:>12}".format("", "live /s", "rows() /s", "Arrow /s")
+        )
+        for label, table, columns in cases:
+            model = Entry if table == "entry" else Link
+            count = manifest["tables"][table]["rows"]
+            scans = [
+                live(*[getattr(model, name) for name in columns]),
+                rows(table, columns),
+                arrow(table, columns),
+            ]
+            rates = []
+            for scan in scans:
+                start = time.time()
+                result = scan()
+                assert len(result) == count, (label, len(result), count)
+                rates.append(count / (time.time() - start))
+            print("{:<16} {:>12.0f} {:>12.0f} {:>12.0f}".format(label, *rates))
+
+        # Pruning to a window reads only that month's row groups.
+        begin, end = datetime(2017, 3, 1), datetime(2017, 4, 15)
+        query = select([Entry.id]).where(
+            and_(Entry.lang == "hi", Entry.date >= begin, Entry.date < end)
+        )
+        with engine.connect() as connection:
+            expected = sorted(row.id for row in connection.execute(query))
+        window = snapshot.rows("entry", ["hi"], begin, end, ["id"])
+        assert sorted(row.id for row in window) == expected
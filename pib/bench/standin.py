@@ -0,0 +1,254 @@
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+LANGUAGES = [
+    "English",
+    "Hindi",
+    "Tamil",
+    "Telugu",
+    "Malayalam",
+    "Bengali",
+    "Gujarati",
+    "Marathi",
+    "Punjabi",
+    "Odia",
+    "Urdu",
+]
+
+PAGE_TEMPLATE = """<html>
+<head><title>Press Information Bureau</title></head>
+<body>
+<div class="ReleaseLang">Read this release in: {links}</div>
+<div class="MinistryNameSubhead">{ministry}</div>
+<div class="ReleaseDateSubHeaddateTime">Posted On: {date} by PIB {place}</div>
+<div id="PdfDiv">
+{content}
+</div>
+</body>
+</html>
+"""
+
+PATH = "/PressReleasePage.aspx"
+
+
+def render_page(links, ministry, date, place, content):
+    anchors = " ".join(
+        '<a href="{}?PRID={}">{}</a>'.format(PATH, prid, lang)
+        for lang, prid in links.items()
+    )
+    paragraphs = "\n".join("<p>{}</p>".format(line) for line in content.splitlines())
+    return PAGE_TEMPLATE.format(
+        links=anchors, ministry=ministry, date=date, place=place, content=paragraphs
+    )
+
+
+class DirectoryPages:
+    """Canned pages saved as `<PRID>.html` under a directory."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get(self, prid):
+        fpath = os.path.join(self.path, "{}.html".format(prid))
+        if not os.path.exists(fpath):
+            return None
+        with open(fpath) as fp:
+            return fp.read()
+
+
+class SyntheticSite:
+    """
+    Deterministic stand-in for pib.gov.in over the PRID range [begin, end).
+    Only a `density` fraction of IDs exist, and existing IDs are grouped
+    into multilingual clusters linked to each other through ReleaseLang.
+    """
+
+    def __init__(self, begin, end, density=1.0, max_cluster=4, seed=42):
+        rng = random.Random(seed)
+        present = [prid for prid in range(begin, end) if rng.random() < density]
+        rng.shuffle(present)
+
+        self.clusters = {}
+        self.langs = {}
+        while present:
+            size = rng.randint(1, max_cluster)
+            cluster, present = present[:size], present[size:]
+            langs = rng.sample(LANGUAGES, len(cluster))
+            links = dict(zip(langs, cluster))
+            for lang, prid in links.items():
+                self.clusters[prid] = links
+                self.langs[prid] = lang
+
+    def __contains__(self, prid):
+        return prid in self.clusters
+
+    def get(self, prid):
+        if prid not in self.clusters:
+            return None
+
+        links = {
+            lang: other for lang, other in self.clusters[prid].items() if other != prid
+        }
+        line = "Release {} in {} on the synthetic stand-in site.".format(
+            prid, self.langs[prid]
+        )
+        return render_page(
+            links,
+            ministry="Ministry of Synthetic Affairs",
+            date="18 JUN 2020 5:30PM",
+            place="Delhi",
+            content="\n".join([line] * 20),
+        )
+
+
+class PublishingSite:
+    """
+    Wraps a SyntheticSite so that its IDs from `live` onwards go out at
+    `rate` releases per second after start(), roughly in PRID order, with
+    each shifted by up to `jitter` slots. IDs below `live` are published
+    from the outset.
+    """
+
+    def __init__(self, site, live, rate=2.0, jitter=3, seed=42):
+        rng = random.Random(seed)
+        self.site = site
+        self.rate = rate
+        upcoming = sorted(prid for prid in site.clusters if prid >= live)
+        self.offsets = {
+            prid: max(0.0, (i + rng.uniform(-jitter, jitter)) / rate)
+            for i, prid in enumerate(upcoming)
+        }
+        self.started = None
+
+    def start(self):
+        self.started = time.time()
+        return self
+
+    def published_at(self, prid):
+        if prid not in self.site:
+            return None
+        if prid not in self.offsets:
+            return 0.0
+        if self.started is None:
+            return None
+        return self.started + self.offsets[prid]
+
+    def get(self, prid):
+        published = self.published_at(prid)
+        if published is None or published > time.time():
+            return None
+        return self.site.get(prid)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing pooled keep-alive connections is not an error here.
+        pass
+
+
+class StandIn:
+    """
+    Local HTTP server answering PressReleasePage.aspx?PRID=<id> from
+    `pages`, with keep-alive and an optional artificial latency per
+    request. Missing IDs are answered with 404. With `capacity` set, a
+    request arriving while that many are already in flight gets a 503, as
+    an overloaded site would answer. `failures` maps PRIDs to the number
+    of 503s answered for them before their page is served.
+    """
+
+    def __init__(
+        self,
+        pages,
+        latency=0.0,
+        capacity=None,
+        failures=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.pages = pages
+        self.latency = latency
+        self.capacity = capacity
+        self.failures = dict(failures or {})
+        self.requests = 0
+        self.rejected = 0
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with standin._lock:
+                    standin.requests += 1
+                    standin.inflight += 1
+                    overloaded = (
+                        standin.capacity is not None
+                        and standin.inflight > standin.capacity
+                    )
+                    if overloaded:
+                        standin.rejected += 1
+
+                try:
+                    if standin.latency:
+                        time.sleep(standin.latency)
+                    status, body = self.respond(overloaded)
+                finally:
+                    with standin._lock:
+                        standin.inflight -= 1
+
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def respond(self, overloaded):
+                if overloaded:
+                    return 503, b"Service Unavailable"
+
+                url = urlparse(self.path)
+                prid = parse_qs(url.query).get("PRID", [None])[0]
+                page = None
+                if url.path == PATH and prid and prid.isdigit():
+                    with standin._lock:
+                        failing = standin.failures.get(int(prid), 0)
+                        if failing:
+                            standin.failures[int(prid)] = failing - 1
+                    if failing:
+                        return 503, b"Service Unavailable"
+                    page = standin.pages.get(int(prid))
+
+                status = 404 if page is None else 200
+                return status, (page or "Not Found").encode("utf-8")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url_format(self):
+        host, port = self.server.server_address
+        return "http://{}:{}{}?PRID={{}}".format(host, port, PATH)
+
+    def __enter__(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="standin", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.server.shutdown()
+        self.server.server_close()
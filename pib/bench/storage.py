@@ -0,0 +1,122 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+
+def rows(count, size):
+    line = "A synthetic release line for the storage benchmark."
+    content = "\n".join([line] * (size // len(line)))
+    for idx in range(count):
+        yield {
+            "id": idx,
+            "lang": "hi",
+            "content": content,
+            "place": "Delhi",
+        }
+
+
+def reader(engine, table, count, stop, stats):
+    # Point lookups while the writer runs, as the web app would do.
+    with engine.connect() as connection:
+        while not stop.is_set():
+            try:
+                connection.execute(
+                    table.select().where(table.c.id == random.randrange(count))
+                ).fetchall()
+                stats["reads"] += 1
+            except OperationalError:
+                stats["locked"] += 1
+
+
+def bench(profile, workdir, args):
+    from pib.models import Entry
+    from pib.storage import use_profile
+
+    use_profile(profile)
+    engine = create_engine(
+        "sqlite:///{}".format(os.path.join(workdir, "{}.db".format(profile)))
+    )
+
+    # The same wait on locks for every profile, after the profile's own
+    # PRAGMAs, so that locked reads compare journaling alone.
+    @event.listens_for(engine, "connect")
+    def busy_timeout(connection, record):
+        connection.execute("PRAGMA busy_timeout={}".format(args.busy_timeout))
+
+    table = Entry.__table__
+    table.create(engine)
+
+    stop, stats = threading.Event(), {"reads": 0, "locked": 0}
+    thread = threading.Thread(
+        target=reader, args=(engine, table, args.rows, stop, stats)
+    )
+    thread.start()
+
+    start = time.time()
+    batch = []
+    for row in rows(args.rows, args.row_size):
+        batch.append(row)
+        if len(batch) == args.commit_every:
+            with engine.begin() as connection:
+                connection.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        with engine.begin() as connection:
+            connection.execute(table.insert(), batch)
+    insert_elapsed = time.time() - start
+    stop.set()
+    thread.join()
+
+    with engine.connect() as connection:
+        start = time.time()
+        for _ in range(args.lookups):
+            connection.execute(
+                table.select().where(table.c.id == random.randrange(args.rows))
+            ).fetchall()
+        lookup_elapsed = time.time() - start
+
+        start = time.time()
+        connection.execute("SELECT sum(length(content)) FROM entry").fetchall()
+        scan_elapsed = time.time() - start
+
+    print(
+        "{:>6}: insert {:.0f} rows/s | concurrent reads {:.0f}/s, {} locked | "
+        "lookups {:.0f}/s | scan {:.0f} rows/s".format(
+            profile,
+            args.rows / insert_elapsed,
+            stats["reads"] / insert_elapsed,
+            stats["locked"],
+            args.lookups / lookup_elapsed,
+            args.rows / scan_elapsed,
+        )
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--row-size", help="Bytes of content", type=int, default=4000)
+    parser.add_argument("--commit-every", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument(
+        "--busy-timeout", help="Milliseconds, every profile", type=int, default=10000
+    )
+    parser.add_argument(
+        "--profiles", nargs="+", default=["legacy", "wal", "bulk"], type=str
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The app binds its DB at import, keep it out of the tree.
+        os.environ["PIB_DATABASE_URI"] = "sqlite:///{}".format(
+            os.path.join(workdir, "app.db")
+        )
+        for profile in args.profiles:
+            bench(profile, workdir, args)
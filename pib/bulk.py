@@ -0,0 +1,341 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from io import StringIO
+from itertools import islice
+
+from sqlalchemy import bindparam, text
+
+from . import compression, db
+from .models import Entry, Link
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_value(value):
+    # COPY's text format: \N for NULL, backslash escapes for the rest.
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+# PostgreSQL enforces link's foreign keys, SQLite never did. Links to
+# entries not in the DB yet are left out; they stay in the adjacency
+# journal, which the next insert_links() goes over again.
+LINKED = (
+    "EXISTS (SELECT 1 FROM entry WHERE entry.id = first_id) "
+    "AND EXISTS (SELECT 1 FROM entry WHERE entry.id = second_id)"
+)
+
+
+def copy_rows(connection, table, columns, rows, where="true"):
+    """
+    PostgreSQL: COPYs `rows` (tuples in the order of `columns`) into a
+    temporary table, then moves those matching `where` into `table` with
+    one INSERT ... ON CONFLICT DO NOTHING, the counterpart of SQLite's
+    INSERT OR IGNORE. Runs in the caller's transaction. Returns the
+    number of new rows.
+    """
+    staging = "staging_{}".format(table)
+    columns = ", ".join(columns)
+    connection.execute(
+        "CREATE TEMPORARY TABLE IF NOT EXISTS {staging} "
+        "AS SELECT {columns} FROM {table} WITH NO DATA".format(
+            staging=staging, columns=columns, table=table
+        )
+    )
+    buffer = StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert("COPY {} ({}) FROM STDIN".format(staging, columns), buffer)
+    result = connection.execute(
+        "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+        "WHERE {where} ON CONFLICT DO NOTHING".format(
+            table=table, columns=columns, staging=staging, where=where
+        )
+    )
+    connection.execute("TRUNCATE {}".format(staging))
+    return result.rowcount
+
+
+def upsert(connection, table, rows, keys):
+    """
+    Inserts `rows` (dicts) into `table`, updating the ones whose `keys`
+    are there already with INSERT ... ON CONFLICT (keys) DO UPDATE. On
+    SQLite (3.24+) this updates the row in place, where INSERT OR REPLACE
+    would delete it behind the back of the full-text index triggers.
+    """
+    names = list(rows[0])
+    updates = [name for name in names if name not in keys]
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: statement.excluded[name] for name in updates},
+        )
+    else:
+        statement = text(
+            "INSERT INTO {table} ({names}) VALUES ({values}) "
+            "ON CONFLICT ({keys}) DO UPDATE SET {updates}".format(
+                table=table.name,
+                names=", ".join(names),
+                values=", ".join(":" + name for name in names),
+                keys=", ".join(keys),
+                updates=", ".join(
+                    "{0} = excluded.{0}".format(name) for name in updates
+                ),
+            )
+        )
+    connection.execute(statement, rows)
+
+
+class WriteBehind:
+    """
+    Upserts rows into `table` from a thread of its own, so that the
+    producer does not wait on the database, compressing their text as
+    the models would (pib.compression). Rows are written `batch_size`
+    at a time, or whatever came in `interval` seconds, one transaction
+    per batch; a row with the same `keys` as one still pending replaces
+    it. put() blocks only once `max_pending` rows are queued and raises
+    what the writer failed with, if it did. close() writes the rest.
+    """
+
+    def __init__(
+        self, engine, table, keys, batch_size=500, interval=5.0, max_pending=5000
+    ):
+        self.engine = engine
+        self.table = table
+        self.keys = keys
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.written, self.batches = 0, 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # The rest is written either way; a failed write is only raised
+        # when it would not replace an exception from the block.
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+    def put(self, row):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(row)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        closed = False
+        while not closed:
+            pending = {}
+            deadline = time.time() + self.interval
+            while len(pending) < self.batch_size:
+                try:
+                    row = self.queue.get(timeout=max(deadline - time.time(), 0))
+                except queue.Empty:
+                    break
+                if row is None:
+                    closed = True
+                    break
+                pending[tuple(row[key] for key in self.keys)] = row
+            # After a failure rows are taken off the queue and dropped,
+            # put() raises in the producer.
+            if pending and self.error is None:
+                try:
+                    with self.engine.begin() as connection:
+                        rows = list(pending.values())
+                        compression.compress_rows(connection, self.table.name, rows)
+                        upsert(connection, self.table, rows, self.keys)
+                    self.written += len(pending)
+                    self.batches += 1
+                except Exception as e:
+                    logging.exception("Write-behind to {} failed".format(self.table))
+                    self.error = e
+
+
+def insert_links(edges, batch_size=50000):
+    """
+    Streams `(first_id, second_id)` pairs into `link` in large batches,
+    executemany on SQLite and COPY on PostgreSQL. Duplicates are dropped
+    by the database through the `unique_first_second` constraint instead
+    of a SELECT per edge. Entry.link_count of the first entries is
+    recounted in the same transaction. Returns the number of edges seen
+    and the number actually inserted.
+    """
+    statement = Link.__table__.insert().prefix_with("OR IGNORE", dialect="sqlite")
+
+    start = time.time()
+    seen, inserted = 0, 0
+    for batch in batched(edges, batch_size):
+        rows = [(int(u), int(v)) for u, v in batch]
+        connection = db.session.connection()
+        if connection.dialect.name == "postgresql":
+            count = copy_rows(
+                connection, "link", ["first_id", "second_id"], rows, LINKED
+            )
+        else:
+            keys = [{"first_id": u, "second_id": v} for u, v in rows]
+            count = db.session.execute(statement, keys).rowcount
+        update_link_counts(db.session, {u for u, v in rows})
+        db.session.commit()
+        seen += len(rows)
+        inserted += max(count, 0)
+
+    elapsed = max(time.time() - start, 1e-9)
+    logging.info(
+        "Links: {} edges, {} new, {:.0f} edges/s".format(seen, inserted, seen / elapsed)
+    )
+    return seen, inserted
+
+
+def _recount(where):
+    # One lookup on the unique_first_second index per entry.
+    return text(
+        "UPDATE entry SET link_count = "
+        "(SELECT count(*) FROM link WHERE link.first_id = entry.id) "
+        "WHERE " + where
+    )
+
+
+def update_link_counts(connection, ids, batch_size=500):
+    """
+    Recounts Entry.link_count for `ids`. Counting again, rather than
+    adding what was inserted, stays right when an edge was already there.
+    """
+    ids = sorted(ids)
+    for batch in batched(ids, batch_size):
+        connection.execute(
+            _recount("entry.id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": batch},
+        )
+
+
+def rebuild_link_counts(connection):
+    # Every entry at once, for DBs filled before the column existed.
+    result = connection.execute(_recount("1 = 1"))
+    return result.rowcount
+
+
+def merge_sqlite_shard(db_path, tables=("entry", "link"), batch_size=10000):
+    """
+    Folds the rows of `tables` in a crawl shard's SQLite file into the app
+    database, keeping rows present in both once. Returns the number of
+    new rows per table.
+    """
+    if db.engine.dialect.name == "sqlite":
+        return _attach_shard(db_path, tables)
+    return _copy_shard(db_path, tables, batch_size)
+
+
+SHARD_TABLES = {
+    "entry": [column.name for column in Entry.__table__.columns],
+    # Link ids are local to each shard, the unique pair is the identity.
+    "link": ["first_id", "second_id"],
+}
+
+# Shard text goes in plain, codec ids point into the shard's own
+# zstd_dictionary and mean nothing in the app database.
+SHARD_TEXT = {"content": "pib_shard_text(content, codec)", "codec": "NULL"}
+
+
+def _shard_text(connection, shard):
+    # pib_shard_text(value, codec) on `connection`, decoding with the
+    # dictionaries of `shard`, an sqlite3 connection to the shard file.
+    def execute(statement, params):
+        return shard.execute(statement, params).fetchone()
+
+    connection.create_function("pib_shard_text", 2, compression.decoder(execute))
+
+
+def _attach_shard(db_path, tables):
+    inserted = {}
+    shard = sqlite3.connect(db_path)
+    with db.engine.connect() as connection:
+        _shard_text(connection.connection, shard)
+        connection.execute("ATTACH DATABASE ? AS shard", (db_path,))
+        try:
+            with connection.begin():
+                for table in tables:
+                    columns = SHARD_TABLES[table]
+                    selects = [SHARD_TEXT.get(column, column) for column in columns]
+                    result = connection.execute(
+                        "INSERT OR IGNORE INTO {table} ({columns}) "
+                        "SELECT {selects} FROM shard.{table}".format(
+                            table=table,
+                            columns=", ".join(columns),
+                            selects=", ".join(selects),
+                        )
+                    )
+                    inserted[table] = result.rowcount
+                # The shard's counts only know the shard's links.
+                connection.execute(
+                    _recount("entry.id IN (SELECT first_id FROM shard.link)")
+                )
+        finally:
+            connection.execute("DETACH DATABASE shard")
+            connection.connection.create_function("pib_shard_text", 2, None)
+            shard.close()
+    return inserted
+
+
+def _copy_shard(db_path, tables, batch_size):
+    # Rows are read off the shard file and COPYed in, the text
+    # decompressed on the way since compression is SQLite only.
+    shard = sqlite3.connect(db_path)
+    _shard_text(shard, shard)
+
+    inserted, firsts = {}, set()
+    try:
+        with db.engine.begin() as connection:
+            for table in tables:
+                columns = SHARD_TABLES[table]
+                selects = [SHARD_TEXT.get(column, column) for column in columns]
+                cursor = shard.execute(
+                    "SELECT {} FROM {}".format(", ".join(selects), table)
+                )
+                inserted[table] = 0
+                for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+                    where = LINKED if table == "link" else "true"
+                    inserted[table] += copy_rows(
+                        connection, table, columns, rows, where
+                    )
+                    if table == "link":
+                        firsts.update(row[0] for row in rows)
+            update_link_counts(connection, firsts)
+    finally:
+        shard.close()
+    return inserted
@@ -0,0 +1,131 @@
+"""
+Local archives of captured release pages, so a crawl can be replayed
+without the network and a live crawl can be recorded for later replays.
+Two formats are understood, picked by file name:
+
+* tar (optionally .gz/.bz2/.xz) of `<PRID>.html` members, at any depth.
+* WARC (.warc, .warc.gz) response records for PressReleasePage.aspx?PRID=,
+  which needs warcio.
+"""
+
+import io
+import os
+import tarfile
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+def _is_warc(path):
+    return path.endswith(".warc") or path.endswith(".warc.gz")
+
+
+def _prid_from_url(url):
+    prid = parse_qs(urlparse(url).query).get("PRID", [None])[0]
+    return prid if prid and prid.isdigit() else None
+
+
+class TarArchive:
+    def __init__(self, path):
+        self.path = path
+
+    def pages(self):
+        # Stream mode reads members in archive order without seeking.
+        with tarfile.open(self.path, "r|*") as tar:
+            for member in tar:
+                name = os.path.basename(member.name)
+                prid, ext = os.path.splitext(name)
+                if not member.isfile() or ext != ".html" or not prid.isdigit():
+                    continue
+                # Only None for members that are not files, skipped above.
+                fp = tar.extractfile(member)
+                yield prid, fp.read().decode("utf-8")  # pytype: disable=attribute-error
+
+
+class WarcArchive:
+    def __init__(self, path):
+        self.path = path
+
+    def pages(self):
+        from warcio.archiveiterator import ArchiveIterator
+
+        with open(self.path, "rb") as fp:
+            for record in ArchiveIterator(fp):
+                if record.rec_type != "response":
+                    continue
+                if record.http_headers.get_statuscode() != "200":
+                    continue
+                url = record.rec_headers.get_header("WARC-Target-URI")
+                prid = _prid_from_url(url)
+                if prid is not None:
+                    yield prid, record.content_stream().read().decode("utf-8")
+
+
+def open_archive(path):
+    return WarcArchive(path) if _is_warc(path) else TarArchive(path)
+
+
+def replay(archive, keys):
+    # Yields `(key, page)` for archived pages wanted, in archive order.
+    keys = set(keys)
+    for prid, page in archive.pages():
+        if prid in keys:
+            yield prid, page
+
+
+class TarWriter:
+    def __init__(self, path):
+        # Compressed tars cannot be appended to, a plain .tar is extended.
+        if path.endswith(".tar") and os.path.exists(path):
+            mode = "a"
+        else:
+            mode = "w:" + {".gz": "gz", ".bz2": "bz2", ".xz": "xz"}.get(
+                os.path.splitext(path)[1], ""
+            )
+        self.tar = tarfile.open(path, mode)
+
+    def add(self, key, page, url=None):
+        raw = page.encode("utf-8")
+        info = tarfile.TarInfo("{}.html".format(key))
+        info.size = len(raw)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, io.BytesIO(raw))
+
+    def close(self):
+        self.tar.close()
+
+
+class WarcWriter:
+    def __init__(self, path):
+        from warcio.warcwriter import WARCWriter
+
+        self.fp = open(path, "ab")
+        self.writer = WARCWriter(self.fp, gzip=path.endswith(".gz"))
+
+    def add(self, key, page, url=None):
+        from warcio.statusandheaders import StatusAndHeaders
+
+        raw = page.encode("utf-8")
+        headers = StatusAndHeaders(
+            "200 OK",
+            [("Content-Type", "text/html; charset=utf-8")],
+            protocol="HTTP/1.1",
+        )
+        record = self.writer.create_warc_record(
+            url, "response", payload=io.BytesIO(raw), http_headers=headers
+        )
+        self.writer.write_record(record)
+
+    def close(self):
+        self.fp.close()
+
+
+def archive_writer(path):
+    return WarcWriter(path) if _is_warc(path) else TarWriter(path)
+
+
+def recorded(source, writer, url_format):
+    # Passes `(key, page)` through, archiving every page fetched.
+    for key, page in source:
+        if isinstance(page, str):
+            writer.add(key, page, url_format.format(key))
+        yield key, page
@@ -0,0 +1,83 @@
+_POPCOUNT = bytes(bin(byte).count("1") for byte in range(256))
+
+
+class IdBitmap:
+    """
+    Set of integer PRIDs in [begin, end) kept as one bit per ID, so a
+    crawl range of a few hundred thousand IDs fits in tens of kilobytes.
+    Membership accepts the str keys the crawler uses as well as ints.
+    """
+
+    def __init__(self, begin, end):
+        self.begin = begin
+        self.end = end
+        self.bits = bytearray((end - begin + 7) // 8)
+
+    @classmethod
+    def frombytes(cls, begin, end, data):
+        bitmap = cls(begin, end)
+        bitmap.bits[:] = data
+        return bitmap
+
+    def tobytes(self):
+        return bytes(self.bits)
+
+    def resized(self, begin, end):
+        # Copy onto a new range, members outside it are dropped.
+        bitmap = IdBitmap(begin, end)
+        for prid in self:
+            bitmap.add(prid)
+        return bitmap
+
+    def _offset(self, prid):
+        prid = int(prid)
+        if not (self.begin <= prid < self.end):
+            return None
+        return prid - self.begin
+
+    def add(self, prid):
+        offset = self._offset(prid)
+        if offset is not None:
+            self.bits[offset >> 3] |= 1 << (offset & 7)
+
+    def discard(self, prid):
+        offset = self._offset(prid)
+        if offset is not None:
+            self.bits[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+
+    def __contains__(self, prid):
+        offset = self._offset(prid)
+        if offset is None:
+            return False
+        return bool(self.bits[offset >> 3] & (1 << (offset & 7)))
+
+    def __len__(self):
+        # Missing from pytype's bytearray stub.
+        return sum(self.bits.translate(_POPCOUNT))  # pytype: disable=attribute-error
+
+    def __iter__(self):
+        for index, byte in enumerate(self.bits):
+            while byte:
+                low = byte & -byte
+                yield self.begin + (index << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def first_missing(self, start=None):
+        # Lowest ID >= start not in the set, skipping full bytes at a time.
+        prid = self.begin if start is None else max(start, self.begin)
+        while prid < self.end:
+            offset = prid - self.begin
+            if offset & 7 == 0 and self.bits[offset >> 3] == 0xFF:
+                prid += 8
+                continue
+            if prid not in self:
+                return prid
+            prid += 1
+        return self.end
+
+    def missing(self, start=None):
+        prid = self.first_missing(start)
+        while prid < self.end:
+            if prid not in self:
+                yield prid
+            prid += 1
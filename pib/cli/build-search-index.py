@@ -0,0 +1,32 @@
+import time
+from argparse import ArgumentParser
+
+from .. import db, search
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Create the FTS5 search index if missing and backfill it "
+        "from the rows already in the DB."
+    )
+    parser.add_argument(
+        "--only", choices=sorted(search.INDEXES), default=None, help="One index"
+    )
+    parser.add_argument(
+        "--optimize", help="Merge the index into one b-tree", action="store_true"
+    )
+    args = parser.parse_args()
+
+    assert db.engine.dialect.name == "sqlite", "SQLite only"
+    indexes = [args.only] if args.only else list(search.INDEXES)
+    with db.engine.begin() as connection:
+        search.create_index(connection)
+        for fts in indexes:
+            table, column = search.INDEXES[fts]
+            (rows,) = connection.execute(
+                "SELECT count(*) FROM {}".format(table)
+            ).fetchone()
+            start = time.time()
+            search.rebuild(connection, fts)
+            if args.optimize:
+                search.optimize(connection, fts)
+            print("{}: {} rows in {:.1f}s".format(fts, rows, time.time() - start))
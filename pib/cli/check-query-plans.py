@@ -0,0 +1,28 @@
+import sys
+from argparse import ArgumentParser
+
+from .. import db
+from ..plans import check_plan, explain, hot_queries
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="EXPLAIN QUERY PLAN the hot lookups on the app DB, "
+        "exits non-zero if any of them falls back to a table scan."
+    )
+    parser.add_argument("--verbose", help="Print every plan", action="store_true")
+    args = parser.parse_args()
+
+    assert db.engine.dialect.name == "sqlite", "SQLite only"
+    failed = []
+    with db.engine.connect() as connection:
+        for name, (query, indexes, walk) in hot_queries().items():
+            details = explain(connection, query)
+            problems = check_plan(details, indexes, walk)
+            print("{}: {}".format(name, "FAIL" if problems else "ok"))
+            for detail in details if args.verbose else problems:
+                print("    {}".format(detail))
+            if problems:
+                failed.append(name)
+
+    if failed:
+        sys.exit("Plans without a usable index: {}".format(", ".join(failed)))
@@ -0,0 +1,75 @@
+from argparse import ArgumentParser
+
+from .. import compression, db
+from ..storage import bulk_load
+
+
+def report(table, stats):
+    for lang, (rows, plain, stored, elapsed) in sorted(stats.items()):
+        ratio = plain / stored if stored else 0.0
+        print(
+            "{}/{}: {} rows, {:.1f} -> {:.1f} MiB ({:.2f}x), {:.0f} rows/s".format(
+                table,
+                lang,
+                rows,
+                plain / 2**20,
+                stored / 2**20,
+                ratio,
+                rows / max(elapsed, 1e-9),
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="zstd compression of the text columns")
+    parser.add_argument(
+        "--tables", nargs="+", default=list(compression.COLUMNS), type=str
+    )
+    parser.add_argument("--langs", help="Only these languages", nargs="+", type=str)
+    parser.add_argument(
+        "--retrain",
+        help="Train new dictionaries and recompress, even where one exists",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--no-dictionary", help="Plain zstd, without dictionaries", action="store_true"
+    )
+    parser.add_argument(
+        "--decompress", help="Store the text uncompressed again", action="store_true"
+    )
+    parser.add_argument("--samples", help="Rows to train on", type=int, default=2000)
+    parser.add_argument(
+        "--dict-size", help="Bytes", type=int, default=compression.DICT_SIZE
+    )
+    parser.add_argument("--level", type=int, default=compression.LEVEL)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--bulk-load", action="store_true")
+    args = parser.parse_args()
+
+    assert db.engine.dialect.name == "sqlite", "SQLite only"
+    with bulk_load(db.engine, args.bulk_load), db.engine.connect() as connection:
+        for table in args.tables:
+
+            def codec_f(lang):
+                if args.decompress:
+                    return None
+                if args.no_dictionary:
+                    return 0
+                codec = compression.latest(connection, table, lang)
+                if codec is None or args.retrain:
+                    codec = compression.train(
+                        connection, table, lang, args.samples, args.dict_size
+                    )
+                return codec
+
+            stats = compression.recode_table(
+                connection,
+                table,
+                codec_f,
+                chunk_size=args.chunk_size,
+                level=args.level,
+                langs=args.langs,
+            )
+            report(table, stats)
+
+    print("Freed pages stay in the file, see pib.cli.maintain-db --vacuum")
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+from .shards import shard_database_uri, shard_range
+
+
+def launch(args, scrape_args):
+    processes = []
+    for index in range(args.workers):
+        env = dict(os.environ)
+        env["PIB_DATABASE_URI"] = shard_database_uri(args.path, index)
+        command = [
+            sys.executable,
+            "-m",
+            "pib.cli.scrape",
+            "--path",
+            args.path,
+            "--begin",
+            str(args.begin),
+            "--end",
+            str(args.end),
+            "--shard",
+            "{}/{}".format(index, args.workers),
+        ]
+        processes.append(subprocess.Popen(command + scrape_args, env=env))
+        print(
+            "shard {}: [{}, {})".format(
+                index, *shard_range(args.begin, args.end, index, args.workers)
+            )
+        )
+
+    return [process.wait() for process in processes]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Crawl [begin, end) with one scrape process per shard, "
+        "remaining arguments are passed on to pib.cli.scrape."
+    )
+    parser.add_argument("--path", help="crawl path prefix", type=str, required=True)
+    parser.add_argument("--begin", help="Begin PIB ID", type=int, required=True)
+    parser.add_argument("--end", help="End PIB ID", type=int, required=True)
+    parser.add_argument("--workers", help="Number of shards", type=int, required=True)
+    args, scrape_args = parser.parse_known_args()
+
+    start = time.time()
+    codes = launch(args, scrape_args)
+    elapsed = time.time() - start
+    print(
+        "{} shards, {} IDs in {:.1f}s, {:.1f} IDs/s".format(
+            args.workers,
+            args.end - args.begin,
+            elapsed,
+            (args.end - args.begin) / elapsed,
+        )
+    )
+    if any(codes):
+        sys.exit("Shards failed: {}".format(codes))
@@ -0,0 +1,57 @@
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import func, select
+
+from .. import db, dedup
+from ..models import Cluster
+from ..storage import bulk_load
+
+LANGS = ["en", "hi", "ta", "te", "ml", "bn", "gu", "mr", "pa", "or", "ur"]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Find near-duplicate entries")
+    parser.add_argument("--langs", nargs="+", default=LANGS)
+    parser.add_argument(
+        "--threshold",
+        help="Estimated Jaccard similarity of shingles to count as duplicates",
+        type=float,
+        default=dedup.THRESHOLD,
+    )
+    parser.add_argument(
+        "--rebuild",
+        help="Sign changed entries again and recluster from scratch",
+        action="store_true",
+    )
+    parser.add_argument("--query", help="Print near-duplicates of this ID", type=int)
+    parser.add_argument("--bulk-load", action="store_true")
+    args = parser.parse_args()
+
+    with bulk_load(db.engine, args.bulk_load), db.engine.connect() as connection:
+        if args.query is not None:
+            dedup.index(connection, rescan=True, ids=[args.query])
+            for entry_id, score in dedup.near_duplicates(
+                connection, args.query, args.threshold
+            ):
+                print("{}\t{:.3f}".format(entry_id, score))
+        else:
+            start = time.time()
+            signed = dedup.index(connection, args.langs, rescan=args.rebuild)
+            print(
+                "{} entries signed ({:.1f}s)".format(len(signed), time.time() - start)
+            )
+
+            start = time.time()
+            if args.rebuild:
+                written = dedup.rebuild_clusters(connection, args.langs, args.threshold)
+            else:
+                written = dedup.link(connection, signed, args.threshold)
+            print(
+                "{} cluster rows written ({:.1f}s)".format(written, time.time() - start)
+            )
+
+            clusters, members = connection.execute(
+                select([func.count(func.distinct(Cluster.cluster_id)), func.count()])
+            ).first()
+            print("{} clusters, {} duplicates".format(clusters, members - clusters))
@@ -0,0 +1,124 @@
+"""
+Pulls the fields a PIB release page is crawled for out of the raw HTML.
+Every extractor returns the same dict of `content`, `date`, `ministry` and
+`links` (language name to PRID) that PIBArticle.fromCrawl expects, or
+raises ParseError naming what was wrong with the page.
+"""
+
+
+class ParseError(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ParseFailure:
+    """Stands in for a parsed payload when a fetched page did not parse."""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __repr__(self):
+        return "ParseFailure({})".format(self.reason)
+
+
+def _require(node, name):
+    if node is None:
+        raise ParseError("missing-{}".format(name))
+    return node
+
+
+def _prid(href):
+    prefix, Id = href.split("=")
+    return Id
+
+
+def extract_bs4(page):
+    from bs4 import BeautifulSoup
+
+    # pytype: disable=attribute-error
+    soup = BeautifulSoup(page, "html.parser")
+    lang_links = soup.find("div", {"class": "ReleaseLang"})
+
+    links = (
+        {}
+        if lang_links is None
+        else {
+            a.text.strip(): _prid(a["href"])
+            for a in lang_links.find_all("a", href=True)
+        }
+    )
+    content = _require(soup.find("div", {"id": "PdfDiv"}), "PdfDiv")
+    text = content.text.strip()
+
+    date = _require(
+        soup.find("div", {"class": "ReleaseDateSubHeaddateTime"}), "date"
+    ).text.strip()
+    ministry = _require(
+        soup.find("div", {"class": "MinistryNameSubhead"}), "ministry"
+    ).text.strip()
+
+    # pytype: enable=attribute-error
+
+    return {"content": text, "date": date, "ministry": ministry, "links": links}
+
+
+def _first_div(predicate):
+    # Document order first match, like BeautifulSoup's find().
+    return "(//div[{}])[1]".format(predicate)
+
+
+def _has_class(name):
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')".format(name)
+
+
+_LXML_QUERIES = {}
+
+
+def extract_lxml(page):
+    # libxml2 builds the tree in C; only the four nodes below are visited.
+    from lxml import etree, html
+
+    if not _LXML_QUERIES:
+        _LXML_QUERIES.update(
+            {
+                "links": etree.XPath(
+                    _first_div(_has_class("ReleaseLang")) + "//a[@href]"
+                ),
+                "content": etree.XPath(_first_div("@id='PdfDiv'")),
+                "date": etree.XPath(
+                    _first_div(_has_class("ReleaseDateSubHeaddateTime"))
+                ),
+                "ministry": etree.XPath(_first_div(_has_class("MinistryNameSubhead"))),
+                # BeautifulSoup's .text leaves out script and style bodies.
+                "text": etree.XPath(
+                    ".//text()[not(ancestor::script) and not(ancestor::style)]"
+                ),
+            }
+        )
+
+    parser = html.HTMLParser(encoding="utf-8")
+    root = html.document_fromstring(page.encode("utf-8"), parser=parser)
+
+    def text_content(node):
+        return "".join(_LXML_QUERIES["text"](node))
+
+    def text(key, name):
+        nodes = _LXML_QUERIES[key](root)
+        node = _require(nodes[0] if nodes else None, name)
+        return text_content(node).strip()
+
+    links = {
+        text_content(a).strip(): _prid(a.get("href"))
+        for a in _LXML_QUERIES["links"](root)
+    }
+
+    return {
+        "content": text("content", "PdfDiv"),
+        "date": text("date", "date"),
+        "ministry": text("ministry", "ministry"),
+        "links": links,
+    }
+
+
+EXTRACTORS = {"bs4": extract_bs4, "lxml": extract_lxml}
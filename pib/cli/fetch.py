@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+_DONE = object()
+
+
+class FetchFailure:
+    """
+    Yielded by fetchers in place of a page. `missing` marks IDs the site
+    says do not exist, `transient` marks errors worth retrying later.
+    """
+
+    def __init__(self, reason, transient=False, missing=False):
+        self.reason = reason
+        self.transient = transient
+        self.missing = missing
+
+    def __repr__(self):
+        return "FetchFailure({})".format(self.reason)
+
+
+def classify(exc):
+    status = getattr(exc, "status", None) or getattr(exc, "code", None)
+    if isinstance(status, int):
+        reason = "http-{}".format(status)
+        if status in (404, 410):
+            return FetchFailure(reason, missing=True)
+        return FetchFailure(reason, transient=(status >= 500 or status == 429))
+
+    if isinstance(exc, (OSError, asyncio.TimeoutError)):
+        # Covers URLError, socket timeouts, resets and aiohttp connection errors.
+        return FetchFailure(type(exc).__name__, transient=True)
+
+    try:
+        import aiohttp
+
+        if isinstance(exc, aiohttp.ClientError):
+            return FetchFailure(type(exc).__name__, transient=True)
+    except ImportError:
+        pass
+
+    return FetchFailure(type(exc).__name__)
+
+
+class RateLimiter:
+    """
+    Spaces out requests to a single host so that at most `rate` requests
+    are started per second. A rate of None disables limiting.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1.0 / self.rate
+
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Backoff:
+    """
+    Exponential backoff with full jitter: retry n of a transient failure
+    waits a random time in [0, min(cap, base * 2**n)] seconds. `retries`
+    bounds the retries of a single fetch, 0 disables retrying.
+    """
+
+    def __init__(self, retries=3, base=0.5, cap=30.0):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.cap, self.base * 2**attempt))
+
+    def call(self, f, *args, on_retry=None):
+        # Blocking counterpart of AsyncFetcher's retry loop, re-raises the
+        # last error once retries run out or the failure is not transient.
+        for attempt in range(self.retries + 1):
+            try:
+                return f(*args)
+            except Exception as e:
+                failure = classify(e)
+                if not failure.transient or attempt == self.retries:
+                    raise
+                if on_retry is not None:
+                    on_retry(failure)
+                time.sleep(self.delay(attempt))
+
+
+class AIMDLimiter:
+    """
+    Caps the requests in flight to a host at `limit`. The limit grows by
+    one after `limit` clean responses and is cut by `decrease` on
+    congestion (5xx, 429, timeouts), at most once per `limit` completions
+    so that a burst of errors from one window counts once.
+    """
+
+    def __init__(self, maximum, minimum=1, decrease=0.5):
+        self.limit = maximum
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.inflight = 0
+        self.successes = 0
+        self.since_decrease = maximum
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            while self.inflight >= self.limit:
+                await self.condition.wait()
+            self.inflight += 1
+
+    async def release(self, congested=False):
+        async with self.condition:
+            self.inflight -= 1
+            self.since_decrease += 1
+            if congested:
+                self.successes = 0
+                if self.since_decrease >= self.limit:
+                    self.limit = max(self.minimum, int(self.limit * self.decrease))
+                    self.since_decrease = 0
+                    logging.debug("AIMD: limit down to {}".format(self.limit))
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self.successes = 0
+            self.condition.notify_all()
+
+
+class AsyncFetcher:
+    """
+    Fetches PIB pages concurrently over a bounded pool of keep-alive
+    connections. The event loop runs on a background thread so that
+    callers consume `(key, page)` pairs from a plain generator and keep
+    doing parsing and DB writes on their own thread. Transient failures
+    are retried per `backoff`, and requests in flight per host are bounded
+    by an AIMDLimiter that backs off while the site reports errors.
+    """
+
+    def __init__(
+        self,
+        url_format,
+        headers,
+        concurrency=16,
+        rate_limit=None,
+        timeout=30,
+        metrics=None,
+        backoff=None,
+    ):
+        self.url_format = url_format
+        self.headers = dict(headers)
+        # aiohttp decodes brotli only if the optional brotli package is around.
+        self.headers["Accept-Encoding"] = "gzip, deflate"
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.timeout = timeout
+        self.metrics = metrics
+        self.backoff = backoff or Backoff(retries=0)
+
+    def fetch_all(self, keys, cache=None):
+        # `cache` offers cached(key)/store(key, page), see CachedCrawler.
+        results = queue.Queue(maxsize=2 * self.concurrency)
+
+        def run():
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self._run(iter(keys), cache, results))
+            finally:
+                loop.close()
+                results.put(_DONE)
+
+        thread = threading.Thread(target=run, name="fetch", daemon=True)
+        thread.start()
+
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+
+        thread.join()
+
+    async def _run(self, keys, cache, results):
+        import aiohttp
+
+        loop = asyncio.get_event_loop()
+        hosts = {}
+
+        # Keys may come from a scheduler that blocks until more work shows
+        # up, so they are pulled on a thread of their own, never the loop.
+        puller = ThreadPoolExecutor(max_workers=1)
+        # Page cache reads and writes block on disk, they get a thread too.
+        storer = ThreadPoolExecutor(max_workers=1)
+
+        def next_key():
+            return next(keys, _DONE)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, limit_per_host=self.concurrency
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(
+            connector=connector, headers=self.headers, timeout=timeout
+        ) as session:
+
+            async def worker():
+                while True:
+                    key = await loop.run_in_executor(puller, next_key)
+                    if key is _DONE:
+                        return
+
+                    page = None
+                    if cache is not None:
+                        page = await loop.run_in_executor(storer, cache.cached, key)
+                    if page is None:
+                        url = self.url_format.format(key)
+                        host = urlparse(url).netloc
+                        if host not in hosts:
+                            hosts[host] = (
+                                RateLimiter(self.rate_limit),
+                                AIMDLimiter(self.concurrency),
+                            )
+
+                        page = await self.fetch_with_retries(
+                            session, key, url, *hosts[host]
+                        )
+                        if cache is not None and isinstance(page, str):
+                            await loop.run_in_executor(storer, cache.store, key, page)
+
+                    # Blocks off-loop when the consumer falls behind.
+                    await loop.run_in_executor(None, results.put, (key, page))
+
+            workers = [worker() for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                puller.shutdown(wait=False)
+                storer.shutdown(wait=True)
+
+    async def fetch_with_retries(self, session, key, url, rate, aimd):
+        for attempt in range(self.backoff.retries + 1):
+            await aimd.acquire()
+            await rate.acquire()
+            page = await self.fetch(session, key, url)
+            congested = isinstance(page, FetchFailure) and page.transient
+            await aimd.release(congested)
+            if self.metrics is not None:
+                self.metrics.gauge("concurrency_limit", aimd.limit)
+
+            if not congested or attempt == self.backoff.retries:
+                return page
+            if self.metrics is not None:
+                self.metrics.retried(page.reason)
+            await asyncio.sleep(self.backoff.delay(attempt))
+
+    async def fetch(self, session, key, url):
+        start = time.time()
+        try:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                body = await response.read()
+            page = body.decode("utf-8")
+            if self.metrics is not None:
+                self.metrics.fetched(time.time() - start, len(body))
+            return page
+        except Exception as e:
+            logging.debug("Fetch: {key} failed with {msg}".format(key=key, msg=e))
+            if self.metrics is not None:
+                self.metrics.observe("fetch", time.time() - start)
+            return classify(e)
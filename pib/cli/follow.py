@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import threading
+import time
+from argparse import ArgumentParser
+from functools import partial
+
+from .. import db
+from ..bulk import insert_links
+from ..models import Entry
+from .extract import EXTRACTORS, ParseFailure
+from .fetch import AsyncFetcher, Backoff, FetchFailure
+from .pipeline import parse_payload
+from .scrape import AdjacencyJournal, CachedCrawler, setup_logging
+from .telemetry import CrawlMetrics, MetricsWriter
+
+
+class Follower:
+    """
+    Keeps the DB caught up with PIB by probing the PRIDs past the
+    watermark, the highest PRID ingested so far. Each round fetches a
+    window of IDs above it; the window doubles while hits land in its
+    upper half and halves on empty rounds, and the wait between rounds
+    backs off the same way. IDs skipped below the watermark are probed
+    again for `late_rounds` rounds, as releases do not always go out in
+    PRID order. Probes skip the page cache, as an ID may answer with a
+    placeholder before its release goes out; only pages that parse into
+    an entry are cached. State is kept in `<path>.follow.json`.
+    """
+
+    def __init__(
+        self,
+        crawler,
+        adj,
+        metrics,
+        path,
+        fetcher=None,
+        min_window=8,
+        max_window=256,
+        min_interval=5.0,
+        max_interval=300.0,
+        late_rounds=10,
+    ):
+        self.crawler = crawler
+        self.adj = adj
+        self.metrics = metrics
+        self.path = path
+        self.fetcher = fetcher
+        self.min_window = min_window
+        self.max_window = max_window
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.late_rounds = late_rounds
+        self.parse_f = partial(crawler.parse_article, parser=crawler.parser)
+
+        self.watermark = None
+        self.window = min_window
+        self.interval = min_interval
+        self.pending = {}
+
+    def load(self, start=None):
+        if os.path.exists(self.path):
+            with open(self.path) as fp:
+                state = json.load(fp)
+            self.watermark = state["watermark"]
+            self.window = state["window"]
+            self.pending = state["pending"]
+        elif start is not None:
+            self.watermark = start
+        else:
+            (self.watermark,) = db.session.query(db.func.max(Entry.id)).one()
+            assert self.watermark is not None, "Empty DB, pass --start"
+        return self
+
+    def save(self):
+        state = {
+            "watermark": self.watermark,
+            "window": self.window,
+            "pending": self.pending,
+        }
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as fp:
+            json.dump(state, fp)
+        os.replace(tmp_path, self.path)
+
+    def keys(self):
+        ahead = range(self.watermark + 1, self.watermark + 1 + self.window)
+        return sorted(self.pending, key=int) + [str(idx) for idx in ahead]
+
+    def poll(self):
+        """
+        Runs one round and returns the keys ingested, after they are
+        committed.
+        """
+        keys = self.keys()
+        requested = {}
+
+        def probes():
+            # Ingest latency runs from when a key is handed to the fetcher.
+            for key in keys:
+                requested[key] = time.time()
+                yield key
+
+        hits, edges = [], []
+        for key, page in self.crawler.fetch_all(probes(), self.fetcher, cache=False):
+            if isinstance(page, FetchFailure):
+                if not page.missing:
+                    self.metrics.failed("fetch", page.reason)
+                continue
+
+            _, payload, seconds = parse_payload(self.parse_f, key, page)
+            if isinstance(payload, ParseFailure):
+                self.metrics.failed("parse", payload.reason)
+                continue
+
+            self.metrics.parsed(seconds)
+            self.crawler.store(key, page)
+            processed, links = payload
+            db.session.merge(Entry(**processed))
+            self.adj[key] = links
+            edges.extend((key, v) for v in links.values())
+            hits.append((key, requested[key]))
+
+        start = time.time()
+        db.session.commit()
+        committed = time.time()
+        self.metrics.observe("db_commit", committed - start)
+        for key, seen in hits:
+            self.metrics.observe("ingest", committed - seen)
+
+        if edges:
+            insert_links(edges)
+        self.adj.save()
+        self.crawler.sync()
+
+        self.advance(keys, [key for key, seen in hits])
+        self.save()
+        return [key for key, seen in hits]
+
+    def advance(self, keys, found):
+        found = set(found)
+        for key in list(self.pending):
+            self.pending[key] -= 1
+            if key in found or self.pending[key] <= 0:
+                del self.pending[key]
+
+        if not found:
+            self.window = max(self.min_window, self.window // 2)
+            self.interval = min(self.max_interval, 2 * self.interval)
+            return
+
+        # Late IDs alone keep the pace, releases are still going out.
+        ahead = [int(key) for key in found if int(key) > self.watermark]
+        if not ahead:
+            logging.info(
+                "Follow: {} late, watermark {}".format(len(found), self.watermark)
+            )
+            return
+
+        top = max(ahead)
+        for key in keys:
+            if int(key) < top and int(key) > self.watermark and key not in found:
+                self.pending[key] = self.late_rounds
+
+        if top >= self.watermark + self.window // 2:
+            self.window = min(self.max_window, 2 * self.window)
+        self.watermark = top
+        self.interval = self.min_interval
+
+        self.metrics.gauge("watermark", self.watermark)
+        self.metrics.gauge("window", self.window)
+        logging.info(
+            "Follow: {} new, watermark {}, window {}".format(
+                len(found), self.watermark, self.window
+            )
+        )
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.poll()
+            stop.wait(self.interval)
+
+
+def main(args):
+    metrics = CrawlMetrics()
+    writer = MetricsWriter(metrics, args.path, args.metrics_interval).start()
+    backoff = Backoff(args.retries)
+    crawler = CachedCrawler(
+        args.path,
+        url_format=args.url_format,
+        parser=args.parser,
+        metrics=metrics,
+        backoff=backoff,
+    )
+    fetcher = None
+    if args.concurrency > 1:
+        fetcher = AsyncFetcher(
+            crawler.url_format,
+            crawler.headers,
+            concurrency=args.concurrency,
+            metrics=metrics,
+            backoff=backoff,
+        )
+
+    adj = AdjacencyJournal("{}.adj.jsonl".format(args.path)).load()
+    follower = Follower(
+        crawler,
+        adj,
+        metrics,
+        "{}.follow.json".format(args.path),
+        fetcher=fetcher,
+        min_window=args.min_window,
+        max_window=args.max_window,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        late_rounds=args.late_rounds,
+    ).load(args.start)
+
+    try:
+        if args.once:
+            follower.poll()
+        else:
+            follower.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        print("Watermark: {}".format(follower.watermark))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Follow PIB, ingesting releases past the highest known PRID"
+    )
+    parser.add_argument("--path", help="crawl path prefix", type=str, required=True)
+    parser.add_argument(
+        "--start",
+        help="Watermark to start from, defaults to the highest Entry.id",
+        type=int,
+        default=None,
+    )
+    parser.add_argument("--once", help="Run a single round", action="store_true")
+    parser.add_argument("--min-window", type=int, default=8)
+    parser.add_argument("--max-window", type=int, default=256)
+    parser.add_argument(
+        "--min-interval", help="Seconds between busy rounds", type=float, default=5
+    )
+    parser.add_argument(
+        "--max-interval", help="Seconds between idle rounds", type=float, default=300
+    )
+    parser.add_argument(
+        "--late-rounds",
+        help="Rounds to keep probing IDs skipped below the watermark",
+        type=int,
+        default=10,
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument(
+        "--url-format",
+        help="Release page URL, {} is replaced by the PRID",
+        type=str,
+        default=CachedCrawler.url_format,
+    )
+    parser.add_argument("--parser", choices=sorted(EXTRACTORS), default="bs4", type=str)
+    parser.add_argument("--metrics-interval", type=float, default=30)
+    args = parser.parse_args()
+
+    setup_logging(args.path, "follow.log")
+    main(args)
@@ -0,0 +1,188 @@
+import base64
+import json
+import os
+import time
+import zlib
+
+from .bitmap import IdBitmap
+
+
+class Frontier:
+    """
+    Per-crawl record of what happened to every PRID, persisted next to the
+    crawl as `<path>.frontier.json`. States are kept as bitmaps, failure
+    reasons and transient retry counts as sparse dicts, so deciding whether
+    to schedule an ID is a couple of bit tests.
+    """
+
+    STATES = ("fetched", "parsed", "failed", "missing")
+
+    def __init__(self, path, begin, end, max_retries=3):
+        self.path = path
+        self.begin = begin
+        self.end = end
+        self.max_retries = max_retries
+        self.bitmaps = {state: IdBitmap(begin, end) for state in self.STATES}
+        self.transient = IdBitmap(begin, end)
+        self.reasons = {}
+        self.attempts = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+
+        with open(self.path) as fp:
+            data = json.load(fp)
+
+        # Grow to cover both ranges so saving never drops earlier state.
+        begin, end = data["begin"], data["end"]
+        if self.begin < self.end:
+            begin, end = min(self.begin, begin), max(self.end, end)
+
+        def restore(encoded):
+            raw = zlib.decompress(base64.b64decode(encoded))
+            bitmap = IdBitmap.frombytes(data["begin"], data["end"], raw)
+            return bitmap.resized(begin, end)
+
+        self.begin, self.end = begin, end
+        self.bitmaps = {state: restore(data[state]) for state in self.STATES}
+        self.transient = restore(data["transient"])
+        self.reasons = data["reasons"]
+        self.attempts = data["attempts"]
+        return self
+
+    def save(self):
+        def encode(bitmap):
+            return base64.b64encode(zlib.compress(bitmap.tobytes())).decode("ascii")
+
+        data = {state: encode(self.bitmaps[state]) for state in self.STATES}
+        data.update(
+            {
+                "begin": self.begin,
+                "end": self.end,
+                "transient": encode(self.transient),
+                "reasons": self.reasons,
+                "attempts": self.attempts,
+            }
+        )
+
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as fp:
+            json.dump(data, fp)
+        os.replace(tmp_path, self.path)
+
+    def merge(self, other):
+        # Folds another frontier, such as a crawl shard's, into this one.
+        begin = other.begin if self.begin >= self.end else min(self.begin, other.begin)
+        end = other.end if self.begin >= self.end else max(self.end, other.end)
+        self.bitmaps = {
+            state: bitmap.resized(begin, end) for state, bitmap in self.bitmaps.items()
+        }
+        self.transient = self.transient.resized(begin, end)
+        self.begin, self.end = begin, end
+
+        for state in self.STATES:
+            for prid in other[state]:
+                self[state].add(prid)
+        for prid in other.transient:
+            self.transient.add(prid)
+        self.reasons.update(other.reasons)
+        self.attempts.update(other.attempts)
+
+        for prid in other["parsed"]:
+            self.mark_parsed(prid)
+        return self
+
+    def __getitem__(self, state):
+        return self.bitmaps[state]
+
+    def schedulable(self, key):
+        if key in self["parsed"] or key in self["missing"]:
+            return False
+        if key in self["failed"]:
+            retries = self.attempts.get(str(key), 0)
+            return key in self.transient and retries < self.max_retries
+        return True
+
+    def mark_fetched(self, key):
+        self["fetched"].add(key)
+
+    def mark_parsed(self, key):
+        self["parsed"].add(key)
+        self["failed"].discard(key)
+        self.transient.discard(key)
+        self.reasons.pop(str(key), None)
+        self.attempts.pop(str(key), None)
+
+    def mark_missing(self, key):
+        self["missing"].add(key)
+
+    def mark_failed(self, key, reason, transient=False):
+        self["failed"].add(key)
+        self.reasons[str(key)] = reason
+        if transient:
+            self.transient.add(key)
+            self.attempts[str(key)] = self.attempts.get(str(key), 0) + 1
+        else:
+            self.transient.discard(key)
+
+    def retry(self, key):
+        # Gives a failed ID a fresh retry budget.
+        self["failed"].discard(key)
+        self.transient.discard(key)
+        self.attempts.pop(str(key), None)
+
+    def summary(self):
+        return {state: len(self.bitmaps[state]) for state in self.STATES}
+
+
+class DeadLetters:
+    """
+    IDs that failed for good in a crawl: the fetch error was not
+    transient or the frontier ran out of retries for it, or the page came
+    in but did not parse. Persisted as `<path>.dead-letter.jsonl`, one
+    record per ID with the `stage` that failed and why, so they can be
+    retried in bulk with `pib.cli.scrape --retry-dead-letter`; pages that
+    did not parse are replayed from the page cache, for a fixed parser.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as fp:
+                for line in fp:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.entries[record["id"]] = record
+        return self
+
+    def save(self):
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w") as fp:
+            for key in sorted(self.entries, key=int):
+                fp.write(json.dumps(self.entries[key]) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def add(self, key, reason, attempts, stage="fetch"):
+        self.entries[str(key)] = {
+            "id": str(key),
+            "stage": stage,
+            "reason": reason,
+            "attempts": attempts,
+            "time": int(time.time()),
+        }
+
+    def discard(self, key):
+        self.entries.pop(str(key), None)
+
+    def keys(self, begin, end):
+        return sorted((key for key in self.entries if begin <= int(key) < end), key=int)
+
+    def __contains__(self, key):
+        return str(key) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,89 @@
+import time
+from argparse import ArgumentParser
+
+from .. import db
+
+
+def pragma(cursor, statement):
+    return cursor.execute("PRAGMA {}".format(statement)).fetchall()
+
+
+def run(cursor, statement):
+    # Steps the statement to completion, incremental_vacuum needs that.
+    cursor.execute(statement).fetchall()
+    return "done"
+
+
+def size(cursor):
+    ((pages,),) = pragma(cursor, "page_count")
+    ((free,),) = pragma(cursor, "freelist_count")
+    ((page_size,),) = pragma(cursor, "page_size")
+    return "{:.1f} MiB, {:.1f} MiB free".format(
+        pages * page_size / 2**20, free * page_size / 2**20
+    )
+
+
+def step(name, f):
+    start = time.time()
+    result = f()
+    print("{}: {} ({:.1f}s)".format(name, result, time.time() - start))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Maintenance for the SQLite app DB")
+    parser.add_argument(
+        "--analyze", help="Refresh planner statistics", action="store_true"
+    )
+    parser.add_argument(
+        "--vacuum",
+        help="Return up to N free pages to the OS, 0 for all",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        help="Switch auto_vacuum to INCREMENTAL, rewrites the file once",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--integrity", help="Run PRAGMA integrity_check", action="store_true"
+    )
+    parser.add_argument(
+        "--quick", help="quick_check instead of integrity_check", action="store_true"
+    )
+    parser.add_argument(
+        "--checkpoint", help="Fold the WAL into the DB file", action="store_true"
+    )
+    args = parser.parse_args()
+
+    assert db.engine.dialect.name == "sqlite", "SQLite only"
+    connection = db.engine.raw_connection()
+    cursor = connection.cursor()
+    print("before: {}".format(size(cursor)))
+
+    if args.enable_incremental_vacuum:
+        # auto_vacuum only takes effect on an empty DB or after a VACUUM.
+        pragma(cursor, "auto_vacuum=INCREMENTAL")
+        step("vacuum", lambda: run(cursor, "VACUUM"))
+
+    if args.vacuum is not None:
+        ((mode,),) = pragma(cursor, "auto_vacuum")
+        if mode == 2:
+            statement = "PRAGMA incremental_vacuum({})".format(args.vacuum)
+            step("incremental_vacuum", lambda: run(cursor, statement))
+        else:
+            print("auto_vacuum is not INCREMENTAL, see --enable-incremental-vacuum")
+
+    if args.analyze:
+        step("analyze", lambda: run(cursor, "ANALYZE"))
+
+    if args.checkpoint:
+        step("wal_checkpoint", lambda: pragma(cursor, "wal_checkpoint(TRUNCATE)")[0])
+
+    if args.integrity:
+        check = "quick_check" if args.quick else "integrity_check"
+        step(check, lambda: ", ".join(row for (row,) in pragma(cursor, check)[:20]))
+
+    connection.commit()
+    print("after: {}".format(size(cursor)))
+    connection.close()
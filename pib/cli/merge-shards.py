@@ -0,0 +1,69 @@
+import os
+from argparse import ArgumentParser
+
+from ..bulk import merge_sqlite_shard
+from .frontier import DeadLetters, Frontier
+from .page_cache import PageCache
+from .scrape import AdjacencyJournal
+from .shards import shard_path
+
+
+def merge_entries(path, index):
+    db_path = "{}.db".format(shard_path(path, index))
+    if os.path.exists(db_path):
+        rows = merge_sqlite_shard(db_path, ["entry"])
+        print("shard {}: rows {}".format(index, rows))
+
+
+def merge(path, index):
+    shard = shard_path(path, index)
+
+    db_path = "{}.db".format(shard)
+    if os.path.exists(db_path):
+        rows = merge_sqlite_shard(db_path, ["link"])
+        print("shard {}: rows {}".format(index, rows))
+
+    adj = AdjacencyJournal("{}.adj.jsonl".format(path)).load()
+    shard_adj = AdjacencyJournal("{}.adj.jsonl".format(shard)).load()
+    for key, links in shard_adj.items():
+        adj[key] = links
+    adj.save()
+    print("shard {}: {} adjacency entries".format(index, len(shard_adj)))
+
+    frontier_path = "{}.frontier.json".format(shard)
+    if os.path.exists(frontier_path):
+        shard_frontier = Frontier(frontier_path, 0, 0).load()
+        frontier = Frontier("{}.frontier.json".format(path), 0, 0).load()
+        frontier.merge(shard_frontier).save()
+        print("shard {}: frontier {}".format(index, shard_frontier.summary()))
+
+    dead_path = "{}.dead-letter.jsonl".format(shard)
+    if os.path.exists(dead_path):
+        dead = DeadLetters("{}.dead-letter.jsonl".format(path)).load()
+        shard_dead = DeadLetters(dead_path).load()
+        dead.entries.update(shard_dead.entries)
+        dead.save()
+        print("shard {}: {} dead letters".format(index, len(shard_dead)))
+
+    pages_path = "{}.pages.lmdb".format(shard)
+    if os.path.exists(pages_path):
+        cache = PageCache("{}.pages.lmdb".format(path))
+        count = cache.merge(PageCache(pages_path))
+        cache.sync()
+        print("shard {}: {} cached pages".format(index, count))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Fold the outputs of pib.cli.crawl-shards into the app DB "
+        "and the crawl files at --path."
+    )
+    parser.add_argument("--path", help="crawl path prefix", type=str, required=True)
+    parser.add_argument("--workers", help="Number of shards", type=int, required=True)
+    args = parser.parse_args()
+
+    # Every shard's entries before any link, links cross shards.
+    for index in range(args.workers):
+        merge_entries(args.path, index)
+    for index in range(args.workers):
+        merge(args.path, index)
@@ -0,0 +1,75 @@
+import hashlib
+import struct
+import zlib
+
+
+class PageCache:
+    """
+    Raw release pages in a single LMDB environment. Pages are stored once
+    per content hash, zlib-compressed, and an index maps each PRID to the
+    hash of the page last seen for it. PRIDs are packed big-endian so a
+    cursor walks them in numeric order.
+    """
+
+    def __init__(self, path, map_size=1 << 40, level=6):
+        import lmdb
+
+        self.level = level
+        self.env = lmdb.open(
+            path, map_size=map_size, max_dbs=2, sync=False, metasync=False
+        )
+        self.pages = self.env.open_db(b"pages")
+        self.index = self.env.open_db(b"index")
+
+    @staticmethod
+    def _key(prid):
+        return struct.pack(">Q", int(prid))
+
+    def get(self, prid):
+        with self.env.begin() as txn:
+            digest = txn.get(self._key(prid), db=self.index)
+            if digest is None:
+                return None
+            blob = txn.get(digest, db=self.pages)
+        return zlib.decompress(blob).decode("utf-8")
+
+    def put(self, prid, page):
+        raw = page.encode("utf-8")
+        digest = hashlib.sha1(raw).digest()
+        with self.env.begin(write=True) as txn:
+            if txn.get(digest, db=self.pages) is None:
+                txn.put(digest, zlib.compress(raw, self.level), db=self.pages)
+            txn.put(self._key(prid), digest, db=self.index)
+
+    def __contains__(self, prid):
+        with self.env.begin() as txn:
+            return txn.get(self._key(prid), db=self.index) is not None
+
+    def keys(self, begin=0, end=None):
+        # Yields PRIDs (as str, like the crawler keys) in [begin, end).
+        with self.env.begin() as txn:
+            cursor = txn.cursor(db=self.index)
+            if not cursor.set_range(self._key(begin)):
+                return
+            for packed in cursor.iternext(keys=True, values=False):
+                (prid,) = struct.unpack(">Q", packed)
+                if end is not None and prid >= end:
+                    break
+                yield str(prid)
+
+    def merge(self, other):
+        # Copies another cache's pages without recompressing them.
+        count = 0
+        with other.env.begin() as src, self.env.begin(write=True) as dst:
+            for packed, digest in src.cursor(db=other.index):
+                if dst.get(digest, db=self.pages) is None:
+                    dst.put(digest, src.get(digest, db=other.pages), db=self.pages)
+                dst.put(packed, digest, db=self.index)
+                count += 1
+        return count
+
+    def sync(self):
+        self.env.sync()
+
+    def close(self):
+        self.env.close()
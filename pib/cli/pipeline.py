@@ -0,0 +1,78 @@
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .extract import ParseError, ParseFailure
+
+_DONE = object()
+
+
+def parse_payload(parse_f, key, page):
+    """
+    Returns `(key, payload, seconds)`, the payload being the article's
+    as_dict(), a ParseFailure, or the FetchFailure the page was replaced by.
+    `parse_f` is expected to raise ParseError on unusable pages.
+    """
+    if not isinstance(page, str):
+        return key, page, 0.0
+
+    start = time.time()
+    try:
+        payload = parse_f(key, page).as_dict()
+    except ParseError as e:
+        payload = ParseFailure(e.reason)
+    except Exception as e:
+        payload = ParseFailure(type(e).__name__)
+    return key, payload, time.time() - start
+
+
+class ParsePipeline:
+    """
+    Three stage scraper pipeline. A fetch thread drains `source` into a
+    bounded queue, a dispatcher thread hands pages to a pool of parser
+    processes, and the caller consumes parse_payload() results in fetch
+    order on its own thread, which is the only one writing to the DB.
+    `parse_f(key, page)` must be picklable and return a PIBArticle.
+    """
+
+    def __init__(self, parse_f, workers, queue_size=256):
+        self.parse_f = parse_f
+        self.workers = workers
+        self.fetched = queue.Queue(maxsize=queue_size)
+        self.parsing = queue.Queue(maxsize=queue_size)
+
+    def depths(self):
+        return {"fetched": self.fetched.qsize(), "parsing": self.parsing.qsize()}
+
+    def run(self, source):
+        def fetch():
+            try:
+                for item in source:
+                    self.fetched.put(item)
+            finally:
+                self.fetched.put(_DONE)
+
+        def dispatch(executor):
+            try:
+                for key, page in iter(self.fetched.get, _DONE):
+                    future = executor.submit(parse_payload, self.parse_f, key, page)
+                    self.parsing.put(future)
+            finally:
+                self.parsing.put(_DONE)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            threads = [
+                threading.Thread(target=fetch, name="fetch", daemon=True),
+                threading.Thread(
+                    target=dispatch, args=(executor,), name="dispatch", daemon=True
+                ),
+            ]
+            for thread in threads:
+                thread.start()
+
+            for future in iter(self.parsing.get, _DONE):
+                yield future.result()
+
+            for thread in threads:
+                thread.join()
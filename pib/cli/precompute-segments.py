@@ -0,0 +1,88 @@
+import time
+from argparse import ArgumentParser
+
+from tqdm import tqdm
+
+from .. import db
+from ..bulk import batched
+from ..models import Entry
+from ..segments import segmented, tokenized, whole
+from ..snapshot import Snapshot
+from ..storage import bulk_load, stream
+from .utils import Preproc
+
+LANGS = ["en", "hi", "ta", "te", "ml", "bn", "gu", "mr", "pa", "or", "ur"]
+
+
+def build_caches(kinds, model, use_cuda=False):
+    # The same caches translate_pib, retrieval and the exports read.
+    caches = {}
+    if "segmented" in kinds:
+        from ilmulti.segment import build_segmenter
+
+        caches["segmented"] = segmented(build_segmenter("pattern"), "pattern")
+    if "tokenized" in kinds or "whole" in kinds:
+        from ilmulti.translator import from_pretrained
+
+        engine = from_pretrained(tag=model, use_cuda=use_cuda)
+        if "tokenized" in kinds:
+            preproc = Preproc(engine.segmenter, engine.tokenizer)
+            caches["tokenized"] = tokenized(preproc, model)
+        if "whole" in kinds:
+            caches["whole"] = whole(engine.tokenizer, model)
+    return caches
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Fill the segment table ahead of the jobs")
+    parser.add_argument(
+        "--model", help="Model whose tokenizer the jobs run", required=True
+    )
+    parser.add_argument(
+        "--kinds",
+        nargs="+",
+        choices=["tokenized", "whole", "segmented"],
+        default=["tokenized"],
+        help="tokenized: translate_pib, export-parallel-corpus; "
+        "whole: retrieval; segmented: export-mono-corpus --segment",
+    )
+    parser.add_argument("--langs", nargs="+", default=LANGS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--snapshot", help="Read entries from this snapshot instead of the DB"
+    )
+    parser.add_argument("--bulk-load", action="store_true")
+    args = parser.parse_args()
+
+    caches = build_caches(args.kinds, args.model)
+    if args.snapshot:
+        snapshot = Snapshot(args.snapshot)
+        columns = ["id", "lang", "content"]
+        entries = snapshot.rows("entry", args.langs, columns=columns)
+        total = snapshot.count("entry", args.langs)
+    else:
+        query = db.session.query(Entry.id, Entry.lang, Entry.content).filter(
+            Entry.lang.in_(args.langs)
+        )
+        entries, total = stream(db.engine, query), query.count()
+
+    start = time.time()
+    with bulk_load(db.engine, args.bulk_load), tqdm(total=total) as pbar:
+        for batch in batched(entries, args.batch_size):
+            batch = [entry for entry in batch if entry.content]
+            for cache in caches.values():
+                cache.get_many(batch)
+            pbar.update(len(batch))
+        for cache in caches.values():
+            cache.flush()
+
+    elapsed = time.time() - start
+    for kind, cache in caches.items():
+        print(
+            "{}: {} fresh, {} processed, {:.0f} entries/s".format(
+                cache.version,
+                cache.hits,
+                cache.misses,
+                (cache.hits + cache.misses) / max(elapsed, 1e-9),
+            )
+        )
@@ -0,0 +1,32 @@
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import text
+
+from .. import db
+from ..bulk import rebuild_link_counts
+from ..storage import bulk_load
+
+DRIFT = (
+    "SELECT count(*) FROM entry WHERE link_count != "
+    "(SELECT count(*) FROM link WHERE link.first_id = entry.id)"
+)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Recount Entry.link_count from link")
+    parser.add_argument(
+        "--check", help="Only report entries whose count is off", action="store_true"
+    )
+    parser.add_argument("--bulk-load", action="store_true")
+    args = parser.parse_args()
+
+    with bulk_load(db.engine, args.bulk_load), db.engine.connect() as connection:
+        start = time.time()
+        drift = connection.execute(text(DRIFT)).scalar()
+        print("{} entries off ({:.1f}s)".format(drift, time.time() - start))
+        if not args.check and drift:
+            start = time.time()
+            with connection.begin():
+                updated = rebuild_link_counts(connection)
+            print("{} entries recounted ({:.1f}s)".format(updated, time.time() - start))
@@ -0,0 +1,64 @@
+import heapq
+import itertools
+import threading
+
+
+class LinkGuidedScheduler:
+    """
+    Iterator of PRIDs for the fetch stage. PRIDs discovered through the
+    ReleaseLang links of crawled pages are handed out first, the numeric
+    `probe` range only when no discovered work is queued. Iteration blocks
+    while the queue is empty but keys are still in flight, since their
+    pages may discover more; the consumer reports each processed key
+    through `done()`.
+    """
+
+    DISCOVERED, PROBE = 0, 1
+
+    def __init__(self, probe, accept=lambda key: True):
+        self.probe = iter(probe)
+        self.accept = accept
+        self.heap = []
+        self.queued = set()
+        self.in_flight = 0
+        self.counter = itertools.count()
+        self.issued = {self.DISCOVERED: 0, self.PROBE: 0}
+        self.cond = threading.Condition()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.cond:
+            while True:
+                if self.heap:
+                    priority, _, key = heapq.heappop(self.heap)
+                    return self._issue(priority, key)
+
+                for key in self.probe:
+                    if key not in self.queued:
+                        self.queued.add(key)
+                        return self._issue(self.PROBE, key)
+
+                if self.in_flight == 0:
+                    raise StopIteration
+                self.cond.wait()
+
+    def _issue(self, priority, key):
+        self.in_flight += 1
+        self.issued[priority] += 1
+        return key
+
+    def discover(self, keys):
+        with self.cond:
+            for key in keys:
+                if key not in self.queued and self.accept(key):
+                    self.queued.add(key)
+                    entry = (self.DISCOVERED, next(self.counter), key)
+                    heapq.heappush(self.heap, entry)
+            self.cond.notify_all()
+
+    def done(self, key):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
@@ -3,17 +3,30 @@ import logging
 import os
 import re
 import sys
+import time
 from argparse import ArgumentParser
 from copy import deepcopy
 from datetime import datetime
+from functools import partial
 from urllib.request import Request, urlopen
 
 import langid
-from bs4 import BeautifulSoup
-from tqdm import tqdm, trange
-
-from .. import db
-from ..models import Entry, Link
+from tqdm import tqdm
+
+from .. import db, dedup
+from ..bulk import insert_links
+from ..models import Entry
+from ..storage import bulk_load
+from .archive import archive_writer, open_archive, recorded, replay
+from .bitmap import IdBitmap
+from .extract import EXTRACTORS, ParseError, ParseFailure
+from .fetch import AsyncFetcher, Backoff, FetchFailure, classify
+from .frontier import DeadLetters, Frontier
+from .page_cache import PageCache
+from .pipeline import ParsePipeline, parse_payload
+from .scheduler import LinkGuidedScheduler
+from .shards import parse_shard, shard_path, shard_range
+from .telemetry import CrawlMetrics, MetricsWriter
 
 
 class PIBArticle:
@@ -45,8 +58,18 @@ class PIBArticle:
     @classmethod
     def fromCrawl(cls, _dict):
         Id = _dict["Id"]
-        parsedContent = PIBArticle.parseContent(Id, _dict["content"])
-        parsedDate = PIBArticle.parseDate(Id, _dict["date"])
+        try:
+            parsedContent = PIBArticle.parseContent(Id, _dict["content"])
+        except Exception as e:
+            raise ParseError("langid") from e
+
+        try:
+            parsedDate = PIBArticle.parseDate(Id, _dict["date"])
+        except ValueError as e:
+            raise ParseError("date-parse") from e
+        if parsedDate is None:
+            raise ParseError("date-parse")
+
         return cls(
             Id=_dict["Id"],
             lang=parsedContent["lang"],
@@ -105,60 +128,117 @@ class CachedCrawler:
         "Accept-Language": "en-US,en;q=0.9",
     }
 
-    def __init__(self, path, redo=False):
+    url_format = "https://pib.gov.in/PressReleasePage.aspx?PRID={}"
+
+    def __init__(
+        self,
+        path,
+        redo=False,
+        url_format=None,
+        parser="bs4",
+        metrics=None,
+        backoff=None,
+    ):
         self.redo = redo
+        self.parser = parser
+        self.metrics = metrics
+        self.backoff = backoff or Backoff(retries=0)
+        if url_format is not None:
+            self.url_format = url_format
+
+        self.cache = None
+        if path is not None:
+            self.cache = PageCache("{}.pages.lmdb".format(path))
 
     def retrieve_pib_article(self, key):
         try:
             page = self.load(key)
+        except Exception as e:
+            logging.debug("Article: {key} failed with {msg}".format(key=key, msg=e))
+            return None
 
-            # pytype: disable=attribute-error
-            soup = BeautifulSoup(page, "html.parser")
-            lang_links = soup.find("div", {"class": "ReleaseLang"})
-
-            def process(link):
-                prefix, Id = link.split("=")
-                return Id
-
-            links = (
-                {}
-                if lang_links is None
-                else {
-                    a.text.strip(): process(a["href"])
-                    for a in lang_links.find_all("a", href=True)
-                }
-            )
-            content = soup.find("div", {"id": "PdfDiv"})
-            text = content.text.strip()
-
-            date = soup.find(
-                "div", {"class": "ReleaseDateSubHeaddateTime"}
-            ).text.strip()
-            ministry = soup.find("div", {"class": "MinistryNameSubhead"}).text.strip()
-
-            # pytype: enable=attribute-error
-
-            return PIBArticle.fromCrawl(
-                {
-                    "Id": key,
-                    "content": text,
-                    "date": date,
-                    "ministry": ministry,
-                    "links": links,
-                }
-            )
+        return self.parse(key, page, self.parser)
 
+    @staticmethod
+    def parse(key, page, parser="bs4"):
+        try:
+            return CachedCrawler.parse_article(key, page, parser)
         except Exception as e:
             logging.debug("Article: {key} failed with {msg}".format(key=key, msg=e))
             return None
 
+    @staticmethod
+    def parse_article(key, page, parser="bs4"):
+        # Like parse(), but raises ParseError with the reason on failure.
+        fields = EXTRACTORS[parser](page)
+        fields["Id"] = key
+        return PIBArticle.fromCrawl(fields)
+
+    def cached(self, key):
+        if self.cache is None or self.redo:
+            return None
+        return self.cache.get(key)
+
+    def store(self, key, page):
+        if self.cache is not None:
+            self.cache.put(key, page)
+
     def load(self, key):
-        url = "https://pib.gov.in/PressReleasePage.aspx?PRID={}".format(key)
+        page = self.cached(key)
+        if page is None:
+            page = self.backoff.call(self.download, key)
+            self.store(key, page)
+        return page
+
+    def download(self, key):
+        url = self.url_format.format(key)
         request = Request(url, headers=self.headers)
         web_byte = urlopen(request).read()
         web_page = web_byte.decode("utf-8")
         return web_page
 
+    def fetch_all(self, keys, fetcher=None, cache=True):
+        # Streams `(key, page)` as keys are pulled, cache hits skip the network.
+        # With `cache=False` every key is fetched and nothing is stored.
+        if fetcher is not None:
+            return fetcher.fetch_all(keys, cache=self if cache else None)
+        return self.fetch_serial(keys, cache)
+
+    def fetch_serial(self, keys, cache=True):
+        # Serial counterpart of AsyncFetcher.fetch_all.
+        for key in keys:
+            page = self.cached(key) if cache else None
+            if page is None:
+                start = time.time()
+                try:
+                    page = self.backoff.call(self.download, key, on_retry=self.retried)
+                    if self.metrics is not None:
+                        size = len(page.encode("utf-8"))
+                        self.metrics.fetched(time.time() - start, size)
+                    if cache:
+                        self.store(key, page)
+                except Exception as e:
+                    logging.debug(
+                        "Fetch: {key} failed with {msg}".format(key=key, msg=e)
+                    )
+                    if self.metrics is not None:
+                        self.metrics.observe("fetch", time.time() - start)
+                    page = classify(e)
+            yield key, page
+
+    def retried(self, failure):
+        if self.metrics is not None:
+            self.metrics.retried(failure.reason)
+
+    def cached_keys(self, begin, end):
+        if self.cache is None:
+            return []
+        return list(self.cache.keys(begin, end))
+
+    def sync(self):
+        if self.cache is not None:
+            self.cache.sync()
+
 
 class AdjacencyList(dict):
     def __init__(self, path):
@@ -175,55 +255,306 @@ class AdjacencyList(dict):
             return json.dump(self, fp)
 
 
+class AdjacencyJournal:
+    """
+    Append-only replacement for AdjacencyList. Each line is
+    `<key>\t<json links>` and a later line for a key supersedes earlier
+    ones. Loading only indexes the byte offset of each key's latest line;
+    links are decoded when read. `save()` fsyncs and compacts the file once
+    superseded lines outnumber live ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        self.records = 0
+        self.size = 0
+        self._reader = None
+        self._writer = None
+
+    def load(self, legacy=None):
+        if os.path.exists(self.path):
+            self._replay()
+        elif legacy is not None and os.path.exists(legacy):
+            # Import path for .save.adj.json files written by AdjacencyList.
+            for key, links in AdjacencyList(legacy).load().items():
+                self[key] = links
+            self.save()
+        return self
+
+    def _replay(self):
+        with open(self.path, "rb") as fp:
+            offset = 0
+            for line in fp:
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash, drop it.
+                    break
+                key, _ = line.split(b"\t", 1)
+                self.offsets[key.decode("utf-8")] = offset
+                self.records += 1
+                offset += len(line)
+
+        with open(self.path, "ab") as fp:
+            fp.truncate(offset)
+        self.size = offset
+
+    def _open(self):
+        if self._writer is None:
+            self._writer = open(self.path, "ab")
+            self._reader = open(self.path, "rb")
+        return self._writer, self._reader
+
+    def __setitem__(self, key, links):
+        writer, _ = self._open()
+        line = "{}\t{}\n".format(key, json.dumps(links)).encode("utf-8")
+        writer.write(line)
+        self.offsets[key] = self.size
+        self.size += len(line)
+        self.records += 1
+
+    def __getitem__(self, key):
+        writer, reader = self._open()
+        writer.flush()
+        reader.seek(self.offsets[key])
+        _, links = reader.readline().split(b"\t", 1)
+        return json.loads(links.decode("utf-8"))
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def items(self):
+        for key in self:
+            yield key, self[key]
+
+    def save(self):
+        if self._writer is None:
+            return
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        if self.records > 2 * len(self.offsets):
+            self.compact()
+
+    def compact(self):
+        tmp_path = "{}.tmp".format(self.path)
+        offsets, size = {}, 0
+        with open(tmp_path, "wb") as fp:
+            for key, links in self.items():
+                line = "{}\t{}\n".format(key, json.dumps(links)).encode("utf-8")
+                fp.write(line)
+                offsets[key] = size
+                size += len(line)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.offsets, self.size, self.records = offsets, size, len(offsets)
+
+    def close(self):
+        for fp in [self._writer, self._reader]:
+            if fp is not None:
+                fp.close()
+        self._writer, self._reader = None, None
+
+
+def existing_entries(begin, end):
+    existing = IdBitmap(begin, end)
+    query = db.session.query(Entry.id).filter(Entry.id >= begin, Entry.id < end)
+    for (Id,) in query.yield_per(10000):
+        existing.add(Id)
+    return existing
+
+
 def main(args):
-    crawler = CachedCrawler(args.path, args.force_redo)
-    adj = AdjacencyList("{}.save.adj.json".format(args.path))
-    adj = adj.load()
-
-    def binary_search_find_start(adj, begin, end):
-        while begin < end:
-            idx = int((begin + end) / 2)
-            key = str(idx)
-            entry = Entry.query.get(key)
-            if (entry is None) or (key not in adj):
-                end = idx - 1
-            else:
-                begin = idx + 1
-        return begin
-
-    begin = binary_search_find_start(adj, args.begin, args.end)
-    for idx in trange(begin, args.end):
-        key = str(idx)
-        entry = Entry.query.get(key)
-        if (entry is None) or (key not in adj):
-            payload = crawler.retrieve_pib_article(key)
-            if payload is not None:
-                processed, links = payload.as_dict()
-                adj[key] = deepcopy(links)
-                if entry is None:
-                    entry = Entry(**processed)
-                    db.session.add(entry)
-                    logging.info("Idx({}) Final: {}".format(key, payload))
+    metrics = CrawlMetrics()
+    writer = MetricsWriter(metrics, args.path, args.metrics_interval).start()
+    backoff = Backoff(args.retries, args.backoff_base, args.backoff_cap)
+    crawler = CachedCrawler(
+        args.path,
+        args.force_redo,
+        url_format=args.url_format,
+        parser=args.parser,
+        metrics=metrics,
+        backoff=backoff,
+    )
+    adj = AdjacencyJournal("{}.adj.jsonl".format(args.path))
+    adj = adj.load(legacy="{}.save.adj.json".format(args.path))
+
+    frontier = Frontier(
+        "{}.frontier.json".format(args.path), args.begin, args.end, args.max_retries
+    ).load()
+    dead = DeadLetters("{}.dead-letter.jsonl".format(args.path)).load()
+
+    # One pass over the range instead of a lookup per PRID.
+    existing = existing_entries(args.begin, args.end)
+    done = IdBitmap(args.begin, args.end)
+    for key in adj:
+        if key in existing:
+            done.add(key)
+
+    scheduler = None
+    if args.reparse:
+        # Offline: re-run the parser over every cached page in the range.
+        keys = crawler.cached_keys(args.begin, args.end)
+        cache = crawler.cache
+        assert cache is not None
+        source = ((key, cache.get(key)) for key in keys)
+    else:
+        # Resolved up front, the fetch thread must not touch the DB session.
+        begin = done.first_missing(args.begin)
+        if args.retry_dead_letter:
+            keys = [key for key in dead.keys(args.begin, args.end) if key not in done]
+            for key in keys:
+                frontier.retry(key)
+        else:
+            keys = [
+                str(idx)
+                for idx in done.missing(begin)
+                if args.force_redo or frontier.schedulable(idx)
+            ]
+        logging.info(
+            "Resuming at {}, {} of {} IDs done, frontier {}".format(
+                begin, len(done), args.end - args.begin, frontier.summary()
+            )
+        )
+
+        fetcher = None
+        if args.concurrency > 1:
+            fetcher = AsyncFetcher(
+                crawler.url_format,
+                crawler.headers,
+                concurrency=args.concurrency,
+                rate_limit=args.rate_limit,
+                metrics=metrics,
+                backoff=backoff,
+            )
+
+        if args.archive:
+            # Offline: archived pages stand in for the site.
+            source = replay(open_archive(args.archive), keys)
+        elif args.schedule == "links":
+
+            def accept(key):
+                return (
+                    key.isdigit()
+                    and args.begin <= int(key) < args.end
+                    and key not in done
+                    and (args.force_redo or frontier.schedulable(key))
+                )
+
+            scheduler = LinkGuidedScheduler(keys, accept=accept)
+            source = crawler.fetch_all(scheduler, fetcher)
         else:
-            logging.info("Idx({}) exists in db".format(key))
+            source = crawler.fetch_all(keys, fetcher)
+
+    recorder = None
+    if args.record_archive:
+        recorder = archive_writer(args.record_archive)
+        source = recorded(source, recorder, crawler.url_format)
+
+    parse_f = partial(crawler.parse_article, parser=crawler.parser)
+    pipeline = None
+    if args.parse_workers > 0:
+        # Load the langid model once here so that forked parsers inherit it.
+        langid.classify("")
+        pipeline = ParsePipeline(parse_f, args.parse_workers, args.queue_size)
+        parsed = pipeline.run(source)
+    else:
+        parsed = (parse_payload(parse_f, key, page) for key, page in source)
+
+    # The link schedule finds IDs as it goes, there is no total up front.
+    pbar = tqdm(parsed, total=None if scheduler is not None else len(keys))
+    for count, (key, payload, seconds) in enumerate(pbar):
+        if isinstance(payload, FetchFailure):
+            metrics.failed("fetch", payload.reason)
+            if payload.missing:
+                frontier.mark_missing(key)
+                dead.discard(key)
+            else:
+                frontier.mark_failed(key, payload.reason, payload.transient)
+                if not frontier.schedulable(key):
+                    attempts = frontier.attempts.get(key, 1)
+                    dead.add(key, payload.reason, attempts)
 
-        if (idx + 1 - args.begin) % args.commit_interval == 0:
+        elif isinstance(payload, ParseFailure):
+            metrics.failed("parse", payload.reason)
+            frontier.mark_fetched(key)
+            frontier.mark_failed(key, payload.reason)
+            dead.add(key, payload.reason, 1, stage="parse")
+
+        else:
+            metrics.parsed(seconds)
+            dead.discard(key)
+            frontier.mark_fetched(key)
+            frontier.mark_parsed(key)
+            processed, links = payload
+            adj[key] = deepcopy(links)
+            start = time.time()
+            if args.reparse:
+                db.session.merge(Entry(**processed))
+            elif key not in existing:
+                entry = Entry(**processed)
+                db.session.add(entry)
+                existing.add(key)
+                logging.info("Idx({}) Final: {}".format(key, processed["id"]))
+            metrics.observe("db_write", time.time() - start)
+
+            if scheduler is not None:
+                scheduler.discover(links.values())
+
+        if scheduler is not None:
+            scheduler.done(key)
+
+        if pipeline is not None and count % 100 == 0:
+            pbar.set_postfix(pipeline.depths())
+
+        if (count + 1) % args.commit_interval == 0:
+            start = time.time()
             db.session.commit()
             db.session.flush()
+            metrics.observe("db_commit", time.time() - start)
             adj.save()
+            crawler.sync()
+            frontier.save()
+            dead.save()
             logging.info("Committing to DB @ {}".format(key))
 
-    adj.save()
-
-    for u in tqdm(adj):
-        for lang, v in adj[u].items():
-            link = Link.query.filter_by(first_id=u, second_id=v).first()
-            if link is None:
-                link = Link(first_id=u, second_id=v)
-                db.session.add(link)
-
+    start = time.time()
     db.session.commit()
-    db.session.flush()
+    metrics.observe("db_commit", time.time() - start)
+    adj.save()
+    crawler.sync()
+    frontier.save()
+    dead.save()
+    writer.close()
+    if recorder is not None:
+        recorder.close()
+    if len(dead):
+        logging.info(
+            "{} IDs in the dead-letter list, retry with --retry-dead-letter".format(
+                len(dead)
+            )
+        )
+    if scheduler is not None:
+        logging.info("Scheduler issued {}".format(scheduler.issued))
+
+    edges = ((u, v) for u in adj for lang, v in adj[u].items())
+    seen, inserted = insert_links(edges)
+    print("Links: {} edges, {} new".format(seen, inserted))
+
+    if args.dedup:
+        with db.engine.connect() as connection:
+            signed = dedup.index(connection)
+            written = dedup.link(connection, signed)
+        print(
+            "Near-duplicates: {} signed, {} cluster rows".format(len(signed), written)
+        )
 
 
 def setup_logging(logPath, fileName):
@@ -252,9 +583,142 @@ if __name__ == "__main__":
     parser.add_argument(
         "--force-redo", help="Ignore if already exists anywhere", action="store_true"
     )
+    parser.add_argument(
+        "--max-retries",
+        help="Runs that retry an ID after transient fetch failures",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--shard",
+        help="INDEX/COUNT, crawl only this shard's sub-range into its own files",
+        type=str,
+        default=None,
+    )
+    # Where pages come from when not the site, one at most.
+    offline = parser.add_mutually_exclusive_group()
+    offline.add_argument(
+        "--reparse",
+        help="Re-parse pages from the page cache into the DB, no network",
+        action="store_true",
+    )
     parser.add_argument(
         "--commit-interval", help="Transaction commit interval", type=int, default=1000
     )
+    parser.add_argument(
+        "--concurrency",
+        help="Number of pages fetched in parallel, 1 fetches serially",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--rate-limit",
+        help="Maximum requests per second to a single host",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--url-format",
+        help="Release page URL with a {} placeholder for the PRID",
+        type=str,
+        default=CachedCrawler.url_format,
+    )
+    parser.add_argument(
+        "--schedule",
+        help="range: walk IDs in order, links: follow ReleaseLang links first",
+        choices=["range", "links"],
+        default="range",
+    )
+    parser.add_argument(
+        "--parser",
+        help="HTML extraction backend for release pages",
+        choices=sorted(EXTRACTORS),
+        default="bs4",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        help="Parser processes fed from the fetch stage, 0 parses inline",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--queue-size",
+        help="Bound on pages queued between pipeline stages",
+        type=int,
+        default=256,
+    )
+    offline.add_argument(
+        "--archive",
+        help="Replay pages from a tar of <PRID>.html or a WARC instead of the site",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--record-archive",
+        help="Also write the pages crawled to this tar or WARC",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--retries",
+        help="Retries of a transient fetch failure within a run",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--backoff-base",
+        help="Seconds, retry n waits up to base * 2**n with full jitter",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--backoff-cap", help="Upper bound on a retry wait", type=float, default=30
+    )
+    parser.add_argument(
+        "--retry-dead-letter",
+        help="Only retry the IDs in <path>.dead-letter.jsonl",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--bulk-load",
+        help="Crawl with fewer fsyncs and checkpoints",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        help="Seconds between writes of <path>.metrics.json and .metrics.prom",
+        type=float,
+        default=30,
+    )
+    parser.add_argument(
+        "--dedup",
+        help="Sign new entries and cluster near-duplicates, see pib.cli.dedup",
+        action="store_true",
+    )
     args = parser.parse_args()
+    if args.reparse or args.archive:
+        # Both read pages in order, without fetching.
+        flag = "--reparse" if args.reparse else "--archive"
+        if args.schedule != "range":
+            parser.error(
+                "--schedule {} fetches from the site, not with {}".format(
+                    args.schedule, flag
+                )
+            )
+        if args.concurrency > 1:
+            parser.error(
+                "--concurrency fetches from the site, not with {}".format(flag)
+            )
+    if args.reparse and args.retry_dead_letter:
+        parser.error("--reparse goes over every cached page, not the dead letters")
+    if args.shard:
+        # Shards need a DB of their own, see pib.cli.crawl-shards.
+        assert "PIB_DATABASE_URI" in os.environ, "Set PIB_DATABASE_URI per shard"
+        assert not args.dedup, "Run pib.cli.dedup after pib.cli.merge-shards"
+        index, count = parse_shard(args.shard)
+        args.begin, args.end = shard_range(args.begin, args.end, index, count)
+        args.path = shard_path(args.path, index)
+
     setup_logging(args.path, "crawl.log")
-    main(args)
+    with bulk_load(db.engine, args.bulk_load):
+        main(args)
@@ -0,0 +1,25 @@
+import os
+
+
+def shard_range(begin, end, index, count):
+    # Contiguous, near-equal sub-ranges of [begin, end).
+    size, extra = divmod(end - begin, count)
+    lo = begin + index * size + min(index, extra)
+    hi = lo + size + (1 if index < extra else 0)
+    return lo, hi
+
+
+def shard_path(path, index):
+    return "{}.shard-{}".format(path, index)
+
+
+def shard_database_uri(path, index):
+    # Absolute, relative sqlite paths resolve against the app root.
+    db_path = os.path.abspath("{}.db".format(shard_path(path, index)))
+    return "sqlite:///{}".format(db_path)
+
+
+def parse_shard(spec):
+    index, count = map(int, spec.split("/"))
+    assert 0 <= index < count, "Shard must look like INDEX/COUNT"
+    return index, count
@@ -0,0 +1,46 @@
+import os
+from argparse import ArgumentParser
+
+from .. import db
+from ..snapshot import write
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Write entries, links and translations to Parquet files"
+    )
+    parser.add_argument("--path", help="Snapshot directory", required=True)
+    parser.add_argument(
+        "--tables",
+        nargs="+",
+        choices=["entry", "link", "translation"],
+        default=["entry", "link", "translation"],
+    )
+    parser.add_argument(
+        "--compression",
+        help="Parquet codec, snappy reads fastest, zstd is smaller",
+        default="snappy",
+    )
+    parser.add_argument("--row-group-size", type=int, default=10000)
+    parser.add_argument(
+        "--overwrite", help="Replace an existing snapshot", action="store_true"
+    )
+    args = parser.parse_args()
+
+    manifest = write(
+        db.engine,
+        args.path,
+        tables=args.tables,
+        compression=args.compression,
+        row_group_size=args.row_group_size,
+        overwrite=args.overwrite,
+    )
+    size = sum(
+        parquet["bytes"]
+        for table in manifest["tables"].values()
+        for parquet in table["files"]
+    )
+    print(
+        "{}: up to entry {}, {:.1f} MiB".format(
+            os.path.abspath(args.path), manifest["watermark"], size / 2**20
+        )
+    )
@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Seconds, doubling from 1ms to ~65s.
+BUCKETS = [0.001 * 2**i for i in range(17)]
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(map(str, self.buckets + ["+Inf"]), self.counts)),
+        }
+
+
+class CrawlMetrics:
+    """
+    Latency histograms and counters for a crawl. Observations may come from
+    the fetch thread and the main thread, so updates take a lock.
+    """
+
+    HISTOGRAMS = ["fetch", "parse", "db_write", "db_commit", "ingest"]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.histograms = {name: Histogram() for name in self.HISTOGRAMS}
+        self.bytes = 0
+        self.pages = 0
+        self.articles = 0
+        self.failures = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.gauges = {}
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.histograms[name].observe(seconds)
+
+    def fetched(self, seconds, size):
+        with self.lock:
+            self.histograms["fetch"].observe(seconds)
+            self.bytes += size
+            self.pages += 1
+
+    def parsed(self, seconds):
+        with self.lock:
+            self.histograms["parse"].observe(seconds)
+            self.articles += 1
+
+    def failed(self, stage, reason):
+        with self.lock:
+            self.failures[(stage, reason)] += 1
+
+    def retried(self, reason):
+        with self.lock:
+            self.retries[reason] += 1
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            return {
+                "elapsed": elapsed,
+                "bytes_downloaded": self.bytes,
+                "pages_fetched": self.pages,
+                "articles_parsed": self.articles,
+                "pages_per_second": self.pages / elapsed,
+                "articles_per_second": self.articles / elapsed,
+                "failures": {
+                    "{}:{}".format(stage, reason): count
+                    for (stage, reason), count in sorted(self.failures.items())
+                },
+                "retries": dict(sorted(self.retries.items())),
+                "gauges": dict(self.gauges),
+                "latency_seconds": {
+                    name: histogram.as_dict()
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def prometheus(self):
+        # Text exposition format, e.g. for node_exporter's textfile collector.
+        with self.lock:
+            lines = [
+                "pib_crawl_bytes_downloaded_total {}".format(self.bytes),
+                "pib_crawl_pages_fetched_total {}".format(self.pages),
+                "pib_crawl_articles_parsed_total {}".format(self.articles),
+            ]
+            for (stage, reason), count in sorted(self.failures.items()):
+                lines.append(
+                    'pib_crawl_failures_total{{stage="{}",reason="{}"}} {}'.format(
+                        stage, reason, count
+                    )
+                )
+            for reason, count in sorted(self.retries.items()):
+                lines.append(
+                    'pib_crawl_retries_total{{reason="{}"}} {}'.format(reason, count)
+                )
+            for name, value in sorted(self.gauges.items()):
+                lines.append("pib_crawl_{} {}".format(name, value))
+            for name, histogram in self.histograms.items():
+                metric = "pib_crawl_{}_seconds".format(name)
+                cumulative = 0
+                bounds = [str(bound) for bound in histogram.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        '{}_bucket{{le="{}"}} {}'.format(metric, bound, cumulative)
+                    )
+                lines.append("{}_sum {}".format(metric, histogram.sum))
+                lines.append("{}_count {}".format(metric, histogram.count))
+            return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, content):
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "w") as fp:
+        fp.write(content)
+    os.replace(tmp_path, path)
+
+
+class MetricsWriter:
+    """
+    Writes `<path>.metrics.json` and `<path>.metrics.prom` every `interval`
+    seconds from a daemon thread, and once more on close().
+    """
+
+    def __init__(self, metrics, path, interval=30):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        snapshot = self.metrics.snapshot()
+        _write_atomic(
+            "{}.metrics.json".format(self.path), json.dumps(snapshot, indent=2)
+        )
+        _write_atomic("{}.metrics.prom".format(self.path), self.metrics.prometheus())
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.write()
@@ -1,57 +1,102 @@
 import os
 import sys
+import time
 from argparse import ArgumentParser
 from collections import defaultdict
 
 from ilmulti.translator import from_pretrained
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, func, or_, select
 from tqdm import tqdm
 
 # Internal imports.
-from .. import db
+from .. import db, dedup
+from ..bulk import WriteBehind
 from ..models import Entry, Link, Translation
+from ..plans import translations_by, untranslated
+from ..snapshot import Snapshot
+from ..storage import bulk_load, stream
 from .utils import BatchBuilder
 
 
 def delete_existing_translations(model, tgt_lang):
-    translations = Translation.query.filter(
-        and_(Translation.model == model, Translation.lang == tgt_lang)
+    translations = translations_by(model, tgt_lang)
+    db.session.execute(
+        Translation.__table__.delete().where(Translation.id.in_(translations))
     )
-
-    translations.delete()
     db.session.commit()
 
 
-def translate(engine, max_tokens, model, langs, tgt_lang="en", force_rebuild=False):
-    segmenter = engine.segmenter
-    translator = engine.translator
-    tokenizer = engine.tokenizer
+class NoSink:
+    # Drops translations, to time the translator alone.
+    def __enter__(self):
+        return self
 
-    query = db.session.query(Entry.id, Entry.lang, Entry.date, Entry.content).filter(
-        Entry.lang.in_(langs)
-    )
+    def __exit__(self, *exc_info):
+        pass
 
-    def exists(entry):
-        if force_rebuild:
-            return False
+    def put(self, row):
+        pass
 
-        translation = Translation.query.filter(
-            and_(
-                Translation.parent_id == entry.id,
-                Translation.model == model,
-                Translation.lang == tgt_lang,
-            )
-        ).first()
 
-        return True if translation else False
+def translate(
+    engine,
+    max_tokens,
+    model,
+    langs,
+    tgt_lang="en",
+    force_rebuild=False,
+    snapshot=None,
+    one_per_cluster=False,
+    db_sink=True,
+    sink_batch_size=500,
+):
+    segmenter = engine.segmenter
+    translator = engine.translator
+    tokenizer = engine.tokenizer
 
-    total = query.count()
-    entries = query.all()
+    # The work set is worked out up front, entries without a translation
+    # by `model` into `tgt_lang`, instead of a lookup per entry.
+    if snapshot is not None:
+        # Sources from a snapshot leave the DB to the crawler; what is
+        # already translated is still read live.
+        skip = set()
+        with db.engine.connect() as connection:
+            if not force_rebuild:
+                translated = select([Translation.parent_id]).where(
+                    and_(Translation.model == model, Translation.lang == tgt_lang)
+                )
+                skip.update(row.parent_id for row in connection.execute(translated))
+            if one_per_cluster:
+                skip.update(dedup.duplicates(connection, langs))
+        ids = snapshot.table("entry", langs, columns=["id"]).column("id")
+        total = sum(1 for idx in ids.to_pylist() if idx not in skip)
+        columns = ["id", "lang", "date", "content"]
+        entries = snapshot.rows("entry", langs, columns=columns)
+        entries = (entry for entry in entries if entry.id not in skip)
+    else:
+        columns = [Entry.id, Entry.lang, Entry.date, Entry.content]
+        if force_rebuild:
+            query = select(columns).where(Entry.lang.in_(langs))
+        else:
+            query = untranslated(columns, langs, model, tgt_lang)
+        if one_per_cluster:
+            query = query.where(dedup.representative())
+        count = select([func.count()]).select_from(query.alias())
+        entries, total = stream(db.engine, query), db.session.execute(count).scalar()
     batches = BatchBuilder(
-        segmenter, tokenizer, entries, max_tokens, tgt_lang, filter_f=exists
+        segmenter, tokenizer, entries, max_tokens, tgt_lang, version=model
     )
 
-    with tqdm(total=total) as pbar:
+    # Translations are upserted on unique_parent_model from a thread of
+    # their own, a transaction per few hundred articles.
+    sink = NoSink()
+    if db_sink:
+        sink = WriteBehind(
+            db.engine, Translation.__table__, ["parent_id", "model"], sink_batch_size
+        )
+
+    start, articles = time.time(), 0
+    with sink, tqdm(total=total) as pbar:
         for batch in batches:
             pbar.update(n=batch.state["epb"])
             pbar.set_postfix(batch.state)
@@ -74,37 +119,23 @@ def translate(engine, max_tokens, model, langs, tgt_lang="en", force_rebuild=Fal
                 line_numbers, ordered_lines = list(zip(*sorted_lines))
                 translated = "\n".join(ordered_lines)
 
-                entry_id = int(idx)
-
-                translation = Translation.query.filter(
-                    and_(
-                        Translation.parent_id == entry_id,
-                        Translation.model == model,
-                        Translation.lang == tgt_lang,
-                    )
-                ).first()
-
-                # Converting entry_id to Integer.
-                # This can silently fail.
-
-                def modify_translation(entry):
-                    db.session.add(entry)
-                    db.session.commit()
-
-                if translation is not None:
-                    if translated != translation.translated:
-                        print(entry_id, "Different translations!")
-                    translation.translated = translated
-                    modify_translation(translation)
-
-                else:
-                    entry = Translation(
-                        parent_id=entry_id,
-                        model=model,
-                        lang=tgt_lang,
-                        translated=translated,
-                    )
-                    modify_translation(entry)
+                sink.put(
+                    {
+                        "parent_id": int(idx),
+                        "model": model,
+                        "lang": tgt_lang,
+                        "translated": translated,
+                        "codec": None,
+                    }
+                )
+                articles += 1
+
+    elapsed = time.time() - start
+    print(
+        "{} articles in {:.1f}s, {:.2f} articles/s".format(
+            articles, elapsed, articles / max(elapsed, 1e-9)
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -124,6 +155,30 @@ if __name__ == "__main__":
         "--resume-from", help="delete existing translations", action="store_true"
     )
     parser.add_argument("--use-cuda", help="use available GPUs", action="store_true")
+    parser.add_argument(
+        "--bulk-load",
+        help="Write translations with fewer fsyncs and checkpoints",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--snapshot", help="Read entries from this snapshot instead of the DB"
+    )
+    parser.add_argument(
+        "--one-per-cluster",
+        help="Skip near-duplicates of another entry, see pib.cli.dedup",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--no-db-sink",
+        help="Do not write translations, to time the translator",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--sink-batch-size",
+        help="Translations written per transaction",
+        type=int,
+        default=500,
+    )
 
     args = parser.parse_args()
 
@@ -134,6 +189,16 @@ if __name__ == "__main__":
     engine = from_pretrained(tag=args.model, use_cuda=args.use_cuda)
     langs = ["hi", "ta", "te", "ml", "bn", "gu", "mr", "pa", "or", "ur"]
 
-    translate(
-        engine, args.max_tokens, args.model, langs, args.tgt_lang, args.force_rebuild
-    )
+    with bulk_load(db.engine, args.bulk_load):
+        translate(
+            engine,
+            args.max_tokens,
+            args.model,
+            langs,
+            args.tgt_lang,
+            args.force_rebuild,
+            Snapshot(args.snapshot) if args.snapshot else None,
+            args.one_per_cluster,
+            not args.no_db_sink,
+            args.sink_batch_size,
+        )
@@ -5,6 +5,9 @@ from io import StringIO
 
 from ilmulti.utils.language_utils import inject_token
 
+from .. import segments
+from ..bulk import batched
+
 
 class Batch:
     def __init__(self, uids, lines, state):
@@ -26,19 +29,38 @@ class BatchBuilder:
         max_tokens,
         tgt_lang,
         max_lines=None,
-        filter_f=lambda x: True,
+        filter_f=lambda x: False,
+        version=None,
     ):
-        self.preproc = Preproc(segmenter, tokenizer)
+        self.preproc = Preproc(segmenter, tokenizer, version)
         self.filter_f = filter_f
-        self.entries = entries
+        # Any iterable, entries are pulled as batches fill up, a window
+        # at a time to look their segments up together.
+        self.entries = self.prefetched(entries)
+        self.pending = None
         self.max_tokens = max_tokens
         self.tgt_lang = tgt_lang
 
+    def prefetched(self, entries, window=500):
+        for batch in batched(entries, window):
+            self.preproc.prefetch([entry.id for entry in batch])
+            yield from batch
+
     def __iter__(self):
         self.index = 0
         self.last_index = -1
         return self
 
+    def peek(self):
+        # The entry that did not fit the last batch comes first.
+        if self.pending is None:
+            self.pending = next(self.entries, None)
+        return self.pending
+
+    def advance(self):
+        self.pending = None
+        self.index = self.index + 1
+
     def __next__(self):
         # Return a single batch
         batch = self.next_batch()
@@ -56,7 +78,7 @@ class BatchBuilder:
     def get_entry(self, entry):
         # print('{} doesnot have translation'.format(entry.id))
         uids, lines = [], []
-        tokenized_lines, _ = self.preproc.process(entry.content, entry.lang)
+        tokenized_lines, _ = self.preproc.process_entry(entry)
         injected_lines = inject_token(tokenized_lines, self.tgt_lang)
         uid_list = [
             "{} {}".format(entry.id, count) for count, line in enumerate(injected_lines)
@@ -74,14 +96,16 @@ class BatchBuilder:
         check_next = True
 
         while check_next:
-            entry = self.entries[self.index]
+            entry = self.peek()
+            if entry is None:
+                break
             flag = self.filter_f(entry)
 
             if not entry.content:
                 print(
                     "{} {} has no content, skipping entry".format(entry.lang, entry.id)
                 )
-                self.index = self.index + 1
+                self.advance()
                 state["epb"] += 1
 
             elif flag:
@@ -90,7 +114,7 @@ class BatchBuilder:
                         entry.lang, entry.id
                     )
                 )
-                self.index = self.index + 1
+                self.advance()
                 state["epb"] += 1
 
             else:
@@ -109,28 +133,30 @@ class BatchBuilder:
                 if update_flag:
                     uids.extend(_uids)
                     lines.extend(_lines)
-                    self.index = self.index + 1
+                    self.advance()
                     state["epb"] += 1
                     state.update(future_state)
 
                 elif (not update_flag) and (not lines):
-                    self.index = self.index + 1
+                    self.advance()
                     state["epb"] += 1
                     check_next = True
                 else:
                     check_next = False
 
-            if self.index > len(self.entries):
-                break
-
+        if not lines:
+            self.preproc.flush()
+            raise StopIteration
         assert uids and lines, "Batch returned empty uids and lines"
         return Batch(uids, lines, state)
 
 
 class Preproc:
-    def __init__(self, segmenter, tokenizer):
+    def __init__(self, segmenter, tokenizer, version=None):
         self.segmenter = segmenter
         self.tokenizer = tokenizer
+        # With a version, tokenized entries are kept in the segment table.
+        self.cache = segments.tokenized(self, version) if version else None
 
     def create_stringio(self, lines, lang):
         line_buffer = []
@@ -154,6 +180,20 @@ class Preproc:
         tokenized, _io = self.create_stringio(segments, lang)
         return tokenized, _io
 
+    def process_entry(self, entry):
+        if self.cache is None:
+            return self.process(entry.content, entry.lang)
+        tokenized = self.cache.get(entry)
+        return tokenized, StringIO("\n".join(tokenized))
+
+    def prefetch(self, ids):
+        if self.cache is not None:
+            self.cache.prefetch(ids)
+
+    def flush(self):
+        if self.cache is not None:
+            self.cache.flush()
+
     def detok(self, src_out):
         src = []
         for line in src_out:
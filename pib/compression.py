@@ -0,0 +1,320 @@
+"""
+Optional zstd compression of Entry.content and Translation.translated.
+
+A row's `codec` says how its text column is stored: NULL for plain text,
+0 for zstd without a dictionary, otherwise the id of the zstd_dictionary
+row it was compressed with. Dictionaries are trained per table and
+language, since a release in Tamil shares little with one in Hindi, and
+are never modified; retraining adds a new one. Their ids are local to
+a database, the caches here assume a process works on one.
+
+The models expose the text through hybrid properties, which decode in
+Python, and in SQL through pib_text(value, codec), registered on every
+SQLite connection. Compression is SQLite only: other databases get the
+column as stored.
+
+`PIB_COMPRESSION=zstd` compresses rows on write, with the newest
+dictionary of their language, once pib.cli.compress-db has trained one.
+`zstandard` is only imported when a compressed row is met.
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import time
+
+from sqlalchemy import Text, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+COLUMNS = {"entry": "content", "translation": "translated"}
+
+LEVEL = 9
+DICT_SIZE = 112640
+
+_decompressors = {}
+_compressors = {}
+_latest = {}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Compressed rows need zstandard, pip install zstandard")
+    return zstandard
+
+
+def enabled():
+    return os.environ.get("PIB_COMPRESSION", "off") == "zstd"
+
+
+def _dictionary(execute, codec):
+    zstd = _zstd()
+    if codec == 0:
+        return None
+    (data,) = execute("SELECT data FROM zstd_dictionary WHERE id = ?", (codec,))
+    return zstd.ZstdCompressionDict(data)
+
+
+def _new_decompressor(execute, codec):
+    dictionary = _dictionary(execute, codec)
+    kwargs = {"dict_data": dictionary} if dictionary is not None else {}
+    return _zstd().ZstdDecompressor(**kwargs)
+
+
+def _decompressor(execute, codec):
+    if codec not in _decompressors:
+        _decompressors[codec] = _new_decompressor(execute, codec)
+    return _decompressors[codec]
+
+
+def _compressor(execute, codec, level):
+    if (codec, level) not in _compressors:
+        dictionary = _dictionary(execute, codec)
+        kwargs = {"dict_data": dictionary} if dictionary is not None else {}
+        _compressors[(codec, level)] = _zstd().ZstdCompressor(level=level, **kwargs)
+    return _compressors[(codec, level)]
+
+
+def _execute(connection):
+    # Dictionary lookups go through whatever connection reads the row.
+    def execute(statement, params):
+        return connection.execute(statement, params).fetchone()
+
+    return execute
+
+
+def _session_execute(statement, params):
+    from . import db
+
+    return _execute(db.session.connection())(statement, params)
+
+
+def decode(value, codec, execute=_session_execute):
+    # Dictionaries never change, so decompressors are cached by id.
+    if codec is None or value is None:
+        return value
+    return _decompressor(execute, codec).decompress(value).decode("utf-8")
+
+
+def decoder(execute):
+    """
+    decode() for the rows of another database, e.g. a crawl shard, whose
+    dictionaries `execute` reads: its codec ids mean other dictionaries,
+    so it keeps decompressors of its own instead of the process cache.
+    """
+    decompressors = {}
+
+    def decode(value, codec):
+        if codec is None or value is None:
+            return value
+        if codec not in decompressors:
+            decompressors[codec] = _new_decompressor(execute, codec)
+        return decompressors[codec].decompress(value).decode("utf-8")
+
+    return decode
+
+
+def encode(value, codec, level=LEVEL, execute=_session_execute):
+    return _compressor(execute, codec, level).compress(value.encode("utf-8"))
+
+
+@event.listens_for(Engine, "connect")
+def _on_connect(connection, record):
+    if isinstance(connection, sqlite3.Connection):
+        execute = _execute(connection)
+        connection.create_function(
+            "pib_text", 2, lambda value, codec: decode(value, codec, execute)
+        )
+
+
+class decoded(FunctionElement):
+    type = Text()
+    name = "pib_text"
+
+
+@compiles(decoded)
+def _compile_decoded(element, compiler, **kw):
+    value, codec = element.clauses
+    return compiler.process(value, **kw)
+
+
+@compiles(decoded, "sqlite")
+def _compile_decoded_sqlite(element, compiler, **kw):
+    return "pib_text({})".format(compiler.process(element.clauses, **kw))
+
+
+def latest(connection, table, lang):
+    """
+    The newest dictionary for `table` and `lang`, None if there is none.
+    Found ones are cached for the life of the process.
+    """
+    if (table, lang) not in _latest:
+        codec = connection.execute(
+            text(
+                "SELECT max(id) FROM zstd_dictionary "
+                "WHERE source = :table AND lang = :lang"
+            ),
+            {"table": table, "lang": lang},
+        ).scalar()
+        if codec is None:
+            return None
+        _latest[(table, lang)] = codec
+    return _latest[(table, lang)]
+
+
+def compress_on_write(mapper, connection, target):
+    """
+    before_insert/before_update hook for the models: compresses the text
+    of plain rows when PIB_COMPRESSION=zstd and their language has a
+    dictionary.
+    """
+    if not enabled() or connection.dialect.name != "sqlite":
+        return
+    table = mapper.local_table.name
+    attribute = "_" + COLUMNS[table]
+    value = getattr(target, attribute)
+    if target.codec is not None or not isinstance(value, str):
+        return
+    value, codec = _compress(connection, table, target.lang, value)
+    setattr(target, attribute, value)
+    target.codec = codec
+
+
+def compress_rows(connection, table, rows):
+    """
+    compress_on_write() for rows written through Core: dicts with the text
+    column, lang and codec, compressed in place.
+    """
+    if not enabled() or connection.dialect.name != "sqlite" or table not in COLUMNS:
+        return
+    column = COLUMNS[table]
+    for row in rows:
+        if row.get("codec") is None and isinstance(row[column], str):
+            row[column], row["codec"] = _compress(
+                connection, table, row["lang"], row[column]
+            )
+
+
+def _compress(connection, table, lang, value):
+    # (stored value, codec), plain if there is no dictionary or it does
+    # not pay off.
+    codec = latest(connection, table, lang)
+    if codec is not None:
+        encoded = encode(value, codec, execute=_execute(connection))
+        if len(encoded) < len(value.encode("utf-8")):
+            return encoded, codec
+    return value, None
+
+
+def train(connection, table, lang, samples=2000, size=DICT_SIZE, seed=42):
+    """
+    Trains a dictionary on up to `samples` random rows of `table` in
+    `lang` and stores it. Returns its codec, 0 when there are too few
+    rows to train on.
+    """
+    zstd = _zstd()
+    column = COLUMNS[table]
+    ids = [
+        row.id
+        for row in connection.execute(
+            text("SELECT id FROM {} WHERE lang = :lang".format(table)), {"lang": lang}
+        )
+    ]
+    ids = random.Random(seed).sample(ids, min(samples, len(ids)))
+
+    execute, texts = _execute(connection), []
+    for idx in ids:
+        row = connection.execute(
+            text("SELECT {}, codec FROM {} WHERE id = :id".format(column, table)),
+            {"id": idx},
+        ).fetchone()
+        value = decode(row[0], row[1], execute)
+        if value:
+            texts.append(value.encode("utf-8"))
+
+    try:
+        dictionary = zstd.train_dictionary(size, texts)
+    except zstd.ZstdError as e:
+        logging.info("No dictionary for {}/{}: {}".format(table, lang, e))
+        return 0
+
+    with connection.begin():
+        result = connection.execute(
+            text(
+                "INSERT INTO zstd_dictionary (source, lang, samples, data, date) "
+                "VALUES (:table, :lang, :samples, :data, CURRENT_TIMESTAMP)"
+            ),
+            {
+                "table": table,
+                "lang": lang,
+                "samples": len(texts),
+                "data": dictionary.as_bytes(),
+            },
+        )
+    codec = result.lastrowid
+    _latest[(table, lang)] = codec
+    return codec
+
+
+def recode_table(connection, table, codec_f, chunk_size=1000, level=LEVEL, langs=None):
+    """
+    Rewrites the text of `table` chunk by chunk, one transaction per
+    chunk, so a long run can be interrupted and resumed. `codec_f(lang)`
+    gives the target codec for a language, None for plain text; rows
+    already stored that way are skipped. Rows zstd would not shrink are
+    stored plain, and tried again on the next run.
+
+    Returns `{lang: (rows, plain bytes, stored bytes, seconds)}`.
+    """
+    column = COLUMNS[table]
+    execute = _execute(connection)
+    if langs is None:
+        langs = [
+            lang
+            for (lang,) in connection.execute(
+                "SELECT DISTINCT lang FROM {}".format(table)
+            )
+        ]
+
+    stats = {}
+    for lang in langs:
+        codec = codec_f(lang)
+        select = text(
+            "SELECT id, {column}, codec FROM {table} "
+            "WHERE lang = :lang AND codec IS NOT :codec AND id > :last "
+            "ORDER BY id LIMIT :chunk_size".format(column=column, table=table)
+        )
+        update = text(
+            "UPDATE {table} SET {column} = :value, codec = :codec "
+            "WHERE id = :id".format(column=column, table=table)
+        )
+        rows, plain, stored, last = 0, 0, 0, 0
+        start = time.time()
+        while True:
+            params = dict(lang=lang, codec=codec, last=last, chunk_size=chunk_size)
+            chunk = connection.execute(select, params).fetchall()
+            if not chunk:
+                break
+            updates = []
+            for idx, value, current in chunk:
+                value = decode(value, current, execute)
+                size = len(value.encode("utf-8")) if value else 0
+                encoded, target = value, None
+                if value and codec is not None:
+                    encoded, target = encode(value, codec, level, execute), codec
+                    if len(encoded) >= size:
+                        # Short texts can come out larger, those stay plain.
+                        encoded, target = value, None
+                updates.append({"id": idx, "value": encoded, "codec": target})
+                plain += size
+                stored += len(encoded) if target is not None else size
+            with connection.begin():
+                connection.execute(update, updates)
+            rows += len(chunk)
+            last = chunk[-1][0]
+        stats[lang] = (rows, plain, stored, time.time() - start)
+    return stats
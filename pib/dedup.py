@@ -0,0 +1,341 @@
+"""
+Near-duplicate entries, found with MinHash signatures over shingled
+content and locality sensitive hashing, one language at a time.
+
+Each entry's content is cut into word `SHINGLE`-grams and summarised by
+`PERMUTATIONS` minimum hashes (minhash); the fraction of equal minimums
+between two signatures estimates the Jaccard similarity of their
+shingles. Signatures are cut into `BANDS` bands, each hashed to a key
+(minhash_band); entries sharing a key in some band are the candidates,
+kept if their estimated similarity reaches the threshold.
+
+Duplicates are grouped into clusters (cluster), each under its smallest
+entry id, the earliest release, which stands for the others: entries
+with a cluster row naming another entry are the duplicates jobs skip
+with representative(). Entries without duplicates have no row.
+"""
+
+import hashlib
+import zlib
+
+import numpy as np
+from sqlalchemy import and_, bindparam, exists, select
+
+from .bulk import batched
+from .models import Cluster, Entry, MinHash, MinHashBand
+from .plans import band_neighbours
+from .segments import digest
+
+SHINGLE = 3
+PERMUTATIONS = 128
+BANDS = 16
+SEED = 42
+THRESHOLD = 0.8
+
+# Multiply-shift hashing, (a x + b) mod 2**64 >> 32 with a odd, stands in
+# for a random permutation of 32 bit shingle hashes.
+_rng = np.random.RandomState(SEED)
+_A = _rng.randint(0, 1 << 62, size=PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+_A = _A * np.uint64(4) + np.uint64(1)
+_B = _rng.randint(0, 1 << 62, size=PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+
+
+def shingles(content):
+    """Hashes of the word SHINGLE-grams of `content`, as uint64 < 2**32."""
+    words = content.lower().split()
+    crcs = {word: zlib.crc32(word.encode("utf-8")) for word in set(words)}
+    words = np.array([crcs[word] for word in words], dtype=np.uint64)
+    if len(words) < SHINGLE:
+        return np.unique(words)
+    hashes = np.zeros(len(words) - SHINGLE + 1, dtype=np.uint64)
+    for offset in range(SHINGLE):
+        # Wraps around 2**64; only the low 32 bits are kept.
+        hashes = hashes * np.uint64(1000003) + words[offset : len(hashes) + offset]
+    return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+
+def signature(content):
+    """The MinHash signature of `content`, None if it has no words."""
+    hashes = shingles(content or "")
+    if not len(hashes):
+        return None
+    permuted = (hashes[:, None] * _A[None, :] + _B[None, :]) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature):
+    rows = PERMUTATIONS // BANDS
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                signature[band * rows : (band + 1) * rows].tobytes(), digest_size=8
+            ).digest(),
+            "little",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    return float(np.mean(first == second))
+
+
+def _signatures(connection, ids):
+    signatures = {}
+    for batch in batched(sorted(ids), 500):
+        query = select([MinHash.entry_id, MinHash.signature]).where(
+            MinHash.entry_id.in_(batch)
+        )
+        for entry_id, data in connection.execute(query):
+            signatures[entry_id] = np.frombuffer(data, dtype=np.uint32)
+    return signatures
+
+
+def _sign(connection, batch):
+    signatures, bands = [], []
+    for entry_id, lang, content in batch:
+        sig = signature(content)
+        if sig is None:
+            continue
+        signatures.append(
+            {
+                "entry_id": entry_id,
+                "lang": lang,
+                "digest": digest(content),
+                "signature": sig.tobytes(),
+            }
+        )
+        bands.extend(
+            {"entry_id": entry_id, "band": band, "lang": lang, "key": key}
+            for band, key in enumerate(band_keys(sig))
+        )
+    ids = [row["entry_id"] for row in signatures]
+    if not ids:
+        return ids
+    with connection.begin():
+        for table in (MinHashBand.__table__, MinHash.__table__):
+            connection.execute(
+                table.delete().where(
+                    table.c.entry_id.in_(bindparam("ids", expanding=True))
+                ),
+                {"ids": ids},
+            )
+        connection.execute(MinHash.__table__.insert(), signatures)
+        connection.execute(MinHashBand.__table__.insert(), bands)
+    return ids
+
+
+def index(connection, langs=None, rescan=False, ids=None, batch_size=1000):
+    """
+    Signs entries with content that have no signature yet, or, with
+    `rescan`, whose content changed since; only `ids` if given. Walks entries by id a batch at
+    a time, each read before its writes, and commits once per batch.
+    Returns the ids signed.
+    """
+    query = (
+        select([Entry.id, Entry.lang, Entry.content, MinHash.digest])
+        .select_from(
+            Entry.__table__.outerjoin(MinHash.__table__, MinHash.entry_id == Entry.id)
+        )
+        .where(and_(Entry._content.isnot(None), Entry.id > bindparam("last")))
+        .order_by(Entry.id)
+        .limit(batch_size)
+    )
+    if not rescan:
+        query = query.where(MinHash.entry_id.is_(None))
+    if langs is not None:
+        query = query.where(Entry.lang.in_(langs))
+    if ids is not None:
+        query = query.where(Entry.id.in_(ids))
+
+    signed, last = [], -1
+    while True:
+        rows = connection.execute(query, last=last).fetchall()
+        if not rows:
+            return signed
+        last = rows[-1].id
+        batch = [
+            (row.id, row.lang, row.content)
+            for row in rows
+            if row.digest is None or row.digest != digest(row.content)
+        ]
+        signed.extend(_sign(connection, batch))
+
+
+def candidates(connection, entry_id):
+    """Entries sharing a band key with `entry_id`, in its language."""
+    query = band_neighbours(entry_id)
+    return list(dict.fromkeys(row.entry_id for row in connection.execute(query)))
+
+
+def near_duplicates(connection, entry_id, threshold=THRESHOLD):
+    """
+    `[(id, similarity)]` of the entries estimated at least `threshold`
+    similar to `entry_id`, most similar first. The entry must be signed.
+    """
+    ids = candidates(connection, entry_id)
+    signatures = _signatures(connection, ids + [entry_id])
+    if entry_id not in signatures:
+        return []
+    mine = signatures.pop(entry_id)
+    scored = [(other, similarity(mine, sig)) for other, sig in signatures.items()]
+    return sorted(
+        [(other, score) for other, score in scored if score >= threshold],
+        key=lambda pair: (-pair[1], pair[0]),
+    )
+
+
+class _Components:
+    # Union-find, every component under its smallest id.
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, x, y):
+        x, y = self.find(x), self.find(y)
+        if x != y:
+            self.parent[max(x, y)] = min(x, y)
+
+    def groups(self):
+        groups = {}
+        for x in list(self.parent):
+            groups.setdefault(self.find(x), []).append(x)
+        return groups
+
+
+def _write_clusters(connection, groups, signatures):
+    rows = []
+    for root, members in groups.items():
+        if len(members) < 2:
+            continue
+        for member in members:
+            rows.append(
+                {
+                    "entry_id": member,
+                    "cluster_id": root,
+                    "similarity": similarity(signatures[root], signatures[member]),
+                }
+            )
+    for batch in batched(rows, 5000):
+        connection.execute(Cluster.__table__.insert(), batch)
+    return len(rows)
+
+
+def link(connection, ids, threshold=THRESHOLD):
+    """
+    Adds the entries `ids`, just signed, to the clusters of their near
+    duplicates, merging clusters they bridge. Returns the number of
+    cluster rows written.
+    """
+    components = _Components()
+    for entry_id in ids:
+        components.find(entry_id)
+        for other, _ in near_duplicates(connection, entry_id, threshold):
+            components.union(entry_id, other)
+
+    # Whole clusters the new entries touch are rewritten.
+    touched = list(components.parent)
+    existing = {}
+    for batch in batched(touched, 500):
+        query = select([Cluster.entry_id, Cluster.cluster_id]).where(
+            Cluster.entry_id.in_(batch)
+        )
+        existing.update(connection.execute(query).fetchall())
+    roots = set(existing.values())
+    for batch in batched(sorted(roots), 500):
+        query = select([Cluster.entry_id, Cluster.cluster_id]).where(
+            Cluster.cluster_id.in_(batch)
+        )
+        existing.update(connection.execute(query).fetchall())
+    for member, root in existing.items():
+        components.union(member, root)
+
+    groups = {
+        root: members
+        for root, members in components.groups().items()
+        if len(members) > 1
+    }
+    members = [member for group in groups.values() for member in group]
+    signatures = _signatures(connection, members)
+    with connection.begin():
+        for batch in batched(members, 500):
+            connection.execute(
+                Cluster.__table__.delete().where(Cluster.entry_id.in_(batch))
+            )
+        return _write_clusters(connection, groups, signatures)
+
+
+def rebuild_clusters(connection, langs=None, threshold=THRESHOLD):
+    """
+    Clusters the signed entries of each of `langs` (all by default) from
+    scratch, from buckets of equal band keys. Returns the number of
+    cluster rows.
+    """
+    if langs is None:
+        langs = [
+            row.lang for row in connection.execute(select([MinHash.lang]).distinct())
+        ]
+    written = 0
+    for lang in langs:
+        query = select([MinHash.entry_id, MinHash.signature]).where(
+            MinHash.lang == lang
+        )
+        signatures = {
+            entry_id: np.frombuffer(data, dtype=np.uint32)
+            for entry_id, data in connection.execute(query)
+        }
+        buckets = {}
+        for entry_id in sorted(signatures):
+            for band, key in enumerate(band_keys(signatures[entry_id])):
+                buckets.setdefault((band, key), []).append(entry_id)
+
+        components = _Components()
+        for members in buckets.values():
+            # Each member joins the first head it is close enough to,
+            # the rest start heads of their own: linear in the bucket
+            # when it holds copies of one release.
+            heads = []
+            for member in members:
+                for head in heads:
+                    score = similarity(signatures[head], signatures[member])
+                    if score >= threshold:
+                        components.union(head, member)
+                        break
+                else:
+                    heads.append(member)
+
+        with connection.begin():
+            clustered = select([MinHash.entry_id]).where(MinHash.lang == lang)
+            connection.execute(
+                Cluster.__table__.delete().where(Cluster.entry_id.in_(clustered))
+            )
+            written += _write_clusters(connection, components.groups(), signatures)
+    return written
+
+
+def duplicates(connection, langs=None):
+    """Ids of the entries another entry stands for, for snapshot sources."""
+    query = select([Cluster.entry_id]).where(Cluster.entry_id != Cluster.cluster_id)
+    if langs is not None:
+        query = query.select_from(
+            Cluster.__table__.join(Entry.__table__, Entry.id == Cluster.entry_id)
+        ).where(Entry.lang.in_(langs))
+    return {row.entry_id for row in connection.execute(query)}
+
+
+def representative():
+    """Filters queries over Entry to one entry per cluster."""
+    # Correlated on cluster's primary key, a lookup per entry instead of
+    # listing every duplicate up front.
+    return ~exists().where(
+        and_(Cluster.entry_id == Entry.id, Cluster.cluster_id != Entry.id)
+    )
@@ -3,7 +3,7 @@ import sys
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 
-from flask import Blueprint, Flask, redirect, render_template, request
+from flask import Blueprint, Flask, abort, jsonify, redirect, render_template, request
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import and_, func
@@ -11,7 +11,9 @@ from sqlalchemy import and_, func
 from . import db
 from . import models as M
 from .models import Entry, Link
+from .plans import by_link_count, links_from, links_of
 from .retrieval import retrieve_neighbours
+from .search import parse_date, search
 from .utils import clean_translation, detok, lazy_load, split_and_wrap_in_p
 
 docstore = Blueprint("docstore", __name__, template_folder="templates")
@@ -19,8 +21,30 @@ docstore = Blueprint("docstore", __name__, template_folder="templates")
 
 @docstore.route("/")
 def index():
-    entries = db.session.query(M.Entry).order_by(M.Entry.final_link_count.desc()).all()
-    return render_template("frozen_links.html", entries=entries)
+    # Walks ix_entry_link_count backwards, no count over the whole table.
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(500, max(1, int(request.args.get("per_page", 50))))
+    except ValueError:
+        abort(400)
+
+    rows = db.session.execute(by_link_count(page, per_page)).fetchall()
+    entries = rows[:per_page]
+
+    # The links of the whole page in one query.
+    links = defaultdict(list)
+    if entries:
+        query = links_of([entry.id for entry in entries])
+        for first_id, other_id, lang in db.session.execute(query):
+            links[first_id].append((other_id, lang))
+
+    return render_template(
+        "frozen_links.html",
+        entries=entries,
+        links=links,
+        page=page,
+        has_next=len(rows) > per_page,
+    )
 
 
 @docstore.route("/entry/<id>")
@@ -31,7 +55,7 @@ def entry(id):
     group = defaultdict(list)
 
     x.content = split_and_wrap_in_p(x.content)
-    links = M.Link.query.filter_by(first_id=id).all()
+    links = M.Link.query.from_statement(links_from(id)).all()
     group = {idx: link for idx, link in enumerate(links)}
     return render_template("entry.html", entry=x, retrieved=group)
 
@@ -54,6 +78,57 @@ def listing():
     return render_template("listing.html", entries=x)
 
 
+def search_results():
+    if db.engine.dialect.name != "sqlite":
+        # The index is SQLite FTS5, see pib.search.
+        abort(501)
+    q = request.args.get("q", "")
+    source = request.args.get("source", "entry")
+    if source not in ["entry", "translation"]:
+        abort(400)
+    try:
+        begin = parse_date(request.args.get("from"))
+        end = parse_date(request.args.get("to"))
+        if end is not None:
+            end += timedelta(days=1)
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(100, max(1, int(request.args.get("per_page", 20))))
+        # Ranks only the most recent matches, faster on common terms.
+        max_ranked = request.args.get("max_ranked")
+        max_ranked = max(1, int(max_ranked)) if max_ranked else None
+    except ValueError:
+        abort(400)
+
+    results, has_next, truncated = search(
+        db.session,
+        q,
+        lang=request.args.get("lang"),
+        begin=begin,
+        end=end,
+        source=source,
+        page=page,
+        per_page=per_page,
+        max_ranked=max_ranked,
+    )
+    return {
+        "q": q,
+        "page": page,
+        "results": results,
+        "has_next": has_next,
+        "truncated": truncated,
+    }
+
+
+@docstore.route("/search")
+def search_page():
+    return render_template("search.html", **search_results())
+
+
+@docstore.route("/api/search")
+def search_api():
+    return jsonify(search_results())
+
+
 @docstore.route("/parallel")
 def parallel():
     def process(key):
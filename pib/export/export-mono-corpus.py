@@ -7,8 +7,12 @@ from ilmulti.segment import build_segmenter
 from sqlalchemy import and_, func
 from tqdm import tqdm
 
-from pib import db
+from pib import db, dedup
+from pib.bulk import batched
 from pib.models import Entry
+from pib.segments import segmented
+from pib.snapshot import Snapshot
+from pib.storage import stream
 
 
 class WriteStrategy:
@@ -24,8 +28,9 @@ class WriteStrategy:
 
 
 class RawDump(WriteStrategy):
-    def add_content(self, content):
-        print(content, file=self._file)
+    def add_entries(self, entries):
+        for entry in entries:
+            print(entry.content, file=self._file)
 
 
 class Segmented(WriteStrategy):
@@ -35,12 +40,14 @@ class Segmented(WriteStrategy):
 
         # TODO(jerin): Remove this hacky two lines.
         self.segmenter = build_segmenter("pattern")
+        self.cache = segmented(self.segmenter, "pattern")
 
-    def add_content(self, content):
-        lang, segments = self.segmenter(content, lang=args.lang)
-        self.unique.update(segments)
+    def add_entries(self, entries):
+        for segments in self.cache.get_many(entries, lang=args.lang):
+            self.unique.update(segments)
 
     def __exit__(self, *args, **kwargs):
+        self.cache.flush()
         for sample in self.unique:
             print(sample, file=self._file)
         self._file.close()
@@ -51,11 +58,28 @@ def export(args):
 
     Strategy = Segmented if args.segment else RawDump
     with Strategy(fpath) as strategy:
-        entries = db.session.query(Entry).filter(Entry.lang == args.lang).all()
-
-        for entry in tqdm(entries):
-            if entry.content:
-                strategy.add_content(entry.content)
+        if args.snapshot:
+            snapshot = Snapshot(args.snapshot)
+            langs = [args.lang]
+            entries = snapshot.rows("entry", langs, columns=["id", "content"])
+            total = snapshot.count("entry", langs)
+            if args.one_per_cluster:
+                with db.engine.connect() as connection:
+                    skip = dedup.duplicates(connection, langs)
+                entries = (entry for entry in entries if entry.id not in skip)
+                total -= len(skip)
+        else:
+            query = db.session.query(Entry.id, Entry.content).filter(
+                Entry.lang == args.lang
+            )
+            if args.one_per_cluster:
+                query = query.filter(dedup.representative())
+            entries, total = stream(db.engine, query), query.count()
+
+        with tqdm(total=total) as pbar:
+            for batch in batched(entries, 500):
+                strategy.add_entries([entry for entry in batch if entry.content])
+                pbar.update(len(batch))
 
 
 if __name__ == "__main__":
@@ -69,5 +93,13 @@ if __name__ == "__main__":
         action="store_true",
         help="Segment lines or not using available segmenter, also enables unique.",
     )
+    parser.add_argument(
+        "--snapshot", help="Read entries from this snapshot instead of the DB"
+    )
+    parser.add_argument(
+        "--one-per-cluster",
+        help="Skip near-duplicates of another entry, see pib.cli.dedup",
+        action="store_true",
+    )
     args = parser.parse_args()
     export(args)
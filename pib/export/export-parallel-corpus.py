@@ -10,29 +10,30 @@ from ilmulti.translator import from_pretrained
 from sqlalchemy import and_, func, or_
 from tqdm import tqdm
 
-from pib import db
+from pib import db, dedup
 from pib.cli.utils import ParallelWriter, Preproc
 from pib.models import Entry, Link, Translation
+from pib.plans import translation_of
+from pib.snapshot import Snapshot
+from pib.storage import stream
 
 
 def get_src_hyp_io(src_id, tgt_lang, model):
     src_io, hyp_io = None, None
     exists = False
     entry = Entry.query.filter(Entry.id == src_id).first()
-    hyp = Translation.query.filter(
-        and_(Translation.parent_id == src_id, Translation.model == model)
-    ).first()
+    hyp = Translation.query.from_statement(translation_of(src_id, model)).first()
 
     if hyp and entry.content and hyp.translated:
         exists = True
-        _, src_io = preproc.process(entry.content, entry.lang)
+        _, src_io = preproc.process_entry(entry)
         hyp_io = StringIO(hyp.translated)
     return src_io, hyp_io, exists
 
 
 def get_tgt_io(retrieved_id):
     tgt = Entry.query.filter(Entry.id == retrieved_id).first()
-    tgt_tokenized, tgt_io = preproc.process(tgt.content, tgt.lang)
+    tgt_tokenized, tgt_io = preproc.process_entry(tgt)
     return tgt_io
 
 
@@ -60,13 +61,31 @@ def aligned_entries(model, src_lang, tgt_lang):
         return False
 
 
-def export(src_lang, tgt_lang, model, threshold, resume_from=0):
-    entries = Entry.query.filter(Entry.lang == src_lang).all()
-
-    entry_list = [entry.id for entry in entries]
+def export(
+    src_lang,
+    tgt_lang,
+    model,
+    threshold,
+    resume_from=0,
+    snapshot=None,
+    one_per_cluster=False,
+):
+    if snapshot is not None:
+        entries = snapshot.rows("entry", [src_lang], columns=["id"])
+        total = snapshot.count("entry", [src_lang])
+        if one_per_cluster:
+            with db.engine.connect() as connection:
+                skip = dedup.duplicates(connection, [src_lang])
+            entries = (entry for entry in entries if entry.id not in skip)
+            total -= len(skip)
+    else:
+        query = db.session.query(Entry.id).filter(Entry.lang == src_lang)
+        if one_per_cluster:
+            query = query.filter(dedup.representative())
+        entries, total = stream(db.engine, query), query.count()
     counter = 0
 
-    for entry in tqdm(entries):
+    for entry in tqdm(entries, total=total):
         if counter < resume_from:
             counter += 1
             continue
@@ -109,11 +128,19 @@ if __name__ == "__main__":
     )
     parser.add_argument("--resume-from", help="", default=0, type=int)
     parser.add_argument("--threshold", help="", default=0.5, type=float)
+    parser.add_argument(
+        "--snapshot", help="Read entries from this snapshot instead of the DB"
+    )
+    parser.add_argument(
+        "--one-per-cluster",
+        help="Skip near-duplicates of another entry, see pib.cli.dedup",
+        action="store_true",
+    )
     args = parser.parse_args()
 
     engine = from_pretrained(tag=args.model, use_cuda=False)
     aligner = BLEUAligner(engine.translator, engine.tokenizer, engine.segmenter)
-    preproc = Preproc(engine.segmenter, engine.tokenizer)
+    preproc = Preproc(engine.segmenter, engine.tokenizer, version=args.model)
 
     fpath = os.path.join(args.output_dir, args.model)
     pwriter = ParallelWriter(fpath, fname="aligned")
@@ -121,4 +148,14 @@ if __name__ == "__main__":
     aligned = open(
         "{}-aligned-{}-{}.txt".format(args.model, args.src_lang, args.tgt_lang), "w"
     )
-    export(args.src_lang, args.tgt_lang, args.model, args.threshold, args.resume_from)
+    snapshot = Snapshot(args.snapshot) if args.snapshot else None
+    export(
+        args.src_lang,
+        args.tgt_lang,
+        args.model,
+        args.threshold,
+        args.resume_from,
+        snapshot,
+        args.one_per_cluster,
+    )
+    preproc.flush()
@@ -1,33 +1,41 @@
 import datetime
 
-from sqlalchemy import func, select
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from . import db
+# storage's PRAGMA listener has to be in place for the connection
+# create_all() opens below.
+from . import compression, db, search, storage  # noqa: F401
 
 
 class Entry(db.Model):
     __tablename__ = "entry"
+    __table_args__ = (db.Index("ix_entry_lang_date", "lang", "date"),)
     __searchable__ = ["content"]
     id = db.Column("id", db.Integer, primary_key=True)
     lang = db.Column(db.String(100))
     date = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
-    content = db.Column(db.Text)
+    _content = db.Column("content", db.Text)
+    codec = db.Column(db.Integer)
     place = db.Column(db.String(100))
+    # Links with this entry as first_id, kept by pib.bulk.
+    link_count = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False, index=True
+    )
     neighbors = db.relationship("Link", primaryjoin="Link.first_id==Entry.id")
     translations = db.relationship("Translation", backref="entry")
 
     @hybrid_property
-    def link_count(self):
-        return self.finalized.count()
+    def content(self):
+        return compression.decode(self._content, self.codec)
+
+    @content.setter
+    def content(self, value):
+        self._content, self.codec = value, None
 
-    @link_count.expression
-    def link_count(cls):
-        return (
-            select([func.count(Link.other_id)])
-            .where(Link.anchor_id == cls.id)
-            .label("link_count")
-        )
+    @content.expression
+    def content(cls):
+        return compression.decoded(cls._content, cls.codec).label("content")
 
 
 class Link(db.Model):
@@ -46,6 +54,7 @@ class Translation(db.Model):
     __tablename__ = "translation"
     __table_args__ = (
         db.UniqueConstraint("parent_id", "model", name="unique_parent_model"),
+        db.Index("ix_translation_model_lang", "model", "lang"),
     )
 
     __searchable__ = ["translated"]
@@ -53,7 +62,82 @@ class Translation(db.Model):
     parent_id = db.Column(db.Integer, db.ForeignKey("entry.id"), nullable=False)
     model = db.Column(db.String(100))
     lang = db.Column(db.String(100))
-    translated = db.Column(db.Text)
+    _translated = db.Column("translated", db.Text)
+    codec = db.Column(db.Integer)
+
+    @hybrid_property
+    def translated(self):
+        return compression.decode(self._translated, self.codec)
+
+    @translated.setter
+    def translated(self, value):
+        self._translated, self.codec = value, None
+
+    @translated.expression
+    def translated(cls):
+        return compression.decoded(cls._translated, cls.codec).label("translated")
+
+
+class Dictionary(db.Model):
+    # zstd dictionaries, see pib.compression.
+    __tablename__ = "zstd_dictionary"
+    id = db.Column("id", db.Integer, primary_key=True)
+    source = db.Column(db.String(100))
+    lang = db.Column(db.String(100))
+    samples = db.Column(db.Integer)
+    data = db.Column(db.LargeBinary)
+    date = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+class Segment(db.Model):
+    # Segmented and tokenized entries, see pib.segments.
+    __tablename__ = "segment"
+    entry_id = db.Column(db.Integer, db.ForeignKey("entry.id"), primary_key=True)
+    version = db.Column(db.String(100), primary_key=True)
+    lang = db.Column(db.String(100), primary_key=True)
+    digest = db.Column(db.String(40), nullable=False)
+    lines = db.Column(db.Text)
+
+
+class MinHash(db.Model):
+    # Signatures of entry content, see pib.dedup.
+    __tablename__ = "minhash"
+    entry_id = db.Column(db.Integer, db.ForeignKey("entry.id"), primary_key=True)
+    lang = db.Column(db.String(100), index=True)
+    digest = db.Column(db.String(40), nullable=False)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+
+class MinHashBand(db.Model):
+    __tablename__ = "minhash_band"
+    __table_args__ = (db.Index("ix_minhash_band_key", "lang", "band", "key"),)
+    entry_id = db.Column(db.Integer, db.ForeignKey("entry.id"), primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    lang = db.Column(db.String(100))
+    key = db.Column(db.BigInteger, nullable=False)
+
+
+class Cluster(db.Model):
+    # Near-duplicate entries under the one standing for them.
+    __tablename__ = "cluster"
+    entry_id = db.Column(db.Integer, db.ForeignKey("entry.id"), primary_key=True)
+    cluster_id = db.Column(
+        db.Integer, db.ForeignKey("entry.id"), nullable=False, index=True
+    )
+    similarity = db.Column(db.Float)
+
+
+for model in [Entry, Translation]:
+    event.listen(model, "before_insert", compression.compress_on_write)
+    event.listen(model, "before_update", compression.compress_on_write)
 
 
 db.create_all()
+if db.engine.dialect.name == "sqlite":
+    with db.engine.begin() as connection:
+        # DBs without the codec columns yet get the index from the migration.
+        columns = [
+            column["name"] for column in inspect(connection).get_columns("entry")
+        ]
+        if "codec" in columns:
+            search.create_index(connection)
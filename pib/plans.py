@@ -0,0 +1,210 @@
+"""
+The lookups the crawl, translate, retrieve and export paths run per
+entry, as Core selects built here and used by the call sites, so the
+SQLite query plans checked (pib.cli.check-query-plans) and timed
+(pib.bench.indexes) are those of the queries that actually run.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, select
+
+from .models import Entry, Link, MinHashBand, Segment, Translation
+
+LANGS = ["hi", "ta", "te", "ml", "ur", "bn", "gu", "mr", "pa", "or"]
+
+
+def near(columns, langs, day, days):
+    """Entries in `langs` released within `days` of `day`."""
+    delta = timedelta(days=days)
+    return select(columns).where(
+        and_(Entry.lang.in_(langs), Entry.date.between(day - delta, day + delta))
+    )
+
+
+def untranslated(columns, langs, model, lang="en"):
+    """Entries in `langs` without a translation by `model` into `lang`."""
+    # Anti-join on unique_parent_model.
+    translation = Translation.__table__
+    return (
+        select(columns)
+        .select_from(
+            Entry.__table__.outerjoin(
+                translation,
+                and_(
+                    translation.c.parent_id == Entry.id,
+                    translation.c.model == model,
+                    translation.c.lang == lang,
+                ),
+            )
+        )
+        .where(and_(Entry.lang.in_(langs), translation.c.id.is_(None)))
+    )
+
+
+def translations_by(model, lang):
+    return select([Translation.id]).where(
+        and_(Translation.model == model, Translation.lang == lang)
+    )
+
+
+def translation_of(entry_id, model):
+    translation = Translation.__table__
+    return select([translation]).where(
+        and_(translation.c.parent_id == entry_id, translation.c.model == model)
+    )
+
+
+def by_link_count(page, per_page):
+    # One row past the page tells whether there is a next one.
+    return (
+        select([Entry.id, Entry.lang, Entry.link_count])
+        .order_by(Entry.link_count.desc(), Entry.id.desc())
+        .limit(per_page + 1)
+        .offset((page - 1) * per_page)
+    )
+
+
+def links_of(ids):
+    """`(first_id, id, lang)` of the entries linked from `ids`."""
+    return (
+        select([Link.first_id, Entry.id, Entry.lang])
+        .select_from(Link.__table__.join(Entry.__table__, Link.second_id == Entry.id))
+        .where(Link.first_id.in_(ids))
+    )
+
+
+def links_from(entry_id):
+    return select([Link.__table__]).where(Link.first_id == entry_id)
+
+
+def segments_of(version, ids):
+    return select(
+        [Segment.entry_id, Segment.lang, Segment.digest, Segment.lines]
+    ).where(and_(Segment.version == version, Segment.entry_id.in_(ids)))
+
+
+def band_neighbours(entry_id):
+    """
+    Entries sharing a band key with `entry_id`, in its language, once per
+    band they share: DISTINCT would sort them in a temporary b-tree.
+    """
+    mine, theirs = MinHashBand.__table__.alias(), MinHashBand.__table__.alias()
+    return (
+        select([theirs.c.entry_id])
+        .select_from(
+            mine.join(
+                theirs,
+                and_(
+                    theirs.c.lang == mine.c.lang,
+                    theirs.c.band == mine.c.band,
+                    theirs.c.key == mine.c.key,
+                ),
+            )
+        )
+        .where(and_(mine.c.entry_id == entry_id, theirs.c.entry_id != entry_id))
+    )
+
+
+def hot_queries(entry_id=1, day=datetime(2019, 6, 1), model="mm-all", lang="hi"):
+    """
+    Returns `{name: (select, indexes, walk)}`, `indexes` being the ones
+    the plan may search and `walk` the one it may scan in order, if any.
+    Parameters default to values the synthetic bench DB has.
+    """
+    from . import dedup
+
+    return {
+        "retrieval.get_candidates": (
+            near([Entry.id, Entry.lang], LANGS, day, 2),
+            ["ix_entry_lang_date"],
+            None,
+        ),
+        "retrieval.get_candidates_by_lang": (
+            near([Entry.id], [lang], day, 2),
+            ["ix_entry_lang_date"],
+            None,
+        ),
+        "translate_pib.untranslated": (
+            untranslated([Entry.id, Entry.lang], LANGS, model),
+            ["ix_entry_lang_date", "unique_parent_model"],
+            None,
+        ),
+        "export-parallel-corpus.get_src_hyp_io": (
+            translation_of(entry_id, model),
+            ["unique_parent_model"],
+            None,
+        ),
+        "translate_pib.delete_existing_translations": (
+            translations_by(model, "en"),
+            ["ix_translation_model_lang"],
+            None,
+        ),
+        "docstore.index": (
+            by_link_count(page=2, per_page=50),
+            [],
+            "ix_entry_link_count",
+        ),
+        "docstore.index.links": (
+            links_of([entry_id, entry_id + 1]),
+            ["unique_first_second", "PRIMARY KEY"],
+            None,
+        ),
+        "docstore.entry": (
+            links_from(entry_id),
+            ["unique_first_second"],
+            None,
+        ),
+        "segments.lookup": (
+            segments_of(model + "/tokenized", [entry_id, entry_id + 1]),
+            ["sqlite_autoindex_segment_1"],
+            None,
+        ),
+        "dedup.candidates": (
+            band_neighbours(entry_id),
+            ["sqlite_autoindex_minhash_band_1", "ix_minhash_band_key"],
+            None,
+        ),
+        "dedup.representative": (
+            select([Entry.id]).where(and_(Entry.lang == lang, dedup.representative())),
+            ["ix_entry_lang_date", "PRIMARY KEY"],
+            None,
+        ),
+    }
+
+
+def explain(connection, query):
+    # Inlines the parameters, EXPLAIN QUERY PLAN can not take them bound.
+    sql = str(
+        query.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    rows = connection.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_plan(details, indexes, walk=None):
+    """
+    Returns the problems with a plan: scans other than of `walk`, sorts,
+    or searches that use none of `indexes`. SQLite names a UNIQUE
+    constraint's index sqlite_autoindex_<table>_<n>, which stands for the
+    constraint here.
+    """
+    problems = []
+    for detail in details:
+        if detail.startswith("SCAN"):
+            # Only `walk`, read in order for an ORDER BY ... LIMIT; a scan
+            # of any other index still reads all of it.
+            if walk is None or not detail.endswith("INDEX " + walk):
+                problems.append(detail)
+        elif detail.startswith("USE TEMP B-TREE"):
+            problems.append(detail)
+        elif detail.startswith("SEARCH"):
+            used = detail.split(" USING ")[-1]
+            if not any(index in used for index in indexes) and (
+                "sqlite_autoindex" not in used
+                or not any(index.startswith("unique_") for index in indexes)
+            ):
+                problems.append(detail)
+    return problems
@@ -3,7 +3,6 @@ import itertools
 import re
 import string
 from collections import namedtuple
-from datetime import timedelta
 from pprint import pprint
 
 import numpy as np
@@ -12,6 +11,8 @@ from tqdm import tqdm
 
 from . import db
 from .models import Entry, Link, Translation
+from .plans import LANGS, near
+from .segments import whole
 from .utils import clean_translation
 
 
@@ -70,29 +71,21 @@ class RetrievalEngine:
 
 
 def get_candidates(query_id, days):
-    langs = ["hi", "ta", "te", "ml", "ur", "bn", "gu", "mr", "pa", "or"]
-    delta = timedelta(days=days)
     query = db.session.query(Entry).filter(Entry.id == query_id).first()
 
     candidates = []
 
     if query.lang == "en":
-        noneng_matches = (
-            db.session.query(Entry)
-            .filter(and_(Entry.lang != "en", Entry.lang.in_(langs)))
-            .filter(Entry.date.between(query.date - delta, query.date + delta))
-            .all()
-        )
+        noneng_matches = db.session.execute(
+            near([Entry.id, Entry.lang], LANGS, query.date, days)
+        ).fetchall()
         for match in noneng_matches:
             candidates.append((match.id, match.lang))
         return candidates
     else:
-        eng_matches = (
-            db.session.query(Entry.id)
-            .filter(Entry.lang == "en")
-            .filter(Entry.date.between(query.date - delta, query.date + delta))
-            .all()
-        )
+        eng_matches = db.session.execute(
+            near([Entry.id], ["en"], query.date, days)
+        ).fetchall()
 
         for match in eng_matches:
             candidates.append(match.id)
@@ -100,15 +93,9 @@ def get_candidates(query_id, days):
 
 
 def get_candidates_by_lang(query_id, lang, days):
-    delta = timedelta(days=days)
     query = db.session.query(Entry).filter(Entry.id == query_id).first()
     candidates = []
-    matches = (
-        db.session.query(Entry.id)
-        .filter(Entry.lang == lang)
-        .filter(Entry.date.between(query.date - delta, query.date + delta))
-        .all()
-    )
+    matches = db.session.execute(near([Entry.id], [lang], query.date, days)).fetchall()
     for match in matches:
         candidates.append(match.id)
     return candidates
@@ -135,13 +122,12 @@ def retrieve_neighbours(query_id, pivot_lang, tokenizer, model, length_check=Tru
     candidate_content = Entry.query.filter(Entry.id.in_(candidates)).all()
     new_candidates = [ncc.id for ncc in candidate_content]
 
-    candidate_corpus = []
-    for content in candidate_content:
-        if content.content is None:
-            print(content, content.content, content.id)
-        content.content = content.content or ""
-        processed = preprocess(content.content)
-        candidate_corpus.append(processed)
+    # Candidates come up again for every query within days of them.
+    cache = whole(tokenizer, model)
+    candidate_corpus = [
+        processed for processed, in cache.get_many(candidate_content, lang=pivot_lang)
+    ]
+    cache.flush()
 
     if candidate_corpus:
         tf = RetrievalEngine(query_content, candidate_corpus, new_candidates)
@@ -0,0 +1,232 @@
+"""
+Full-text search over Entry.content and Translation.translated with
+SQLite FTS5. The indexes are external-content tables, so they hold only
+the inverted index and read text back through the `entry_text` and
+`translation_text` views, which decompress it (see pib.compression);
+triggers keep them in step with every insert, update and delete.
+Updates that leave the indexed columns as they were, like compressing
+the text or counting links, are skipped.
+
+The tokenizer counts combining marks (M*) as part of words, otherwise
+unicode61 splits Indic words at every vowel sign.
+"""
+
+import html
+from datetime import datetime
+
+from sqlalchemy import text
+
+TOKENIZE = "unicode61 categories 'L* N* Co M*'"
+
+INDEXES = {
+    # fts table: (content table, indexed columns), the text column first.
+    # entry's lang is indexed too so that FTS5 intersects it with the
+    # terms instead of filtering matches through a join.
+    "entry_fts": ("entry", ["content", "lang"]),
+    "translation_fts": ("translation", ["translated"]),
+}
+
+
+def _ddl(fts, table, columns, compressed):
+    def values(row):
+        # The text column as plain text, the others as stored.
+        first = "{}.{}".format(row, columns[0])
+        if compressed:
+            first = "pib_text({0}.{1}, {0}.codec)".format(row, columns[0])
+        return [first] + ["{}.{}".format(row, c) for c in columns[1:]]
+
+    view = ", ".join(
+        "{} AS {}".format(value, column)
+        for value, column in zip(values(table), columns)
+    )
+    new = ", ".join(["new.id"] + values("new"))
+    old = ", ".join(["'delete'", "old.id"] + values("old"))
+    # Only updates setting an indexed column wake the trigger.
+    watched = ", ".join(columns + (["codec"] if compressed else []))
+    changed = " OR ".join(
+        "{} IS NOT {}".format(a, b) for a, b in zip(values("old"), values("new"))
+    )
+    statements = [
+        "CREATE VIEW IF NOT EXISTS {table}_text AS "
+        "SELECT " + table + ".id AS id, " + view + " FROM {table}",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        "{names}, content='{content}', content_rowid='id', "
+        'tokenize="{tokenize}")',
+        "CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        "INSERT INTO {fts}(rowid, {names}) VALUES (" + new + "); END",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, {names}) VALUES (" + old + "); END",
+        "CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF " + watched + " "
+        "ON {table} WHEN " + changed + " BEGIN "
+        "INSERT INTO {fts}({fts}, rowid, {names}) VALUES (" + old + "); "
+        "INSERT INTO {fts}(rowid, {names}) VALUES (" + new + "); END",
+    ]
+    return statements if compressed else statements[1:]
+
+
+def create_index(connection, compressed=True):
+    """
+    Idempotent, the tables start out empty, see rebuild(). `compressed`
+    False builds the index as it was before the codec columns, over the
+    tables themselves, for the migration that introduced it.
+    """
+    for fts, (table, columns) in INDEXES.items():
+        content = "{}_text".format(table) if compressed else table
+        for statement in _ddl(fts, table, columns, compressed):
+            connection.execute(
+                statement.format(
+                    fts=fts,
+                    table=table,
+                    content=content,
+                    names=", ".join(columns),
+                    tokenize=TOKENIZE,
+                )
+            )
+
+
+def drop_index(connection):
+    for fts, (table, _) in INDEXES.items():
+        for suffix in ["ai", "ad", "au"]:
+            connection.execute("DROP TRIGGER IF EXISTS {}_{}".format(fts, suffix))
+        connection.execute("DROP TABLE IF EXISTS {}".format(fts))
+        connection.execute("DROP VIEW IF EXISTS {}_text".format(table))
+
+
+def rebuild(connection, fts):
+    # Re-reads the whole content table, for rows written before the
+    # triggers existed.
+    connection.execute("INSERT INTO {0}({0}) VALUES ('rebuild')".format(fts))
+
+
+def optimize(connection, fts):
+    # Merges the index b-trees into one, worth it after a large backfill.
+    connection.execute("INSERT INTO {0}({0}) VALUES ('optimize')".format(fts))
+
+
+def to_match(q):
+    # Every whitespace separated term as a quoted string, so user input
+    # can not trip the FTS5 query syntax. A trailing * keeps prefix search.
+    terms = []
+    for term in q.split():
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append('"{}"{}'.format(term, "*" if prefix else ""))
+    return " ".join(terms)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def highlight(snippet):
+    # Crawled text may contain markup, escape it and only then mark hits.
+    escaped = html.escape(snippet or "")
+    return escaped.replace("\x02", "<b>").replace("\x03", "</b>")
+
+
+def search(
+    connection,
+    q,
+    lang=None,
+    begin=None,
+    end=None,
+    source="entry",
+    page=1,
+    per_page=20,
+    max_ranked=None,
+):
+    """
+    Ranks matches of `q` by bm25 and returns `(results, has_next,
+    truncated)`. `source` picks the index: "entry" searches articles as
+    crawled, "translation" searches their translations and reports the
+    entry translated. `lang`, `begin` and `end` filter on the entry.
+
+    bm25 costs about a microsecond per match, so a term found in most of
+    the corpus takes hundreds of milliseconds. With `max_ranked` set, only
+    that many most recent matches (highest rowids, a rowid range FTS5 can
+    seek to) are ranked, and `truncated` tells when older ones were left
+    out.
+    """
+    fts = "{}_fts".format(source)
+    assert fts in INDEXES, "Unknown search source {}".format(source)
+    match = to_match(q)
+    if not match:
+        return [], False, False
+
+    if source == "entry":
+        join = "JOIN entry ON entry.id = {fts}.rowid"
+    else:
+        join = (
+            "JOIN translation ON translation.id = {fts}.rowid "
+            "JOIN entry ON entry.id = translation.parent_id"
+        )
+
+    dates, params = [], {"match": match}
+    if begin is not None:
+        dates.append("entry.date >= :begin")
+        params["begin"] = begin
+    if end is not None:
+        dates.append("entry.date < :end")
+        params["end"] = end
+
+    table, columns = INDEXES[fts]
+    clauses = ["{fts} MATCH :match"] + dates
+    if len(columns) > 1:
+        # Terms are for the text, not for the other indexed columns.
+        params["match"] = "{} : ({})".format(columns[0], match)
+    if lang and "lang" in columns:
+        params["match"] += ' AND lang : "{}"'.format(lang.replace('"', '""'))
+    elif lang:
+        clauses.append("entry.lang = :lang")
+        params["lang"] = lang
+    if dates and source == "entry":
+        # PRIDs grow with the release date, so the IDs in the date range
+        # bound the rowids FTS5 has to walk, found through ix_entry_date.
+        bounds = "SELECT min(id), max(id) FROM entry WHERE " + " AND ".join(dates)
+        low, high = connection.execute(text(bounds), params).fetchone()
+        if low is None:
+            return [], False, False
+        clauses.append("{fts}.rowid BETWEEN :low AND :high")
+        params.update({"low": low, "high": high})
+
+    def query(select, order):
+        sql = "SELECT {} FROM {{fts}} {} WHERE {} ORDER BY {}".format(
+            select, join, " AND ".join(clauses), order
+        )
+        return text(sql.format(fts=fts))
+
+    floor = None
+    if max_ranked is not None:
+        floor = connection.execute(
+            query("{fts}.rowid", "{fts}.rowid DESC LIMIT 1 OFFSET :max_ranked"),
+            dict(params, max_ranked=max_ranked),
+        ).scalar()
+    if floor is not None:
+        clauses.append("{fts}.rowid > :floor")
+        params["floor"] = floor
+
+    # Only the text column counts towards the score.
+    weights = ", ".join(["1.0"] + ["0.0"] * (len(columns) - 1))
+    select = (
+        "entry.id, entry.lang, entry.date, "
+        "snippet({fts}, 0, char(2), char(3), '...', 16) AS snippet, "
+        "bm25({fts}, " + weights + ") AS score"
+    )
+    # One row past the page tells whether there is a next one.
+    params.update({"limit": per_page + 1, "offset": (page - 1) * per_page})
+    rows = connection.execute(
+        query(select, "score LIMIT :limit OFFSET :offset"), params
+    ).fetchall()
+
+    results = [
+        {
+            "id": row.id,
+            "lang": row.lang,
+            "date": str(row.date) if row.date is not None else None,
+            "snippet": highlight(row.snippet),
+            "score": row.score,
+        }
+        for row in rows[:per_page]
+    ]
+    return results, len(rows) > per_page, floor is not None
@@ -0,0 +1,134 @@
+"""
+Segmented and tokenized entries, computed once and kept in the segment
+table under (entry_id, version, lang).
+
+`version` names what made the lines: the segmenter or the translation
+model whose tokenizer ran, and how they were put together, e.g.
+"mm-to-en-iter2/tokenized". A new model starts a set of its own instead
+of reading another tokenizer's lines. Each row keeps the sha1 of the
+content it was made from, an entry whose content changed since is
+processed again and its row replaced.
+
+The factories at the bottom make the lines each caller reads, so that
+pib.cli.precompute-segments fills in exactly what those callers ask for.
+"""
+
+import hashlib
+import json
+
+from . import db
+from .bulk import batched, upsert
+from .models import Segment
+from .plans import segments_of
+
+KEYS = ["entry_id", "version", "lang"]
+
+
+def digest(content):
+    return hashlib.sha1((content or "").encode("utf-8")).hexdigest()
+
+
+class SegmentCache:
+    """
+    Lines of entries as `process(content, lang)` makes them, read from the
+    segment table where fresh. Missing and stale entries are processed
+    and written `flush_size` at a time; call flush() when done. Callers
+    going one entry at a time prefetch() the ids coming up, so that get()
+    does not read the table once per entry.
+    """
+
+    def __init__(self, version, process, flush_size=500):
+        self.version = version
+        self.process = process
+        self.flush_size = flush_size
+        self.pending = {}
+        self.prefetched, self.prefetched_ids = {}, set()
+        self.hits, self.misses = 0, 0
+
+    def lookup(self, ids):
+        rows = {}
+        for batch in batched(sorted(set(ids)), 500):
+            query = segments_of(self.version, batch)
+            with db.engine.connect() as connection:
+                for row in connection.execute(query):
+                    rows[(row.entry_id, row.lang)] = dict(row)
+        return rows
+
+    def prefetch(self, ids):
+        # Replaces the last window.
+        self.prefetched_ids = set(ids)
+        self.prefetched = self.lookup(self.prefetched_ids)
+
+    def get(self, entry, lang=None):
+        return self.get_many([entry], lang)[0]
+
+    def get_many(self, entries, lang=None):
+        """
+        Lines of each of `entries` (with id, lang and content), processed
+        as `lang` if given, else as the entry's own language.
+        """
+        entries = list(entries)
+        read = self.lookup(
+            entry.id for entry in entries if entry.id not in self.prefetched_ids
+        )
+        results = []
+        for entry in entries:
+            key = (entry.id, lang or entry.lang)
+            content_digest = digest(entry.content)
+            row = self.pending.get(key) or self.prefetched.get(key) or read.get(key)
+            if row is not None and row["digest"] == content_digest:
+                self.hits += 1
+                results.append(json.loads(row["lines"]))
+                continue
+
+            self.misses += 1
+            lines = list(self.process(entry.content or "", key[1]))
+            self.pending[key] = {
+                "entry_id": entry.id,
+                "version": self.version,
+                "lang": key[1],
+                "digest": content_digest,
+                "lines": json.dumps(lines, ensure_ascii=False),
+            }
+            results.append(lines)
+
+        if len(self.pending) >= self.flush_size:
+            self.flush()
+        return results
+
+    def flush(self):
+        if not self.pending:
+            return
+        # A transaction of its own, the caller's session is left alone.
+        with db.engine.begin() as connection:
+            upsert(connection, Segment.__table__, list(self.pending.values()), KEYS)
+        self.prefetched.update(self.pending)
+        self.pending = {}
+
+
+def segmented(segmenter, tag):
+    # Segments only, as export-mono-corpus --segment writes them.
+    def process(content, lang):
+        _, segments = segmenter(content, lang=lang)
+        return segments
+
+    return SegmentCache("{}/segmented".format(tag), process)
+
+
+def tokenized(preproc, tag):
+    # Segments tokenized one by one, pib.cli.utils.Preproc.process, which
+    # translate_pib and export-parallel-corpus go through.
+    def process(content, lang):
+        lines, _ = preproc.process(content, lang)
+        return lines
+
+    return SegmentCache("{}/tokenized".format(tag), process)
+
+
+def whole(tokenizer, tag):
+    # The content tokenized in one go, retrieval's SPMPreprocessor.
+    def process(content, lang):
+        _, tokens = tokenizer(content, lang=lang)
+        return [" ".join(tokens)]
+
+    return SegmentCache("{}/whole".format(tag), process)
@@ -0,0 +1,337 @@
+"""
+Columnar snapshots of the crawl DB for the batch tools.
+
+A snapshot is a directory of Parquet files, `<table>/<lang>.parquet`,
+partitioned by language and month: each month of a language is a run of
+row groups, which `manifest.json` lists with their row counts. Links and
+translations go with the language and month of the entry they belong to
+(first_id, parent_id), so a job over Hindi releases of 2019 reads the
+same few row groups in every table.
+Text is written as plain text, whatever pib.compression did to it.
+
+`write()` takes one, `Snapshot` reads one through memory maps, without
+a connection to the live DB. `pyarrow` is only imported here.
+"""
+
+import json
+import os
+import shutil
+import time
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from sqlalchemy import select
+
+from .models import Entry, Link, Translation
+from .storage import stream
+
+VERSION = 1
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Snapshots need pyarrow, pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def _schemas():
+    pa, _ = _arrow()
+    return {
+        "entry": pa.schema(
+            [
+                ("id", pa.int64()),
+                ("lang", pa.string()),
+                ("date", pa.timestamp("us")),
+                ("content", pa.string()),
+                ("place", pa.string()),
+                ("link_count", pa.int32()),
+            ]
+        ),
+        "link": pa.schema([("first_id", pa.int64()), ("second_id", pa.int64())]),
+        "translation": pa.schema(
+            [
+                ("id", pa.int64()),
+                ("parent_id", pa.int64()),
+                ("model", pa.string()),
+                ("lang", pa.string()),
+                ("translated", pa.string()),
+            ]
+        ),
+    }
+
+
+def _queries():
+    # Rows in partition order, the partition keys trailing.
+    keys = [Entry.lang.label("key_lang"), Entry.date.label("key_date")]
+    order = [Entry.lang, Entry.date, Entry.id]
+    return {
+        "entry": select(
+            [
+                Entry.id,
+                Entry.lang,
+                Entry.date,
+                Entry.content,
+                Entry.place,
+                Entry.link_count,
+            ]
+            + keys
+        ).order_by(*order),
+        "link": select([Link.first_id, Link.second_id] + keys)
+        .select_from(Link.__table__.join(Entry.__table__, Link.first_id == Entry.id))
+        .order_by(*order + [Link.second_id]),
+        "translation": select(
+            [
+                Translation.id,
+                Translation.parent_id,
+                Translation.model,
+                Translation.lang,
+                Translation.translated,
+            ]
+            + keys
+        )
+        .select_from(
+            Translation.__table__.join(
+                Entry.__table__, Translation.parent_id == Entry.id
+            )
+        )
+        .order_by(*order + [Translation.id]),
+    }
+
+
+def month(date):
+    return date.strftime("%Y-%m") if date is not None else "unknown"
+
+
+class _TableWriter:
+    """
+    Writes the rows of one table, in partition order, to a file per
+    language, starting new row groups at each month. A partition in the
+    manifest is the run of row groups holding its month.
+    """
+
+    def __init__(self, table, directory, compression, row_group_size):
+        self.pa, self.pq = _arrow()
+        self.table = table
+        self.directory = directory
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.schema = _schemas()[table]
+        self.files, self.partitions = [], []
+        self.lang, self.writer = None, None
+        self.columns = [[] for _ in self.schema]
+
+    def flush(self):
+        if not self.columns[0]:
+            return
+        arrays = [
+            self.pa.array(values, type=field.type)
+            for values, field in zip(self.columns, self.schema)
+        ]
+        self.writer.write_batch(
+            self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        )
+        self.columns = [[] for _ in self.schema]
+        partition = self.partitions[-1]
+        partition["row_groups"].append(self.row_groups)
+        self.row_groups += 1
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.flush()
+        self.writer.close()
+        self.files[-1]["bytes"] = os.path.getsize(
+            os.path.join(self.directory, self.files[-1]["path"])
+        )
+
+    def open(self, lang):
+        self.close()
+        path = os.path.join(self.table, "{}.parquet".format(lang))
+        self.writer = self.pq.ParquetWriter(
+            os.path.join(self.directory, path),
+            self.schema,
+            compression=self.compression,
+        )
+        self.lang, self.row_groups = lang, 0
+        self.files.append({"path": path, "lang": lang})
+
+    def write(self, rows):
+        for row in rows:
+            lang, key_month = row.key_lang or "unknown", month(row.key_date)
+            if lang != self.lang:
+                self.open(lang)
+            partition = self.partitions[-1] if self.partitions else {}
+            if (partition.get("lang"), partition.get("month")) != (lang, key_month):
+                self.flush()
+                partition = {
+                    "lang": lang,
+                    "month": key_month,
+                    "path": self.files[-1]["path"],
+                    "row_groups": [],
+                    "rows": 0,
+                }
+                self.partitions.append(partition)
+            for values, value in zip(self.columns, row):
+                values.append(value)
+            partition["rows"] += 1
+            if len(self.columns[0]) >= self.row_group_size:
+                self.flush()
+        self.close()
+        return {
+            "columns": self.schema.names,
+            "rows": sum(partition["rows"] for partition in self.partitions),
+            "files": self.files,
+            "partitions": self.partitions,
+        }
+
+
+def write(
+    engine,
+    path,
+    tables=("entry", "link", "translation"),
+    compression="snappy",
+    row_group_size=10000,
+    overwrite=False,
+    log=print,
+):
+    """
+    Writes a snapshot of `tables` to `path`. It is built next to `path`
+    and moved in place once complete, so readers never see half of one.
+    Returns the manifest.
+    """
+    if os.path.exists(path) and not overwrite:
+        raise FileExistsError("{} exists, pass overwrite".format(path))
+    partial = "{}.partial".format(path.rstrip("/"))
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+
+    with engine.connect() as connection:
+        watermark = connection.execute(
+            select([Entry.id]).order_by(Entry.id.desc()).limit(1)
+        ).scalar()
+
+    manifest = {
+        "version": VERSION,
+        "created": datetime.utcnow().isoformat(),
+        "dialect": engine.dialect.name,
+        "watermark": watermark,
+        "compression": compression,
+        "tables": {},
+    }
+    for table in tables:
+        start = time.time()
+        os.makedirs(os.path.join(partial, table))
+        writer = _TableWriter(table, partial, compression, row_group_size)
+        rows = stream(engine, _queries()[table], batch_size=row_group_size)
+        manifest["tables"][table] = writer.write(rows)
+        log(
+            "{}: {} rows in {} partitions, {:.1f}s".format(
+                table,
+                manifest["tables"][table]["rows"],
+                len(manifest["tables"][table]["partitions"]),
+                time.time() - start,
+            )
+        )
+
+    with open(os.path.join(partial, "manifest.json"), "w") as fp:
+        json.dump(manifest, fp, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(partial, path)
+    return manifest
+
+
+class Snapshot:
+    """
+    Reads a snapshot written by write(). Tables are filtered by language
+    and by month through the manifest, without opening other files; the
+    entry table is also cut to the exact `begin`/`end` dates.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as fp:
+            self.manifest = json.load(fp)
+        assert self.manifest["version"] == VERSION, "Unknown snapshot version"
+
+    def partitions(self, table, langs=None, begin=None, end=None):
+        lo = month(begin) if begin is not None else None
+        hi = month(end) if end is not None else None
+        for partition in self.manifest["tables"][table]["partitions"]:
+            if langs is not None and partition["lang"] not in langs:
+                continue
+            if (lo or hi) and partition["month"] == month(None):
+                continue
+            if lo is not None and partition["month"] < lo:
+                continue
+            if hi is not None and partition["month"] > hi:
+                continue
+            yield partition
+
+    def count(self, table, langs=None, begin=None, end=None):
+        # From the manifest, before any date cut within a month.
+        return sum(p["rows"] for p in self.partitions(table, langs, begin, end))
+
+    def batches(
+        self,
+        table,
+        langs=None,
+        begin=None,
+        end=None,
+        columns=None,
+        batch_size=10000,
+    ):
+        """Yields pyarrow RecordBatches of `columns` (all by default)."""
+        pa, pq = _arrow()
+        import pyarrow.compute as pc
+
+        cut = table == "entry" and (begin is not None or end is not None)
+        read = columns
+        if cut and columns is not None and "date" not in columns:
+            read = list(columns) + ["date"]
+        partitions = self.partitions(table, langs, begin, end)
+        for path, group in groupby(partitions, key=itemgetter("path")):
+            parquet = pq.ParquetFile(os.path.join(self.path, path), memory_map=True)
+            row_groups = [index for p in group for index in p["row_groups"]]
+            for batch in parquet.iter_batches(
+                batch_size=batch_size, row_groups=row_groups, columns=read
+            ):
+                if cut:
+                    dates, keep = batch.column("date"), None
+                    if begin is not None:
+                        keep = pc.greater_equal(
+                            dates, pa.scalar(begin, pa.timestamp("us"))
+                        )
+                    if end is not None:
+                        before = pc.less(dates, pa.scalar(end, pa.timestamp("us")))
+                        keep = before if keep is None else pc.and_(keep, before)
+                    batch = batch.filter(keep)
+                    if read is not columns:
+                        batch = batch.select(columns)
+                yield batch
+
+    def table(self, table, langs=None, begin=None, end=None, columns=None):
+        """The rows as one pyarrow Table."""
+        pa, _ = _arrow()
+        batches = list(self.batches(table, langs, begin, end, columns))
+        if not batches:
+            schema = _schemas()[table]
+            if columns is not None:
+                schema = pa.schema([schema.field(name) for name in columns])
+            return schema.empty_table()
+        return pa.Table.from_batches(batches)
+
+    def rows(self, table, langs=None, begin=None, end=None, columns=None):
+        """
+        Yields namedtuples, for code written against query rows, e.g.
+        `for entry in snapshot.rows("entry", ["hi"]): entry.content`.
+        """
+        names = columns or self.manifest["tables"][table]["columns"]
+        Row = namedtuple(table.capitalize(), names)
+        for batch in self.batches(table, langs, begin, end, columns):
+            values = batch.to_pydict()
+            yield from map(Row._make, zip(*(values[name] for name in names)))
@@ -0,0 +1,114 @@
+"""
+SQLite tuning, applied with PRAGMAs on every new connection. A profile is
+picked with `PIB_SQLITE_PROFILE` (default "wal"); bulk_load() switches
+the process to the "bulk" profile for the duration of a large write.
+
+- legacy: SQLite defaults, rollback journal and an fsync per commit.
+- wal: write-ahead log, so the crawler, translator and web app can read
+  while one of them writes; fsync at checkpoints only, which loses at
+  most the last commits on power loss but never corrupts the file.
+- bulk: wal with a larger cache and checkpoint interval, so fsyncs only
+  come every 100000 pages; the same durability as wal. synchronous=OFF
+  is left out on purpose, a power loss under it can corrupt the file.
+
+On PostgreSQL only "bulk" does anything: commits return without waiting
+for the server's WAL flush (synchronous_commit off).
+"""
+
+import contextlib
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILES = {
+    "legacy": {},
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 1 << 30,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    "bulk": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 1 << 30,
+        "cache_size": -512000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+        "wal_autocheckpoint": 100000,
+    },
+}
+
+_profile = os.environ.get("PIB_SQLITE_PROFILE", "wal")
+
+
+def apply_profile(connection, name):
+    cursor = connection.cursor()
+    for pragma, value in PROFILES[name].items():
+        cursor.execute("PRAGMA {}={}".format(pragma, value))
+    cursor.close()
+
+
+def use_profile(name):
+    # Applies to connections opened from here on.
+    global _profile
+    assert name in PROFILES, "Unknown SQLite profile {}".format(name)
+    previous, _profile = _profile, name
+    return previous
+
+
+@event.listens_for(Engine, "connect")
+def _on_connect(connection, record):
+    if isinstance(connection, sqlite3.Connection):
+        apply_profile(connection, _profile)
+    elif _profile == "bulk" and type(connection).__module__.startswith("psycopg2"):
+        cursor = connection.cursor()
+        cursor.execute("SET synchronous_commit TO OFF")
+        cursor.close()
+        # Kept for the session only once committed.
+        connection.commit()
+
+
+@contextlib.contextmanager
+def bulk_load(engine, enabled=True):
+    """
+    Runs the block with the "bulk" profile. The pool is emptied on the way
+    in and out so that every connection used inside has the profile.
+    """
+    if not enabled or engine.dialect.name not in ["sqlite", "postgresql"]:
+        yield
+        return
+
+    previous = use_profile("bulk")
+    engine.dispose()
+    try:
+        yield
+    finally:
+        use_profile(previous)
+        engine.dispose()
+        if engine.dialect.name == "sqlite":
+            with engine.connect() as connection:
+                connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def stream(engine, query, batch_size=1000):
+    """
+    Yields the rows of `query` (ORM or Core) from a connection of its own,
+    `batch_size` at a time, so that a scan over every entry of a language
+    neither holds them all in memory nor ends when the caller commits.
+    PostgreSQL reads through a server-side cursor. SQLite steps the
+    statement lazily anyway; under the "legacy" profile that keeps
+    writers out until the scan is done.
+    """
+    statement = getattr(query, "statement", query)
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(statement)
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
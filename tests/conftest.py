@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# The app binds its DB when pib is imported, keep it out of the tree.
+os.environ.setdefault(
+    "PIB_DATABASE_URI",
+    "sqlite:///{}".format(os.path.join(tempfile.mkdtemp(), "test.db")),
+)
@@ -0,0 +1,51 @@
+"""
+Golden files for the release page extractors: every backend in EXTRACTORS
+must turn each saved PressReleasePage.aspx page under fixtures/extract
+into the PIBArticle its `<PRID>.json` holds, or fail with its reason.
+
+`python tests/test_extract.py` rewrites the JSON from the bs4 backend,
+check the diff before committing it.
+"""
+
+import json
+import os
+
+import pytest
+
+from pib.cli.extract import EXTRACTORS, ParseError
+from pib.cli.scrape import CachedCrawler
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "extract")
+PAGES = sorted(
+    os.path.splitext(fname)[0]
+    for fname in os.listdir(FIXTURES)
+    if fname.endswith(".html")
+)
+
+
+def read(prid, ext):
+    with open(os.path.join(FIXTURES, prid + ext), encoding="utf-8") as fp:
+        return fp.read()
+
+
+def parsed(prid, parser):
+    try:
+        article = CachedCrawler.parse_article(prid, read(prid, ".html"), parser)
+    except ParseError as e:
+        return {"error": e.reason}
+    fields, links = article.as_dict()
+    fields["date"] = fields["date"].isoformat()
+    return {"article": fields, "links": links}
+
+
+@pytest.mark.parametrize("parser", sorted(EXTRACTORS))
+@pytest.mark.parametrize("prid", PAGES)
+def test_golden(prid, parser):
+    assert parsed(prid, parser) == json.loads(read(prid, ".json"))
+
+
+if __name__ == "__main__":
+    for prid in PAGES:
+        with open(os.path.join(FIXTURES, prid + ".json"), "w") as fp:
+            json.dump(parsed(prid, "bs4"), fp, indent=2, ensure_ascii=False)
+            fp.write("\n")
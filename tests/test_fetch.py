@@ -0,0 +1,67 @@
+"""
+AsyncFetcher against a StandIn site: pages come through and are cached,
+404s are marked missing, and 5xx are retried while the AIMD limit backs
+off.
+"""
+
+import threading
+
+from pib.bench.standin import StandIn, SyntheticSite
+from pib.cli.fetch import AsyncFetcher, Backoff, FetchFailure
+from pib.cli.scrape import CachedCrawler
+from pib.cli.telemetry import CrawlMetrics
+
+
+class Metrics(CrawlMetrics):
+    def __init__(self):
+        super().__init__()
+        self.limits = []
+
+    def gauge(self, name, value):
+        super().gauge(name, value)
+        if name == "concurrency_limit":
+            self.limits.append(value)
+
+
+class Cache(dict):
+    # Records the threads it is called from, the event loop runs on "fetch".
+    def __init__(self, pages):
+        super().__init__(pages)
+        self.threads = set()
+
+    def cached(self, key):
+        self.threads.add(threading.current_thread().name)
+        return self.get(key)
+
+    def store(self, key, page):
+        self.threads.add(threading.current_thread().name)
+        self[key] = page
+
+
+def test_fetch_all():
+    site = SyntheticSite(1, 5, max_cluster=1)
+    cache = Cache({"4": site.get(4)})
+    metrics = Metrics()
+
+    with StandIn(site, failures={3: 2}) as standin:
+        fetcher = AsyncFetcher(
+            standin.url_format,
+            CachedCrawler.headers,
+            concurrency=4,
+            metrics=metrics,
+            backoff=Backoff(retries=3, base=0.01),
+        )
+        pages = dict(fetcher.fetch_all(["1", "2", "3", "4", "5"], cache=cache))
+        requests = standin.requests
+
+    assert pages["1"] == site.get(1)
+    assert pages["3"] == site.get(3)
+    assert pages["4"] == site.get(4)
+    assert isinstance(pages["5"], FetchFailure) and pages["5"].missing
+    assert sorted(cache) == ["1", "2", "3", "4"]
+    assert "fetch" not in cache.threads
+
+    # 4 is served from the cache, 3 answers twice with 503 before its page.
+    assert requests == 3 + 1 + 2
+    assert metrics.retries["http-503"] == 2
+    assert min(metrics.limits) < 4
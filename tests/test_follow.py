@@ -0,0 +1,82 @@
+"""
+Follower rounds against a StandIn site: releases past the watermark are
+ingested, and IDs skipped below it are probed again until they go out.
+"""
+
+import pytest
+
+from pib import db
+from pib.bench.standin import StandIn, SyntheticSite
+from pib.cli.fetch import AsyncFetcher
+from pib.cli.follow import Follower
+from pib.cli.scrape import AdjacencyJournal, CachedCrawler
+from pib.cli.telemetry import CrawlMetrics
+from pib.models import Entry
+
+# What an ID answers with before its release goes out: no PdfDiv.
+PLACEHOLDER = "<html><body><p>Press Information Bureau</p></body></html>"
+
+
+class Releases:
+    def __init__(self, site):
+        self.site = site
+        self.published = set()
+
+    def get(self, prid):
+        if prid not in self.site:
+            return None
+        if prid not in self.published:
+            return PLACEHOLDER
+        return self.site.get(prid)
+
+
+@pytest.fixture
+def session():
+    db.drop_all()
+    db.create_all()
+    yield db.session
+    db.session.remove()
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_follow(session, tmp_path, concurrency):
+    releases = Releases(SyntheticSite(100, 140, max_cluster=1))
+    releases.published.update([101, 102, 104])
+
+    with StandIn(releases) as standin:
+        metrics = CrawlMetrics()
+        path = str(tmp_path / "crawl")
+        crawler = CachedCrawler(path, url_format=standin.url_format, metrics=metrics)
+        fetcher = None
+        if concurrency > 1:
+            fetcher = AsyncFetcher(
+                standin.url_format, crawler.headers, concurrency, metrics=metrics
+            )
+        adj = AdjacencyJournal(path + ".adj.jsonl").load()
+        follower = Follower(
+            crawler, adj, metrics, path + ".follow.json", fetcher, min_interval=1.0
+        ).load(100)
+
+        assert sorted(follower.poll()) == ["101", "102", "104"]
+        assert follower.watermark == 104
+        assert "103" in follower.pending
+        assert crawler.cached("103") is None
+
+        # 103 goes out late: picked up from pending, without moving on.
+        releases.published.add(103)
+        window, interval = follower.window, follower.interval
+        assert follower.poll() == ["103"]
+        assert "103" not in follower.pending
+        assert follower.watermark == 104
+        assert (follower.window, follower.interval) == (window, interval)
+
+        releases.published.update([105, 106])
+        assert sorted(follower.poll()) == ["105", "106"]
+        assert follower.watermark == 106
+
+        assert follower.poll() == []
+        assert follower.interval == 2.0
+
+    ids = [idx for (idx,) in session.query(Entry.id).order_by(Entry.id)]
+    assert ids == [101, 102, 103, 104, 105, 106]
+    assert crawler.cached("103") is not None
@@ -0,0 +1,35 @@
+"""
+The hot lookups in pib.plans, planned by SQLite on a fresh schema: each
+must go through its index, not a table scan, an index scan other than
+its ORDER BY ... LIMIT walk, or a temporary sort.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from pib import db
+from pib.plans import check_plan, explain, hot_queries
+
+
+@pytest.fixture(scope="module")
+def connection(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine("sqlite:///{}".format(path))
+    db.Model.metadata.create_all(engine)
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", sorted(hot_queries()))
+def test_plan_uses_index(connection, name):
+    query, indexes, walk = hot_queries()[name]
+    details = explain(connection, query)
+    assert check_plan(details, indexes, walk) == [], "\n".join(details)
+
+
+def test_check_plan_rejects_index_scans():
+    # Reading a whole index is a scan too, unless it is the ordered walk.
+    scan = ["SCAN cluster USING COVERING INDEX ix_cluster_cluster_id"]
+    assert check_plan(scan, ["ix_cluster_cluster_id"]) == scan
+    assert check_plan(scan, [], walk="ix_cluster_cluster_id") == []